@@ -1,24 +1,39 @@
 from PyQt6.QtCore import QThread, pyqtSignal
-import pyautogui
+import threading
 import time
 
+from ActionRecording import ActionRecording
+from InputBackend import create_backend
+from InputHooks import create_event_source
+from RecordingFile import RecordingWriter
+
 class ActionRecorder(QThread):
-    actions_recorded = pyqtSignal(list)
+    actions_recorded = pyqtSignal(object)
+
+    def __init__(self, backend=None, source=None, stream_path=None, parent=None):
+        super().__init__(parent)
+        self.backend = backend or create_backend()
+        # Events arrive from OS input hooks, so the thread sleeps while idle
+        self.source = source or create_event_source(self.backend)
+        self.stream_path = stream_path  # Write to this file while recording
+        self.stopped = threading.Event()
 
     def run(self):
-        self.recorded_actions = []
-        self.is_recording = True
-        self.start_time = time.time()
-        pyautogui.PAUSE = 0  # Disable pyautogui's pause between actions
-        while self.is_recording:
-            x, y = pyautogui.position()
-            action = {
-                'time': time.time() - self.start_time,
-                'position': (x, y),
-                'event_type': 'move'
-            }
-            self.recorded_actions.append(action)
-            time.sleep(0.1)
+        if self.stream_path:
+            self.recorded_actions = RecordingWriter(self.stream_path)
+        else:
+            self.recorded_actions = ActionRecording()
+        self.start_time = time.perf_counter()
+        self.source.start(self.record_event)
+        self.stopped.wait()
+        self.source.stop()
+        if self.stream_path:
+            self.actions_recorded.emit(self.recorded_actions.close())
+        else:
+            self.actions_recorded.emit(self.recorded_actions)
+
+    def record_event(self, timestamp, event, x, y, button, data):
+        self.recorded_actions.append(timestamp - self.start_time, x, y, event, button, data)
 
     def stop(self):
-        self.is_recording = False
\ No newline at end of file
+        self.stopped.set()
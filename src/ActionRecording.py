@@ -0,0 +1,143 @@
+import bisect
+import json
+from array import array
+
+# Event codes stored in the events column, indexed by their JSON name
+EVENT_TYPES = ['move', 'down', 'up', 'scroll', 'key_down', 'key_up']
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+MOVE, DOWN, UP, SCROLL, KEY_DOWN, KEY_UP = range(6)
+
+# Button codes stored in the buttons column; 0 means the event has no button
+BUTTONS = ['', 'left', 'right', 'middle']
+BUTTON_CODES = {name: code for code, name in enumerate(BUTTONS)}
+
+# Column names with the NumPy dtype matching each array typecode
+COLUMN_TYPES = [('times', '<f8'), ('xs', '<i4'), ('ys', '<i4'),
+                ('events', 'u1'), ('buttons', 'u1'), ('data', '<i4')]
+
+
+# A recording kept as typed columns instead of one dict per sample, about
+# 22 bytes per event. Iterating or indexing yields plain
+# (time, x, y, event, button, data) tuples; data holds the scroll amount or
+# the X11 keysym of a key event.
+class ActionRecording:
+    def __init__(self):
+        self.times = array('d')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.events = array('B')
+        self.buttons = array('B')
+        self.data = array('i')
+
+    def append(self, time, x, y, event=MOVE, button=0, data=0):
+        self.times.append(time)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.events.append(event)
+        self.buttons.append(button)
+        self.data.append(data)
+
+    def extend(self, other):
+        for name in ('times', 'xs', 'ys', 'events', 'buttons', 'data'):
+            getattr(self, name).extend(getattr(other, name))
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times, self.xs, self.ys, self.events, self.buttons, self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            recording = ActionRecording()
+            for name in ('times', 'xs', 'ys', 'events', 'buttons', 'data'):
+                setattr(recording, name, getattr(self, name)[index])
+            return recording
+        return (self.times[index], self.xs[index], self.ys[index],
+                self.events[index], self.buttons[index], self.data[index])
+
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+
+    def seek(self, time):
+        # Index of the first event at or after time
+        return bisect.bisect_left(self.times, time)
+
+    def iter_range(self, first, last):
+        return zip(*(getattr(self, name)[first:last]
+                     for name in ('times', 'xs', 'ys', 'events', 'buttons', 'data')))
+
+    def columns(self):
+        # Zero-copy NumPy views; only valid until the recording is appended to
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=dtype)
+                for name, dtype in COLUMN_TYPES}
+
+    @classmethod
+    def from_columns(cls, columns):
+        import numpy as np
+        recording = cls()
+        for name, dtype in COLUMN_TYPES:
+            getattr(recording, name).frombytes(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        return recording
+
+    @classmethod
+    def from_dicts(cls, actions):
+        recording = cls()
+        for action in actions:
+            x, y = action['position']
+            recording.append(
+                action['time'], x, y,
+                EVENT_CODES[action.get('event_type', 'move')],
+                BUTTON_CODES[action.get('button', '')],
+                action.get('data', 0),
+            )
+        return recording
+
+    def to_dicts(self):
+        actions = []
+        for time, x, y, event, button, data in self:
+            action = {'time': time, 'position': (x, y), 'event_type': EVENT_TYPES[event]}
+            if button:
+                action['button'] = BUTTONS[button]
+            if data:
+                action['data'] = data
+            actions.append(action)
+        return actions
+
+    def save(self, path):
+        from RecordingFile import save_recording
+        save_recording(self, path)
+
+    def save_json(self, path):
+        ActionRecording.write_json(self, path)
+
+    @staticmethod
+    def write_json(actions, path):
+        # Writes the same list-of-dicts layout as before, formatted straight
+        # from the event tuples rather than building a dict per event first.
+        # Goes out in batches so a file-backed recording is never fully in memory.
+        with open(path, 'w') as f:
+            f.write('[')
+            rows = []
+            separator = ''
+            for time, x, y, event, button, data in actions:
+                extra = ''
+                if button:
+                    extra += f', "button": "{BUTTONS[button]}"'
+                if data:
+                    extra += f', "data": {data}'
+                rows.append(f'{{"time": {time!r}, "position": [{x}, {y}], '
+                            f'"event_type": "{EVENT_TYPES[event]}"{extra}}}')
+                if len(rows) == 4096:
+                    f.write(separator + ', '.join(rows))
+                    separator = ', '
+                    rows = []
+            if rows:
+                f.write(separator + ', '.join(rows))
+            f.write(']')
+
+    @classmethod
+    def load_json(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dicts(json.load(f))
@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+
+from ClickEngine import SPIN_THRESHOLD, wait_until
+from Metrics import BURST_RATE, CLICKS, CLICKS_MISSED
+
+MAX_BATCH = 1024  # clicks between two flushes, at most
+HEADROOM = 1.25  # paced batches are sized to manage this much over the target rate
+FLUSH_SHARE = 0.05  # at maximum rate, flushing may take this share of the time
+BACKLOG = 0.1  # seconds of clicks caught up on after falling behind; the rest are dropped
+REPORT_INTERVAL = 0.25  # seconds the achieved rate is measured over
+SMOOTHING = 0.1  # weight of the newest batch in the cost estimates
+
+
+# Clicks as fast as a target rate, or as fast as the backend takes them when
+# rate is None. Takes the same plans as ClickEngine, cycling through the
+# targets of a tuple, and ignores their intervals.
+#
+# Clicks are sent in batches with one flush each, since the flush (an X
+# round trip, say) and the loop's own work can cost more than the clicks.
+# The loop is closed on the measured costs: batches are sized to be just big
+# enough for the target rate, or for flushing to stay under FLUSH_SHARE of
+# the time at maximum, and are paced against a schedule of rate clicks per
+# second from when the rate was set. Falling behind that schedule makes the
+# next batch bigger until it is caught up. The achieved rate is measured
+# every REPORT_INTERVAL and published as achieved_rate and the burst rate
+# metric.
+class BurstEngine(threading.Thread):
+    def __init__(self, plan, backend, rate=None, on_finished=None, spin_threshold=SPIN_THRESHOLD):
+        super().__init__(daemon=True)
+        self.plan = plan
+        self.rate = rate
+        self.backend = backend
+        self.on_finished = on_finished
+        self.spin_threshold = spin_threshold
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+
+        self.clicks = 0
+        self.achieved_rate = 0.0
+        self.batch_size = 1
+        self.started = None
+        self.elapsed = None  # set when the run ends
+        self.click_cost = 1e-6  # seconds per click
+        self.batch_cost = 1e-6  # seconds per batch on top of its clicks: the flush and the loop itself
+
+    def swap_plan(self, plan):
+        self.plan = plan
+        self.wake_event.set()
+
+    def set_rate(self, rate):
+        # Takes effect from the next batch, with a fresh schedule
+        self.rate = rate
+        self.wake_event.set()
+
+    def batch_for(self, rate):
+        # Smallest batch that keeps up with rate at the measured costs. A
+        # batch of n takes n * click_cost + batch_cost, so n clicks per that
+        # long has to reach the target (with headroom), or at maximum rate
+        # batch_cost has to be at most FLUSH_SHARE of it.
+        click_cost, batch_cost = self.click_cost, self.batch_cost
+        if rate is None:
+            size = batch_cost * (1 - FLUSH_SHARE) / (FLUSH_SHARE * click_cost)
+        else:
+            rate *= HEADROOM
+            if rate * click_cost >= 1:
+                return MAX_BATCH
+            size = rate * batch_cost / (1 - rate * click_cost)
+        return min(max(math.ceil(size), 1), MAX_BATCH)
+
+    def run(self):
+        backend = self.backend
+        click = backend.click
+        flush = backend.flush
+        current = rate = None
+        targets = 0
+        remaining = None
+        anchor = done = 0
+        report_time = self.started = time.perf_counter()
+        report_clicks = 0
+        while not self.stop_event.is_set():
+            if self.plan is not current or self.rate != rate:
+                if self.plan is not current:
+                    current = self.plan
+                    plans = current if isinstance(current, tuple) else (current,)
+                    targets = len(plans)
+                    repeat = plans[0].repeat
+                    # A plan swapped in may ask for fewer clicks than are done
+                    remaining = None if repeat is None else max(repeat * targets - self.clicks, 0)
+                    if remaining == 0:
+                        break
+                rate = self.rate
+                anchor = time.perf_counter()
+                done = 0
+
+            if rate is None:
+                ready = time.perf_counter()
+                batch = self.batch_for(None)
+            else:
+                # Pacing: wait for the next click on the schedule, then send
+                # everything owed, and at least a batch
+                deadline = anchor + done / rate
+                if not wait_until(deadline, self.wake_event, self.spin_threshold):
+                    self.wake_event.clear()
+                    continue
+                ready = time.perf_counter()
+                due = int((ready - anchor) * rate) + 1 - done
+                if due > rate * BACKLOG:
+                    # Too far behind to catch up without a long burst
+                    CLICKS_MISSED.add(due - 1)
+                    anchor = time.perf_counter()
+                    done = 0
+                    due = 1
+                batch = min(max(due, self.batch_for(rate)), MAX_BATCH)
+            if remaining is not None:
+                batch = min(batch, remaining)
+
+            start = time.perf_counter()
+            if targets == 1:
+                plan = plans[0]
+                button, clicks, position = plan.button, plan.clicks, plan.position
+                for _ in range(batch):
+                    click(button, clicks, position)
+            else:
+                first = self.clicks
+                for index in range(first, first + batch):
+                    plan = plans[index % targets]
+                    click(plan.button, plan.clicks, plan.position)
+            clicked = time.perf_counter()
+            flush()
+            flushed = time.perf_counter()
+            self.batch_size = batch
+            self.clicks += batch
+            done += batch
+            CLICKS.add(batch)
+
+            if flushed - report_time >= REPORT_INTERVAL:
+                self.achieved_rate = (self.clicks - report_clicks) / (flushed - report_time)
+                BURST_RATE.set(self.achieved_rate)
+                report_time = flushed
+                report_clicks = self.clicks
+            if remaining is not None:
+                remaining -= batch
+                if remaining <= 0:
+                    break
+
+            # A batch the thread was preempted in looks far slower than it
+            # is, and would make the next batch bigger and likelier to be
+            # preempted in turn, so a sample can at most double an estimate
+            click_cost, batch_cost = self.click_cost, self.batch_cost
+            click_cost += SMOOTHING * (min((clicked - start) / batch, 2 * click_cost) - click_cost)
+            overhead = time.perf_counter() - ready - (clicked - start)
+            batch_cost += SMOOTHING * (min(overhead, 2 * batch_cost) - batch_cost)
+            self.click_cost, self.batch_cost = click_cost, batch_cost
+        self.elapsed = time.perf_counter() - self.started
+        BURST_RATE.set(0.0)
+
+        if self.on_finished and not self.stop_event.is_set():
+            self.on_finished()
+
+    def summary(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.started if self.started else 0.0)
+        rate = self.clicks / elapsed if elapsed else 0.0
+        return f"{self.clicks} clicks, {rate:.0f} per second in batches of {self.batch_size}"
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
@@ -0,0 +1,210 @@
+import heapq
+import threading
+import time
+
+from ClickPlan import ClickPlan
+from Metrics import CLICK_DELAY, CLICK_INJECT, CLICKS, CLICKS_MISSED
+
+# Sleep until this many seconds before a deadline, then spin for the rest.
+# OS sleeps routinely overshoot by a millisecond or more, spinning does not.
+SPIN_THRESHOLD = 0.002
+
+
+def wait_until(deadline, wake_event, spin_threshold=SPIN_THRESHOLD):
+    # Returns False if wake_event was set before the deadline was reached
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return True
+        if remaining > spin_threshold:
+            if wake_event.wait(remaining - spin_threshold):
+                return False
+        elif wake_event.is_set():
+            return False
+
+
+# Runs a click job: one ClickPlan, or a sequence of them for several targets
+# that each keep their own interval and repeat count. All targets share one
+# thread and a min-heap of (deadline, target) entries, so adding targets
+# costs a heap operation per click rather than a thread each.
+class ClickEngine(threading.Thread):
+    def __init__(self, plan, backend, on_finished=None, spin_threshold=SPIN_THRESHOLD,
+                 error_log=None, gate=None):
+        super().__init__(daemon=True)
+        self.plan = plan
+        self.backend = backend
+        self.gate = gate  # optional watcher each click waits for, see RegionWatcher
+        self.on_finished = on_finished
+        self.spin_threshold = spin_threshold
+        self.error_log = error_log  # optional list that receives every deadline error
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+
+        self.clicks = 0
+        self.last_error = 0.0
+        self.max_error = 0.0
+        self.total_error = 0.0
+
+    def swap_plan(self, plan):
+        # The loop only reads self.plan between clicks, so it never sees half
+        # of one job and half of another. Waking it lets a shorter interval
+        # take effect without waiting out the old one.
+        self.plan = plan
+        self.wake_event.set()
+
+    def run(self):
+        backend = self.backend
+        current = None
+        plans = ()
+        anchors = []
+        ticks = []
+        counts = []
+        streams = []
+        pending = []
+        heap = []
+        while not self.stop_event.is_set():
+            if self.plan is not current:
+                current = self.plan
+                plans, anchors, ticks, counts, streams, pending, heap = self.schedule(
+                    current, plans, anchors, ticks, counts, streams, pending)
+            if not heap:
+                break
+
+            # Deadlines are absolute, so a late click does not push back
+            # every click after it
+            deadline, index = heap[0]
+            scheduled = deadline
+            if not wait_until(deadline, self.wake_event, self.spin_threshold):
+                self.wake_event.clear()
+                continue
+            if self.gate is not None:
+                if not self.gate.wait(self.wake_event):
+                    self.wake_event.clear()
+                    continue
+                # Measure from when the gate opened, not the deadline it held up
+                deadline = max(deadline, time.perf_counter())
+            start = time.perf_counter()
+            plan = plans[index]
+            stream = streams[index]
+            if stream is None:
+                backend.click(plan.button, plan.clicks, plan.position)
+            else:
+                delay, dx, dy = pending[index]
+                position = plan.position
+                if position is not None:
+                    position = (position[0] + dx, position[1] + dy)
+                backend.click(plan.button, plan.clicks, position)
+            self.record_error(start - deadline)
+            CLICK_INJECT.record(time.perf_counter() - start)
+
+            counts[index] += 1
+            if plan.repeat is not None and counts[index] >= plan.repeat:
+                heapq.heappop(heap)
+            elif stream is not None:
+                # Humanized: the next deadline is this one plus the delay
+                # drawn for this click. There is no grid to skip ahead on, so
+                # when that is already more than a delay past, the schedule
+                # resumes from now and keeps its sequence of draws.
+                next_deadline = scheduled + delay
+                pending[index] = delay, dx, dy = next(stream)
+                now = time.perf_counter()
+                if now - next_deadline > delay:
+                    CLICKS_MISSED.add(int((now - next_deadline) / plan.interval))
+                    next_deadline = now
+                # A humanized target's anchor is its next deadline, its tick always 0
+                anchors[index] = next_deadline
+                heapq.heapreplace(heap, (next_deadline, index))
+            else:
+                # Skip ticks we are already too late for instead of bursting
+                # through them to catch up
+                ticks[index] += 1
+                now = time.perf_counter()
+                if now - (anchors[index] + ticks[index] * plan.interval) > plan.interval:
+                    skipped = int((now - anchors[index]) / plan.interval) + 1
+                    CLICKS_MISSED.add(skipped - ticks[index])
+                    ticks[index] = skipped
+                heapq.heapreplace(heap, (anchors[index] + ticks[index] * plan.interval, index))
+
+            # Targets due at the same moment go out in a single flush
+            if not heap or heap[0][0] > time.perf_counter():
+                backend.flush()
+        backend.flush()
+
+        if self.on_finished and not self.stop_event.is_set():
+            self.on_finished()
+
+    @staticmethod
+    def schedule(job, old_plans, old_anchors, old_ticks, old_counts, old_streams, old_pending):
+        plans = (job,) if isinstance(job, ClickPlan) else tuple(job)
+        # New humanized streams are started and their first delay drawn
+        # before taking the time: importing NumPy and the first draw take
+        # around 15 ms cold, which would otherwise make the first click late
+        fresh = []
+        for index, plan in enumerate(plans):
+            old = old_plans[index] if index < len(old_plans) else None
+            if plan.humanize is None or old is not None and (plan.interval, plan.humanize) == (
+                    old.interval, old.humanize):
+                fresh.append((None, None))
+                continue
+            from ClickSchedule import schedule_stream
+            stream = schedule_stream(plan)
+            fresh.append((stream, next(stream)))
+        now = time.perf_counter()
+        anchors = []
+        ticks = []
+        counts = []
+        streams = []
+        pending = []
+        heap = []
+        for index, plan in enumerate(plans):
+            anchor, tick, count = now, 0, 0
+            stream, drawn = None, None
+            old = old_plans[index] if index < len(old_plans) else None
+            if old is not None and plan.humanize is not None and (plan.interval, plan.humanize) == (
+                    old.interval, old.humanize):
+                # Same distribution, so carry on with the same schedule
+                stream, drawn = old_streams[index], old_pending[index]
+                anchor, count = old_anchors[index], old_counts[index]
+            elif old is not None and old.humanize is not None:
+                # The click already drawn keeps its deadline
+                anchor, count = old_anchors[index], old_counts[index]
+            elif old is not None and old_ticks[index]:
+                # Measure the new interval from the last deadline this target fired on
+                anchor = old_anchors[index] + (old_ticks[index] - 1) * old.interval
+                tick = 1
+                count = old_counts[index]
+            if plan.humanize is not None and stream is None:
+                stream, drawn = fresh[index]
+                if tick:
+                    anchor, tick = anchor + drawn[0], 0
+            anchors.append(anchor)
+            ticks.append(tick)
+            counts.append(count)
+            streams.append(stream)
+            pending.append(drawn)
+            if plan.repeat is None or count < plan.repeat:
+                heap.append((anchor + tick * plan.interval, index))
+        heapq.heapify(heap)
+        return plans, anchors, ticks, counts, streams, pending, heap
+
+    def record_error(self, error):
+        CLICK_DELAY.record(error)
+        CLICKS.add()
+        self.clicks += 1
+        self.last_error = error
+        self.total_error += error
+        if error > self.max_error:
+            self.max_error = error
+        if self.error_log is not None:
+            self.error_log.append(error)
+
+    def mean_error(self):
+        return self.total_error / self.clicks if self.clicks else 0.0
+
+    def summary(self):
+        return (f"{self.clicks} clicks, mean error {self.mean_error() * 1000:.3f} ms, "
+                f"max error {self.max_error * 1000:.3f} ms")
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+
+
+# Randomness layered over a plan's fixed interval and position. The engine
+# draws it from a stream precomputed in blocks (see ClickSchedule), so none
+# of it is computed per click. Equal seeds give equal schedules.
+@dataclass(frozen=True)
+class Humanize:
+    jitter: float = 0.0  # standard deviation of each interval, seconds
+    min_interval: float = 0.0  # intervals are never shorter than this after jitter
+    offset: int = 0  # clicks land up to this many pixels from the position
+    offset_sigma: float = None  # Gaussian offsets with this deviation, clipped to offset; None for uniform
+    pause_every: int = 0  # a pause after every this many clicks, 0 for none
+    pause: float = 0.0  # mean pause length, seconds
+    pause_jitter: float = 0.0  # standard deviation of the pause length
+    seed: int = None  # None for a different schedule every run
+
+
+# Everything the click engine needs for a run, resolved from the widgets once
+# so the hot loop never touches Qt. Frozen, so a running engine can be handed
+# a new plan by plain assignment.
+@dataclass(frozen=True)
+class ClickPlan:
+    interval: float  # seconds
+    button: str = "left"
+    clicks: int = 1
+    position: tuple = None  # None clicks wherever the mouse is
+    repeat: int = None  # None clicks until stopped
+    humanize: Humanize = None  # offsets only apply with a position
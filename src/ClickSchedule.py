@@ -0,0 +1,61 @@
+import numpy as np
+
+from ClickPlan import Humanize
+
+# Clicks generated per block. A block is a few vectorized draws, about a
+# tenth of a millisecond at this size, so no single click waits long on one.
+BLOCK_SIZE = 4096
+
+
+# Yields (delays, dxs, dys) arrays of block_size clicks for a humanized plan:
+# the delay after each click, and each click's offset from the position.
+# Intervals, pauses and offsets each draw from their own generator seeded
+# from plan.humanize.seed, so a seed gives the same schedule whatever the
+# block size.
+def schedule_blocks(plan, block_size=BLOCK_SIZE):
+    humanize = plan.humanize or Humanize()
+    interval_rng, pause_rng, offset_rng = (
+        np.random.default_rng(seed) for seed in np.random.SeedSequence(humanize.seed).spawn(3))
+    generated = 0
+    while True:
+        if humanize.jitter:
+            delays = interval_rng.normal(plan.interval, humanize.jitter, block_size)
+            np.maximum(delays, humanize.min_interval, out=delays)
+        else:
+            delays = np.full(block_size, float(plan.interval))
+
+        if humanize.pause_every:
+            # The pause goes after the last click of every pause_every
+            first = -(generated + 1) % humanize.pause_every
+            count = len(range(first, block_size, humanize.pause_every))
+            pauses = np.full(count, humanize.pause)
+            if humanize.pause_jitter:
+                pauses = np.maximum(pause_rng.normal(humanize.pause, humanize.pause_jitter, count), 0.0)
+            delays[first::humanize.pause_every] += pauses
+
+        if humanize.offset:
+            bound = humanize.offset
+            if humanize.offset_sigma:
+                offsets = np.clip(np.rint(offset_rng.normal(0.0, humanize.offset_sigma, (block_size, 2))),
+                                  -bound, bound)
+            else:
+                offsets = offset_rng.integers(-bound, bound, (block_size, 2), endpoint=True)
+            dxs, dys = offsets.astype(np.int32).T
+        else:
+            dxs = dys = np.zeros(block_size, np.int32)
+        generated += block_size
+        yield delays, dxs, dys
+
+
+# The same schedule one click at a time as (delay, dx, dy). Each block is
+# converted to Python numbers in one go, so taking a click is a single
+# step of a zip iterator however long the run.
+def schedule_stream(plan, block_size=BLOCK_SIZE):
+    for delays, dxs, dys in schedule_blocks(plan, block_size):
+        yield from zip(delays.tolist(), dxs.tolist(), dys.tolist())
+
+
+def preview(plan, clicks):
+    # The first clicks of a schedule as arrays, for checking a set of options
+    delays, dxs, dys = next(schedule_blocks(plan, clicks))
+    return {"delays": delays, "dxs": dxs, "dys": dys, "times": np.cumsum(delays) - delays}
@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import tempfile
+
+# Client for the local control API (see ControlServer). Imports nothing from
+# the rest of AutoClicker, so a test harness can copy this one file.
+#
+# The protocol is one JSON value per line each way. A request is a command,
+# {"cmd": "click", "interval": 0.01}, or a list of them run in order as a
+# batch; the reply is one result, or a list with one per command, each
+# {"ok": true, "result": ...} or {"ok": false, "error": "..."}. Over TCP the
+# first line has to be {"token": "..."}, answered the same way.
+
+SOCKET_NAME = "autoclicker.sock"
+TOKEN_VARIABLE = "AUTOCLICKER_CONTROL_TOKEN"
+
+
+def default_socket_path():
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, SOCKET_NAME)
+
+
+class ControlError(Exception):
+    pass
+
+
+class ControlClient:
+    # token is only used over TCP, and defaults to AUTOCLICKER_CONTROL_TOKEN
+    def __init__(self, path=None, host="127.0.0.1", port=None, timeout=10.0, token=None):
+        if port is not None:
+            self.sock = socket.create_connection((host, port), timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path or default_socket_path())
+        self.reader = self.sock.makefile('rb')
+        if port is not None:
+            reply = self.request({"token": token or os.environ.get(TOKEN_VARIABLE, "")})
+            if not reply["ok"]:
+                self.close()
+                raise ControlError(reply["error"])
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, request):
+        self.sock.sendall(json.dumps(request).encode() + b'\n')
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("control server closed the connection")
+        return json.loads(line)
+
+    def call(self, cmd, **args):
+        reply = self.request(dict(args, cmd=cmd))
+        if not reply["ok"]:
+            raise ControlError(reply["error"])
+        return reply.get("result")
+
+    def batch(self, commands):
+        # Runs (cmd, args) pairs in one round trip. Returns their results, or
+        # raises ControlError for the first that failed; the rest still ran.
+        replies = self.request([dict(args, cmd=cmd) for cmd, args in commands])
+        for (cmd, _), reply in zip(commands, replies):
+            if not reply["ok"]:
+                raise ControlError(f"{cmd}: {reply['error']}")
+        return [reply.get("result") for reply in replies]
+
+    def ping(self):
+        return self.call("ping")
+
+    def click(self, interval, positions=None, button="left", double=False, repeat=None, humanize=None):
+        # Starts clicking, or switches a running job to these settings
+        return self.call("click", interval=interval, positions=positions, button=button,
+                         double=double, repeat=repeat, humanize=humanize)
+
+    def burst(self, rate=None, positions=None, button="left", double=False, repeat=None):
+        # Clicks rate times a second, or as fast as possible when None;
+        # status() reports the rate achieved
+        return self.call("burst", rate=rate, positions=positions, button=button,
+                         double=double, repeat=repeat)
+
+    def stop_clicking(self):
+        return self.call("stop_clicking")
+
+    def load(self, path):
+        return self.call("load", path=path)
+
+    def play(self, path=None, speed=1.0, mode="realtime", start=0.0, end=None, loops=1):
+        return self.call("play", path=path, speed=speed, mode=mode, start=start, end=end, loops=loops)
+
+    def pause(self):
+        return self.call("pause")
+
+    def resume(self):
+        return self.call("resume")
+
+    def stop_playing(self):
+        return self.call("stop_playing")
+
+    def stop(self):
+        return self.call("stop")
+
+    def wait(self, timeout=None):
+        return self.call("wait", timeout=timeout)
+
+    def status(self):
+        return self.call("status")
+
+    def stats(self):
+        return self.call("stats")
+
+    def reset_stats(self):
+        return self.call("reset_stats")
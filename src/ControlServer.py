@@ -0,0 +1,334 @@
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import replace
+
+import Metrics
+from BurstEngine import BurstEngine
+from ClickEngine import ClickEngine
+from ClickPlan import ClickPlan, Humanize
+from ControlClient import TOKEN_VARIABLE, default_socket_path
+from Playback import REALTIME, FAST, RESAMPLE
+
+# Local control API: drives the click engine and the playback engine from
+# other processes. Each connection gets a thread that reads commands and runs
+# them on that thread, straight against the engines, so nothing waits on the
+# Qt event loop; the window, when there is one, is told what changed
+# afterwards. See ControlClient for the protocol.
+
+MODES = (REALTIME, FAST, RESAMPLE)
+
+
+# Runs control commands. Owns the click engine it starts and shares the
+# playback engine it is given, so a window and the API act on the same jobs.
+# on_change(what), with what "clicking", "playback" or "recording", is called
+# after a command or a finished job changes one of them; it runs on whatever
+# thread made the change and must not block.
+class Controller:
+    def __init__(self, backend, player, on_change=None):
+        self.backend = backend
+        self.player = player
+        self.on_change = on_change
+        self.engine = None
+        self.recording = None
+        self.recording_path = None
+        self.lock = threading.Lock()  # one command at a time across connections
+        self.commands = {
+            "ping": self.ping,
+            "click": self.click,
+            "burst": self.burst,
+            "stop_clicking": self.stop_clicking,
+            "load": self.load,
+            "play": self.play,
+            "pause": self.pause,
+            "resume": self.resume,
+            "stop_playing": self.stop_playing,
+            "stop": self.stop,
+            "wait": self.wait,
+            "status": self.status,
+            "stats": self.stats,
+            "reset_stats": self.reset_stats,
+        }
+        self.blocking = {"wait"}  # run without the lock so other connections go on
+
+    def dispatch(self, command):
+        # Runs one {"cmd": name, ...arguments} command and returns its reply
+        try:
+            args = dict(command)
+            name = args.pop("cmd", None)
+            handler = self.commands.get(name)
+            if handler is None:
+                raise ValueError(f"unknown command {name!r}")
+            if name in self.blocking:
+                result = handler(**args)
+            else:
+                with self.lock:
+                    result = handler(**args)
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": True, "result": result}
+
+    def changed(self, what):
+        if self.on_change:
+            self.on_change(what)
+
+    def is_clicking(self):
+        return self.engine is not None and self.engine.is_alive()
+
+    def ping(self):
+        return "pong"
+
+    def click(self, interval, positions=None, button="left", double=False, repeat=None, humanize=None):
+        if interval <= 0:
+            raise ValueError("interval must be greater than zero")
+        plan = self.compile_plan(interval, positions, button, double, repeat,
+                                 Humanize(**humanize) if humanize else None)
+        if self.is_clicking() and isinstance(self.engine, ClickEngine):
+            # Same as changing options in the window: the running job takes
+            # the new plan between two clicks. A burst or an image trigger
+            # the window started is stopped for a plain click job instead.
+            self.engine.swap_plan(plan)
+            return {"started": False}
+        self.stop_clicking()
+        return self.start_engine(ClickEngine(plan, self.backend, on_finished=lambda: self.changed("clicking")))
+
+    def burst(self, rate=None, positions=None, button="left", double=False, repeat=None):
+        # rate clicks per second, or as many as possible when None
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be greater than zero")
+        plan = self.compile_plan(0.0, positions, button, double, repeat)
+        if self.is_clicking() and isinstance(self.engine, BurstEngine):
+            self.engine.swap_plan(plan)
+            self.engine.set_rate(rate)
+            return {"started": False}
+        self.stop_clicking()
+        return self.start_engine(BurstEngine(plan, self.backend, rate,
+                                             on_finished=lambda: self.changed("clicking")))
+
+    def compile_plan(self, interval, positions, button, double, repeat, humanize=None):
+        plan = ClickPlan(interval=interval, button=button, clicks=2 if double else 1, repeat=repeat,
+                         humanize=humanize)
+        if positions:
+            plan = tuple(replace(plan, position=tuple(position)) for position in positions)
+            if len(plan) == 1:
+                plan = plan[0]
+        return plan
+
+    def start_engine(self, engine):
+        self.engine = engine
+        engine.start()
+        self.changed("clicking")
+        return {"started": True}
+
+    def stop_clicking(self):
+        if not self.is_clicking():
+            return None
+        self.engine.stop()
+        self.engine.join()
+        self.changed("clicking")
+        return self.click_status()
+
+    def load(self, path):
+        from RecordingFile import load_recording
+        self.recording = load_recording(path)
+        self.recording_path = path
+        self.changed("recording")
+        return self.recording_status()
+
+    def play(self, path=None, speed=1.0, mode=REALTIME, start=0.0, end=None, loops=1):
+        from RecordingSegments import Segment, loop
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if path is not None:
+            self.load(path)
+        if self.recording is None:
+            raise ValueError("no recording loaded")
+        actions = self.recording
+        if start or end is not None:
+            actions = Segment(actions, start, end)
+        if loops > 1:
+            actions = loop(actions, loops)
+        self.player.play(actions, speed=speed, mode=mode,
+                         on_finished=lambda completed: self.changed("playback"))
+        self.changed("playback")
+        return {"events": len(actions), "duration": actions.duration() / speed}
+
+    def pause(self):
+        self.player.pause()
+        self.changed("playback")
+
+    def resume(self):
+        self.player.resume()
+        self.changed("playback")
+
+    def stop_playing(self):
+        if self.player.is_playing():
+            self.player.cancel()
+            self.player.future.exception()  # waits for the release of held keys
+            self.changed("playback")
+
+    def stop(self):
+        self.stop_playing()
+        return self.stop_clicking()
+
+    def wait(self, timeout=None):
+        # Blocks until clicking and playback have both finished; False if
+        # timeout seconds passed first
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        engine = self.engine
+        if engine is not None:
+            engine.join(None if deadline is None else max(deadline - time.perf_counter(), 0))
+            if engine.is_alive():
+                return False
+        future = self.player.future
+        if future is not None:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            try:
+                future.exception(remaining)
+            except TimeoutError:
+                return False
+        return True
+
+    def click_status(self):
+        # The engine is whatever the API or the window started last: a click
+        # job, a burst, or an image trigger
+        engine = self.engine
+        if engine is None:
+            return None
+        if isinstance(engine, ClickEngine):
+            return {"clicks": engine.clicks, "mean_error": engine.mean_error(),
+                    "max_error": engine.max_error}
+        if isinstance(engine, BurstEngine):
+            return {"clicks": engine.clicks, "target_rate": engine.rate,
+                    "achieved_rate": engine.achieved_rate, "batch_size": engine.batch_size}
+        from TemplateMatcher import TemplateTrigger
+        if isinstance(engine, TemplateTrigger):
+            return {"clicks": engine.clicks, "frames": engine.frames,
+                    "match_time": engine.match_time}
+        raise TypeError(f"unknown click engine {type(engine).__name__}")
+
+    def recording_status(self):
+        if self.recording is None:
+            return None
+        return {"path": self.recording_path, "events": len(self.recording),
+                "duration": self.recording.duration()}
+
+    def status(self):
+        return {"clicking": self.is_clicking(), "click": self.click_status(),
+                "playing": self.player.is_playing(), "paused": self.player.paused,
+                "recording": self.recording_status()}
+
+    def stats(self):
+        return Metrics.REGISTRY.summary()
+
+    def reset_stats(self):
+        Metrics.REGISTRY.reset()
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        if self.server.token is not None and not self.authenticate():
+            return
+        dispatch = self.server.controller.dispatch
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply = {"ok": False, "error": f"bad request: {e}"}
+            else:
+                if isinstance(request, list):
+                    reply = [dispatch(command) for command in request]
+                else:
+                    reply = dispatch(request)
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+    def authenticate(self):
+        # The first line has to be {"token": ...} with the server's token;
+        # the connection is closed after anything else
+        try:
+            token = json.loads(self.rfile.readline())["token"]
+            ok = hmac.compare_digest(str(token).encode(), self.server.token.encode())
+        except (ValueError, TypeError, KeyError):
+            ok = False
+        reply = {"ok": True, "result": None} if ok else {"ok": False, "error": "bad token"}
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+        return ok
+
+
+class UnixControlServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class TCPControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Serves a Controller on a Unix socket at path (the default), or on
+# host:port when a port is given. Anyone who can connect can click and type
+# as the user, so the socket file is created readable by its owner alone.
+# Localhost TCP is open to every account on the machine, so a TCP client
+# has to send token first, which is made up when none is given; pass it on
+# to clients through AUTOCLICKER_CONTROL_TOKEN.
+class ControlServer:
+    def __init__(self, controller, path=None, host="127.0.0.1", port=None, token=None):
+        self.controller = controller
+        self.path = None if port is not None else path or default_socket_path()
+        self.host = host
+        self.port = port
+        self.token = None if port is None else token or secrets.token_urlsafe(16)
+        self.server = None
+
+    def start(self):
+        if self.path:
+            if os.path.exists(self.path):
+                os.remove(self.path)  # left behind by a run that did not exit cleanly
+            # Made private as it is created, not chmod-ed after bind, which
+            # would leave it open to other users in between
+            umask = os.umask(0o077)
+            try:
+                self.server = UnixControlServer(self.path, ControlHandler)
+            finally:
+                os.umask(umask)
+        else:
+            self.server = TCPControlServer((self.host, self.port), ControlHandler)
+            self.port = self.server.server_address[1]  # the real one when 0 was asked for
+        self.server.controller = self.controller
+        self.server.token = self.token
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            self.server = None
+
+
+def server_from_env(controller):
+    # AUTOCLICKER_CONTROL_SOCKET (a path, or "default") or
+    # AUTOCLICKER_CONTROL_PORT turns the server on; returns it started, or
+    # None when neither is set. TCP needs AUTOCLICKER_CONTROL_TOKEN as well,
+    # since the window has nowhere to show a made up one.
+    path = os.environ.get("AUTOCLICKER_CONTROL_SOCKET")
+    port = os.environ.get("AUTOCLICKER_CONTROL_PORT")
+    token = os.environ.get(TOKEN_VARIABLE)
+    if not path and not port:
+        return None
+    if port and not token:
+        raise ValueError(f"AUTOCLICKER_CONTROL_PORT needs {TOKEN_VARIABLE} to be set too")
+    if path == "default":
+        path = None
+    return ControlServer(controller, path=path, port=int(port) if port else None, token=token).start()
@@ -0,0 +1,202 @@
+import os
+import select
+import sys
+import threading
+import time
+
+from KeyCodes import KEYSYM_VKS, name_keysym
+
+# Global hotkeys, delivered on a backend thread of their own rather than
+# through the GUI event loop, so an action can take effect while the GUI is
+# busy. Each backend calls callback(hotkey_id, pressed_at) with pressed_at
+# from time.perf_counter() taken as soon as the key press was seen.
+
+# Modifier bits, the same values as the Windows MOD_* flags
+MOD_ALT = 0x0001
+MOD_CONTROL = 0x0002
+MOD_SHIFT = 0x0004
+MODIFIERS = {"ALT": MOD_ALT, "CTRL": MOD_CONTROL, "CONTROL": MOD_CONTROL, "SHIFT": MOD_SHIFT}
+
+
+def parse_hotkey(text):
+    # "Ctrl+Shift+F6" -> (keysym, modifiers); keysym is None if the key is unknown
+    keysym = None
+    modifiers = 0
+    for part in text.upper().split('+'):
+        part = part.strip()
+        if part in MODIFIERS:
+            modifiers |= MODIFIERS[part]
+        elif part:
+            keysym = name_keysym(part)
+    return keysym, modifiers
+
+
+class HotkeyBackend:
+    def __init__(self):
+        self.hotkeys = {}  # hotkey id -> (keysym, modifiers)
+        self.callback = None
+
+    # Hotkeys registered while running take effect on the next start()
+    def register(self, hotkey_id, keysym, modifiers=0):
+        self.hotkeys[hotkey_id] = (keysym, modifiers)
+
+    def clear(self):
+        self.hotkeys.clear()
+
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+
+# Delivers whatever is passed to press() on the caller's thread. Used where
+# there is no global hotkey support, and to measure dispatch.
+class SyntheticHotkeyBackend(HotkeyBackend):
+    def start(self, callback):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def press(self, hotkey_id):
+        if self.callback and hotkey_id in self.hotkeys:
+            self.callback(hotkey_id, time.perf_counter())
+
+
+# RegisterHotKey against a thread of our own instead of a window, so WM_HOTKEY
+# arrives in that thread's message queue and never waits on the GUI.
+class WindowsHotkeyBackend(HotkeyBackend):
+    WM_HOTKEY = 0x0312
+    WM_QUIT = 0x0012
+    MOD_NOREPEAT = 0x4000  # one message per press, not one per autorepeat
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.thread = None
+
+    def start(self, callback):
+        self.callback = callback
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def pump(self):
+        ctypes, user32 = self.ctypes, self.user32
+        self.thread_id = self.kernel32.GetCurrentThreadId()
+        registered = []
+        for hotkey_id, (keysym, modifiers) in self.hotkeys.items():
+            vk = KEYSYM_VKS.get(keysym)
+            if vk is None or not user32.RegisterHotKey(None, hotkey_id, modifiers | self.MOD_NOREPEAT, vk):
+                print(f"Failed to register hotkey ID {hotkey_id}")
+            else:
+                registered.append(hotkey_id)
+        self.ready.set()
+        msg = self.wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            if msg.message == self.WM_HOTKEY:
+                self.callback(msg.wParam, time.perf_counter())
+        for hotkey_id in registered:
+            user32.UnregisterHotKey(None, hotkey_id)
+
+    def stop(self):
+        if self.thread:
+            self.user32.PostThreadMessageW(self.thread_id, self.WM_QUIT, 0, 0)
+            self.thread.join()
+            self.thread = None
+
+
+# Grabs each key on the X root window with a connection of its own and waits
+# for presses on a listener thread. Every hotkey is grabbed once per Caps
+# Lock/Num Lock combination so those do not stop it from firing.
+class X11HotkeyBackend(HotkeyBackend):
+    def __init__(self, display=None):
+        super().__init__()
+        from Xlib import X, error
+        from Xlib.display import Display
+        self.X = X
+        self.error = error
+        self.display = Display(display)
+        self.root = self.display.screen().root
+        self.lock_masks = (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask)
+        self.modifier_masks = {MOD_ALT: X.Mod1Mask, MOD_CONTROL: X.ControlMask, MOD_SHIFT: X.ShiftMask}
+        self.thread = None
+
+    def start(self, callback):
+        X = self.X
+        self.callback = callback
+        self.grabs = {}  # (keycode, modifier mask) -> hotkey id
+        for hotkey_id, (keysym, modifiers) in self.hotkeys.items():
+            keycode = self.display.keysym_to_keycode(keysym) if keysym else 0
+            mask = 0
+            for flag, x_mask in self.modifier_masks.items():
+                if modifiers & flag:
+                    mask |= x_mask
+            catcher = self.error.CatchError(self.error.BadAccess)
+            for lock in self.lock_masks:
+                if keycode:
+                    self.root.grab_key(keycode, mask | lock, True, X.GrabModeAsync, X.GrabModeAsync,
+                                       onerror=catcher)
+            self.display.sync()
+            if not keycode or catcher.get_error():
+                # BadAccess means another client already holds the combination
+                print(f"Failed to register hotkey ID {hotkey_id}")
+                continue
+            self.grabs[(keycode, mask)] = hotkey_id
+        self.wake_read, self.wake_write = os.pipe()
+        self.thread = threading.Thread(target=self.listen, daemon=True)
+        self.thread.start()
+
+    def listen(self):
+        X = self.X
+        ignored = X.LockMask | X.Mod2Mask
+        release = None
+        while True:
+            readable, _, _ = select.select([self.display.fileno(), self.wake_read], [], [])
+            if self.wake_read in readable:
+                break
+            for _ in range(self.display.pending_events()):
+                event = self.display.next_event()
+                if event.type == X.KeyRelease:
+                    release = (event.detail, event.time)
+                elif event.type == X.KeyPress:
+                    pressed_at = time.perf_counter()
+                    # Autorepeat sends a release and a press with the same timestamp
+                    if (event.detail, event.time) == release:
+                        continue
+                    hotkey_id = self.grabs.get((event.detail, event.state & ~ignored))
+                    if hotkey_id is not None:
+                        self.callback(hotkey_id, pressed_at)
+
+    def stop(self):
+        if not self.thread:
+            return
+        os.write(self.wake_write, b'\0')
+        self.thread.join()
+        self.thread = None
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+        for keycode, mask in self.grabs:
+            for lock in self.lock_masks:
+                self.root.ungrab_key(keycode, mask | lock)
+        self.display.sync()
+
+
+def create_hotkey_backend():
+    try:
+        if sys.platform == "win32":
+            return WindowsHotkeyBackend()
+        if sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+            return X11HotkeyBackend()
+    except Exception as e:
+        print(f"Global hotkeys unavailable ({e})")
+        return SyntheticHotkeyBackend()
+    print("Hotkey registration not supported on this platform")
+    return SyntheticHotkeyBackend()
@@ -0,0 +1,238 @@
+import os
+import sys
+
+from KeyCodes import keysym_name
+
+
+# Every backend buffers what it is told to do until flush() is called, so a
+# caller injecting several events for the same instant pays for one round
+# trip. Backends that cannot buffer simply send immediately.
+class InputBackend:
+    name = "base"
+
+    def position(self):
+        raise NotImplementedError
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def button_down(self, button="left"):
+        raise NotImplementedError
+
+    def button_up(self, button="left"):
+        raise NotImplementedError
+
+    def scroll(self, amount):
+        raise NotImplementedError
+
+    # Keys are X11 keysyms, as stored in recordings
+    def key_down(self, keysym):
+        raise NotImplementedError
+
+    def key_up(self, keysym):
+        raise NotImplementedError
+
+    # Returns the pixels of a (left, top, width, height) screen region as a
+    # height x width x 3 RGB uint8 NumPy array
+    def grab(self, region):
+        raise NotImplementedError
+
+    def click(self, button="left", clicks=1, position=None):
+        if position:
+            self.move(position[0], position[1])
+        for _ in range(clicks):
+            self.button_down(button)
+            self.button_up(button)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiBackend(InputBackend):
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        pyautogui.PAUSE = 0  # The callers do their own pacing
+        self.pyautogui = pyautogui
+
+    def position(self):
+        x, y = self.pyautogui.position()
+        return x, y
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def button_down(self, button="left"):
+        self.pyautogui.mouseDown(button=button)
+
+    def button_up(self, button="left"):
+        self.pyautogui.mouseUp(button=button)
+
+    def scroll(self, amount):
+        self.pyautogui.scroll(amount)
+
+    def key_down(self, keysym):
+        name = keysym_name(keysym)
+        if name:
+            self.pyautogui.keyDown(name)
+
+    def key_up(self, keysym):
+        name = keysym_name(keysym)
+        if name:
+            self.pyautogui.keyUp(name)
+
+    def grab(self, region):
+        import numpy as np
+        return np.asarray(self.pyautogui.screenshot(region=region).convert('RGB'))
+
+    def click(self, button="left", clicks=1, position=None):
+        if position:
+            self.pyautogui.click(x=position[0], y=position[1], button=button, clicks=clicks)
+        else:
+            self.pyautogui.click(button=button, clicks=clicks)
+
+
+# Talks XTest straight to the X server. fake_input only queues a request in
+# the client's output buffer, so nothing is sent until flush(). One backend
+# is shared by the window, the engine threads and the control server, so the
+# display is opened with python-xlib's thread locking on; without it, calls
+# from two threads can interleave their requests on the socket.
+class XTestBackend(InputBackend):
+    name = "xtest"
+
+    BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+    def __init__(self, display=None):
+        import Xlib.threaded  # installs real locks; must come before the Display is opened
+        from Xlib import X
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+        self.X = X
+        self.xtest = xtest
+        self.display = Display(display)
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError("X server does not support the XTEST extension")
+        self.root = self.display.screen().root
+
+    def position(self):
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def move(self, x, y):
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+
+    def button_down(self, button="left"):
+        self.xtest.fake_input(self.display, self.X.ButtonPress, self.BUTTONS[button])
+
+    def button_up(self, button="left"):
+        self.xtest.fake_input(self.display, self.X.ButtonRelease, self.BUTTONS[button])
+
+    def scroll(self, amount):
+        # X reports wheel steps as presses of buttons 4 (up) and 5 (down)
+        detail = 4 if amount > 0 else 5
+        for _ in range(abs(amount)):
+            self.xtest.fake_input(self.display, self.X.ButtonPress, detail)
+            self.xtest.fake_input(self.display, self.X.ButtonRelease, detail)
+
+    def key_down(self, keysym):
+        keycode = self.display.keysym_to_keycode(keysym)
+        if keycode:
+            self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+
+    def key_up(self, keysym):
+        keycode = self.display.keysym_to_keycode(keysym)
+        if keycode:
+            self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+
+    def grab(self, region):
+        import numpy as np
+        left, top, width, height = region
+        image = self.root.get_image(left, top, width, height, self.X.ZPixmap, 0xffffffff)
+        # ZPixmap on a 24/32-bit visual is BGRX
+        pixels = np.frombuffer(image.data, dtype=np.uint8).reshape(height, width, 4)
+        return pixels[..., 2::-1]
+
+    def flush(self):
+        self.display.flush()
+
+    def close(self):
+        self.display.close()
+
+
+# Injects nothing. Keeps a log of what it was asked to do (unless record is
+# False) so the engines can be measured and exercised without a display.
+class NullBackend(InputBackend):
+    name = "null"
+
+    def __init__(self, record=True, position=(0, 0), screen=None):
+        self.record = record
+        self.events = []
+        self.count = 0
+        self.flushes = 0
+        self.x, self.y = position
+        self.screen = screen  # RGB array grab() cuts regions from; set it to fake the screen
+
+    def grab(self, region):
+        left, top, width, height = region
+        return self.screen[top:top + height, left:left + width]
+
+    def position(self):
+        return self.x, self.y
+
+    def move(self, x, y):
+        self.x, self.y = x, y
+        self.count += 1
+        if self.record:
+            self.events.append(("move", x, y))
+
+    def button_down(self, button="left"):
+        self.count += 1
+        if self.record:
+            self.events.append(("down", button))
+
+    def button_up(self, button="left"):
+        self.count += 1
+        if self.record:
+            self.events.append(("up", button))
+
+    def scroll(self, amount):
+        self.count += 1
+        if self.record:
+            self.events.append(("scroll", amount))
+
+    def key_down(self, keysym):
+        self.count += 1
+        if self.record:
+            self.events.append(("key_down", keysym))
+
+    def key_up(self, keysym):
+        self.count += 1
+        if self.record:
+            self.events.append(("key_up", keysym))
+
+    def flush(self):
+        self.flushes += 1
+
+
+BACKENDS = {
+    "pyautogui": PyAutoGuiBackend,
+    "xtest": XTestBackend,
+    "null": NullBackend,
+}
+
+
+def create_backend(name=None):
+    name = name or os.environ.get("AUTOCLICKER_BACKEND", "auto")
+    if name != "auto":
+        return BACKENDS[name]()
+    # Prefer the direct X path on Linux, fall back to pyautogui anywhere else
+    if sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+        try:
+            return XTestBackend()
+        except Exception as e:
+            print(f"XTest backend unavailable ({e}), falling back to pyautogui")
+    return PyAutoGuiBackend()
@@ -0,0 +1,243 @@
+import os
+import sys
+import threading
+import time
+
+from ActionRecording import MOVE, DOWN, UP, SCROLL, KEY_DOWN, KEY_UP, BUTTON_CODES
+from KeyCodes import VK_KEYSYMS
+
+# Event sources deliver input as it happens instead of being polled. Each one
+# calls callback(time, event, x, y, button, data) from its own thread, with
+# time taken from time.perf_counter(), until stop() returns.
+
+
+class EventSource:
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+
+# Stands in for the OS hooks: whatever is passed to emit() is delivered to
+# the callback on the caller's thread.
+class SyntheticEventSource(EventSource):
+    def __init__(self):
+        self.callback = None
+
+    def start(self, callback):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def emit(self, event, x, y, button=0, data=0, timestamp=None):
+        if self.callback:
+            if timestamp is None:
+                timestamp = time.perf_counter()
+            self.callback(timestamp, event, x, y, button, data)
+
+
+# Fallback for platforms without a hook: polls the pointer, but only reports
+# a move when it actually changed. Cannot see buttons, wheel or keys.
+class PollingEventSource(EventSource):
+    def __init__(self, backend, interval=0.01):
+        self.backend = backend
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def start(self, callback):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.poll, args=(callback,), daemon=True)
+        self.thread.start()
+
+    def poll(self, callback):
+        last = None
+        while not self.stop_event.wait(self.interval):
+            position = self.backend.position()
+            if position != last:
+                callback(time.perf_counter(), MOVE, position[0], position[1], 0, 0)
+                last = position
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+# Uses the X RECORD extension to receive every core input event the server
+# processes. The recording connection blocks in record_enable_context until a
+# second connection disables the context.
+class XRecordEventSource(EventSource):
+    # X button numbers: 1 left, 2 middle, 3 right, 4/5 wheel up/down
+    BUTTONS = {1: BUTTON_CODES['left'], 2: BUTTON_CODES['middle'], 3: BUTTON_CODES['right']}
+
+    def __init__(self, display=None):
+        from Xlib import X
+        from Xlib.display import Display
+        from Xlib.ext import record
+        from Xlib.protocol import rq
+        self.X = X
+        self.record = record
+        self.event_field = rq.EventField(None)
+        self.record_display = Display(display)
+        self.control_display = Display(display)
+        if not self.record_display.has_extension("RECORD"):
+            self.record_display.close()
+            self.control_display.close()
+            raise RuntimeError("X server does not support the RECORD extension")
+
+    def start(self, callback):
+        X = self.X
+        self.callback = callback
+        self.time_offset = None
+        self.context = self.control_display.record_create_context(
+            0, [self.record.AllClients], [{
+                'core_requests': (0, 0), 'core_replies': (0, 0),
+                'ext_requests': (0, 0, 0, 0), 'ext_replies': (0, 0, 0, 0),
+                'delivered_events': (0, 0),
+                'device_events': (X.KeyPress, X.MotionNotify),
+                'errors': (0, 0), 'client_started': False, 'client_died': False,
+            }])
+        self.control_display.sync()
+        self.thread = threading.Thread(target=self.record_display.record_enable_context,
+                                       args=(self.context, self.handle_reply), daemon=True)
+        self.thread.start()
+
+    def handle_reply(self, reply):
+        if reply.category != self.record.FromServer or reply.client_swapped:
+            return
+        X = self.X
+        data = reply.data
+        while len(data):
+            event, data = self.event_field.parse_binary_value(data, self.record_display.display, None, None)
+            # Server timestamps are in milliseconds; anchor them to
+            # perf_counter once so events in one reply keep their spacing
+            if self.time_offset is None:
+                self.time_offset = time.perf_counter() - event.time / 1000
+            t = self.time_offset + event.time / 1000
+            if event.type == X.MotionNotify:
+                self.callback(t, MOVE, event.root_x, event.root_y, 0, 0)
+            elif event.type in (X.ButtonPress, X.ButtonRelease):
+                if event.detail in self.BUTTONS:
+                    code = DOWN if event.type == X.ButtonPress else UP
+                    self.callback(t, code, event.root_x, event.root_y, self.BUTTONS[event.detail], 0)
+                elif event.detail in (4, 5) and event.type == X.ButtonPress:
+                    self.callback(t, SCROLL, event.root_x, event.root_y, 0, 1 if event.detail == 4 else -1)
+            elif event.type in (X.KeyPress, X.KeyRelease):
+                keysym = self.record_display.keycode_to_keysym(event.detail, 0)
+                code = KEY_DOWN if event.type == X.KeyPress else KEY_UP
+                self.callback(t, code, event.root_x, event.root_y, 0, keysym)
+
+    def stop(self):
+        self.control_display.record_disable_context(self.context)
+        self.control_display.flush()
+        self.thread.join()
+        self.control_display.record_free_context(self.context)
+        self.control_display.flush()
+        # A source is started once, so its connections go with it
+        self.record_display.close()
+        self.control_display.close()
+
+
+# Low-level mouse and keyboard hooks. Windows calls them synchronously on the
+# thread that installed them, which has to pump messages until stopped.
+class WindowsHookEventSource(EventSource):
+    WH_KEYBOARD_LL = 13
+    WH_MOUSE_LL = 14
+    WM_QUIT = 0x0012
+    MOUSE_MESSAGES = {
+        0x0200: (MOVE, 0),
+        0x0201: (DOWN, BUTTON_CODES['left']), 0x0202: (UP, BUTTON_CODES['left']),
+        0x0204: (DOWN, BUTTON_CODES['right']), 0x0205: (UP, BUTTON_CODES['right']),
+        0x0207: (DOWN, BUTTON_CODES['middle']), 0x0208: (UP, BUTTON_CODES['middle']),
+        0x020A: (SCROLL, 0),
+    }
+    KEY_MESSAGES = {0x0100: KEY_DOWN, 0x0101: KEY_UP, 0x0104: KEY_DOWN, 0x0105: KEY_UP}
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+        class MSLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [('pt', wintypes.POINT), ('mouseData', wintypes.DWORD),
+                        ('flags', wintypes.DWORD), ('time', wintypes.DWORD),
+                        ('dwExtraInfo', ctypes.c_size_t)]
+
+        class KBDLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [('vkCode', wintypes.DWORD), ('scanCode', wintypes.DWORD),
+                        ('flags', wintypes.DWORD), ('time', wintypes.DWORD),
+                        ('dwExtraInfo', ctypes.c_size_t)]
+
+        self.MSLLHOOKSTRUCT = MSLLHOOKSTRUCT
+        self.KBDLLHOOKSTRUCT = KBDLLHOOKSTRUCT
+        self.HOOKPROC = ctypes.WINFUNCTYPE(ctypes.c_ssize_t, ctypes.c_int,
+                                           wintypes.WPARAM, wintypes.LPARAM)
+        self.user32.SetWindowsHookExW.argtypes = [ctypes.c_int, self.HOOKPROC,
+                                                  wintypes.HINSTANCE, wintypes.DWORD]
+        self.user32.SetWindowsHookExW.restype = wintypes.HHOOK
+        self.user32.CallNextHookEx.argtypes = [wintypes.HHOOK, ctypes.c_int,
+                                               wintypes.WPARAM, wintypes.LPARAM]
+        self.user32.CallNextHookEx.restype = ctypes.c_ssize_t
+        self.kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+    def start(self, callback):
+        self.callback = callback
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def pump(self):
+        ctypes, wintypes, user32 = self.ctypes, self.wintypes, self.user32
+        self.thread_id = self.kernel32.GetCurrentThreadId()
+        # Keep references to the callbacks, or ctypes frees them under Windows
+        self.mouse_proc = self.HOOKPROC(self.on_mouse)
+        self.key_proc = self.HOOKPROC(self.on_key)
+        module = self.kernel32.GetModuleHandleW(None)
+        hooks = [user32.SetWindowsHookExW(self.WH_MOUSE_LL, self.mouse_proc, module, 0),
+                 user32.SetWindowsHookExW(self.WH_KEYBOARD_LL, self.key_proc, module, 0)]
+        self.ready.set()
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            user32.UnhookWindowsHookEx(hook)
+
+    def on_mouse(self, code, wparam, lparam):
+        if code >= 0 and wparam in self.MOUSE_MESSAGES:
+            info = self.ctypes.cast(lparam, self.ctypes.POINTER(self.MSLLHOOKSTRUCT)).contents
+            event, button = self.MOUSE_MESSAGES[wparam]
+            data = 0
+            if event == SCROLL:
+                # The wheel delta is the signed high word, 120 per notch
+                data = self.ctypes.c_short(info.mouseData >> 16).value // 120
+            self.callback(time.perf_counter(), event, info.pt.x, info.pt.y, button, data)
+        return self.user32.CallNextHookEx(None, code, wparam, lparam)
+
+    def on_key(self, code, wparam, lparam):
+        if code >= 0 and wparam in self.KEY_MESSAGES:
+            info = self.ctypes.cast(lparam, self.ctypes.POINTER(self.KBDLLHOOKSTRUCT)).contents
+            keysym = VK_KEYSYMS.get(info.vkCode)
+            if keysym:
+                self.callback(time.perf_counter(), self.KEY_MESSAGES[wparam], 0, 0, 0, keysym)
+        return self.user32.CallNextHookEx(None, code, wparam, lparam)
+
+    def stop(self):
+        self.user32.PostThreadMessageW(self.thread_id, self.WM_QUIT, 0, 0)
+        self.thread.join()
+
+
+def create_event_source(backend):
+    try:
+        if sys.platform == "win32":
+            return WindowsHookEventSource()
+        if sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+            return XRecordEventSource()
+    except Exception as e:
+        print(f"Input hooks unavailable ({e}), falling back to polling")
+    return PollingEventSource(backend)
@@ -0,0 +1,97 @@
+import os
+import time
+
+from RecordingFile import RECORD, RecordingFile, record_dtype, write_header
+
+# Input events per second the buffer is sized for: a high-rate mouse moving
+# without pause. Slower input fits more time in the same memory.
+EVENTS_PER_SECOND = 1000
+
+
+# The last capacity events in one preallocated bytearray of .acrec records.
+# record() packs each event into the next slot in place, so capture never
+# allocates and memory is capacity * RECORD.size bytes from the start.
+# There is a single writer, the event source thread; copy() may run on
+# any other thread while capture goes on.
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.head = 0  # events ever recorded; the next one goes in slot head % capacity
+        self.pack_into = RECORD.pack_into
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def nbytes(self):
+        return len(self.buffer)
+
+    def record(self, timestamp, event, x, y, button, data):
+        # Matches the event source callback, so no wrapper call per event
+        head = self.head
+        self.pack_into(self.buffer, head % self.capacity * RECORD.size, timestamp, x, y, event, button, data)
+        self.head = head + 1
+
+    def clear(self):
+        self.head = 0
+
+    def copy(self):
+        # The buffered events oldest first, as bytes of records
+        head = self.head
+        count = min(head, self.capacity)
+        start = (head - count) % self.capacity * RECORD.size
+        size = count * RECORD.size
+        view = memoryview(self.buffer)
+        if start + size <= len(self.buffer):
+            data = bytes(view[start:start + size])
+        else:
+            data = bytes(view[start:]) + bytes(view[:start + size - len(self.buffer)])
+        view.release()
+        # Anything recorded while copying, plus one event that may have been
+        # half written, reused the slots of the oldest events copied; drop those
+        overwritten = self.head + 1 - (head - count + self.capacity)
+        if overwritten > 0:
+            data = data[overwritten * RECORD.size:]
+        return data
+
+
+# Always-on capture of the last few minutes of input into a RingBuffer, for
+# saving after the fact. Runs the event source it is given for as long as it
+# is started; saving does not interrupt it.
+class InstantReplay:
+    def __init__(self, source, minutes=10, events_per_second=EVENTS_PER_SECOND):
+        self.source = source
+        self.window = minutes * 60
+        self.buffer = RingBuffer(int(self.window * events_per_second))
+        self.running = False
+
+    def start(self):
+        if not self.running:
+            self.source.start(self.buffer.record)
+            self.running = True
+
+    def stop(self):
+        if self.running:
+            self.source.stop()
+            self.running = False
+
+    def save(self, path, seconds=None):
+        # Writes the last seconds (default: the whole window) as a recording
+        # starting at time 0 and returns it opened, or None if nothing was
+        # captured in that time
+        import numpy as np
+        records = np.frombuffer(self.buffer.copy(), dtype=record_dtype()).copy()
+        if not len(records):
+            return None
+        cutoff = time.perf_counter() - (seconds or self.window)
+        records = records[np.searchsorted(records['times'], cutoff):]
+        if not len(records):
+            return None
+        records['times'] -= records['times'][0]
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as f:
+            write_header(f, len(records), float(records['times'][-1]))
+            f.write(records.tobytes())
+        os.replace(temporary, path)
+        return RecordingFile(path)
+
@@ -0,0 +1,372 @@
+import contextlib
+import io
+import multiprocessing
+import multiprocessing.connection
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+from InputBackend import InputBackend
+
+# Runs many clicker jobs at once in a pool of worker processes. Every worker
+# owns one X display (optionally a private Xvfb it is given) and one input
+# backend for its whole life, and pulls jobs from a shared queue. A job is a
+# command line for cli.py, e.g. "click -i 0.01 -n 500" or "play run.acrec",
+# and is executed in-process by the worker with the CLI's own parser.
+#
+# A worker's heartbeat comes from a thread of its own, so it only shows that
+# the process is alive and not stuck holding the GIL. A job that never ends,
+# looping or blocked on its display, is caught by the per-job deadline
+# instead, when the runner is given one.
+
+HEARTBEAT_INTERVAL = 0.5  # seconds between a worker's liveness stamps
+MAX_ATTEMPTS = 2  # times a job is tried before it is reported failed
+MAX_RESTARTS = 3  # deaths in a row, with no job finished between, before a worker is given up
+XVFB_BASE_DISPLAY = 100  # worker i gets :100+i when the runner starts Xvfb itself
+XVFB_SCREEN = "1920x1080x24"
+
+
+# Counts the input a job injects so workers can report throughput no matter
+# which backend they drive
+class CountingBackend(InputBackend):
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.count = 0
+
+    def position(self):
+        return self.backend.position()
+
+    def move(self, x, y):
+        self.count += 1
+        self.backend.move(x, y)
+
+    def button_down(self, button="left"):
+        self.count += 1
+        self.backend.button_down(button)
+
+    def button_up(self, button="left"):
+        self.count += 1
+        self.backend.button_up(button)
+
+    def scroll(self, amount):
+        self.count += 1
+        self.backend.scroll(amount)
+
+    def key_down(self, keysym):
+        self.count += 1
+        self.backend.key_down(keysym)
+
+    def key_up(self, keysym):
+        self.count += 1
+        self.backend.key_up(keysym)
+
+    def grab(self, region):
+        return self.backend.grab(region)
+
+    def click(self, button="left", clicks=1, position=None):
+        self.count += 2 * clicks + (1 if position else 0)
+        self.backend.click(button, clicks, position)
+
+    def flush(self):
+        self.backend.flush()
+
+    def close(self):
+        self.backend.close()
+
+
+def worker_main(index, display, backend_name, jobs, results, heartbeats, current, job_starts):
+    # Runs in the worker process. Results are (kind, job id, error, actions,
+    # seconds) tuples sent on the worker's own pipe, which writes them out
+    # before send() returns.
+    if display:
+        os.environ["DISPLAY"] = display
+    heartbeats[index] = time.monotonic()
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            heartbeats[index] = time.monotonic()
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    import cli
+    from InputBackend import create_backend
+    try:
+        backend = CountingBackend(create_backend(backend_name))
+    except Exception as e:
+        results.send(("broken", None, f"{type(e).__name__}: {e}", 0, 0.0))
+        return
+    parser = cli.build_parser()
+    try:
+        while True:
+            item = jobs.get()
+            if item is None:
+                break
+            job_id, argv = item
+            job_starts[index] = time.monotonic()
+            current[index] = job_id
+            before = backend.count
+            start = time.perf_counter()
+            error = None
+            usage = io.StringIO()
+            try:
+                with contextlib.redirect_stderr(usage):
+                    args = parser.parse_args(["--quiet"] + argv)
+                args.run(args, backend)
+            except SystemExit as e:
+                # Raised by argparse, which has written why to stderr, and by
+                # the commands for bad input
+                if e.code:
+                    lines = usage.getvalue().strip().splitlines()
+                    error = lines[-1] if lines else str(e.code)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.send(("failed" if error else "done", job_id, error,
+                          backend.count - before, time.perf_counter() - start))
+            # Only now: a worker that dies before its result is out has to
+            # leave the job to be retried
+            current[index] = -1
+    finally:
+        stopped.set()
+        backend.close()
+
+
+def start_xvfb(number, timeout=5.0):
+    # Starts Xvfb on :number and waits for its socket to appear
+    process = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", XVFB_SCREEN, "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket = f"/tmp/.X11-unix/X{number}"
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"Xvfb :{number} did not start")
+        time.sleep(0.01)
+    return process
+
+
+class JobRunner:
+    def __init__(self, workers=None, displays=None, xvfb=False, backend=None,
+                 heartbeat_timeout=5.0, job_timeout=None):
+        # displays: one X display name per worker. With xvfb=True the runner
+        # starts a private Xvfb for each worker instead. Otherwise workers
+        # share the inherited $DISPLAY. A job still running after job_timeout
+        # seconds has its worker killed and fails without a retry, which
+        # would only run out the clock again.
+        if displays:
+            workers = len(displays)
+        self.workers = workers or os.cpu_count() or 1
+        self.displays = list(displays) if displays else [None] * self.workers
+        self.xvfb = xvfb
+        self.backend = backend
+        self.heartbeat_timeout = heartbeat_timeout
+        self.job_timeout = job_timeout
+
+        context = multiprocessing.get_context("spawn")  # workers open their own X connections
+        self.context = context
+        self.jobs = context.Queue()
+        self.heartbeats = context.Array('d', self.workers, lock=False)
+        self.current = context.Array('q', [-1] * self.workers, lock=False)
+        self.job_starts = context.Array('d', self.workers, lock=False)  # monotonic time the current job began
+        self.processes = [None] * self.workers
+        self.connections = [None] * self.workers  # receiving end of each worker's result pipe
+        self.servers = []
+
+        self.submitted = []  # argv of every job, indexed by job id
+        self.attempts = []
+        self.outcomes = {}  # job id -> (ok, error)
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock)
+        self.monitor = None
+        self.stop_event = threading.Event()
+
+        self.restarts = 0
+        self.deaths = [0] * self.workers  # consecutive, reset whenever the worker reports
+        self.broken = {}  # worker -> why its backend could not start
+        self.worker_jobs = [0] * self.workers
+        self.worker_actions = [0] * self.workers
+        self.worker_busy = [0.0] * self.workers
+        self.started = None
+
+    def start(self):
+        if self.xvfb:
+            for index in range(self.workers):
+                number = XVFB_BASE_DISPLAY + index
+                self.servers.append(start_xvfb(number))
+                self.displays[index] = f":{number}"
+        for index in range(self.workers):
+            self.spawn(index)
+        self.started = time.perf_counter()
+        self.monitor = threading.Thread(target=self.supervise, daemon=True)
+        self.monitor.start()
+
+    def spawn(self, index):
+        self.heartbeats[index] = time.monotonic()
+        self.current[index] = -1
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=worker_main, daemon=True,
+            args=(index, self.displays[index], self.backend, self.jobs, sender,
+                  self.heartbeats, self.current, self.job_starts))
+        process.start()
+        sender.close()  # the worker's copy is the only one, so its death reads as end of file
+        self.processes[index] = process
+        self.connections[index] = receiver
+
+    def submit(self, job):
+        # job is a cli.py command line, as a string or an argv list
+        argv = shlex.split(job) if isinstance(job, str) else list(job)
+        with self.lock:
+            job_id = len(self.submitted)
+            self.submitted.append(argv)
+            self.attempts.append(1)
+        self.jobs.put((job_id, argv))
+        return job_id
+
+    def supervise(self):
+        while not self.stop_event.is_set():
+            workers = {connection: index for index, connection in enumerate(self.connections) if connection}
+            for connection in multiprocessing.connection.wait(list(workers), HEARTBEAT_INTERVAL):
+                self.collect(workers[connection])
+            self.check_workers()
+
+    def collect(self, index):
+        # Records every result worker index has sent that was not read yet
+        connection = self.connections[index]
+        if connection is None:
+            return
+        try:
+            while connection.poll():
+                kind, job_id, error, actions, seconds = connection.recv()
+                with self.lock:
+                    self.deaths[index] = 0
+                    if kind == "broken":
+                        self.broken[index] = error
+                    else:
+                        self.outcomes[job_id] = (kind == "done", error)
+                        self.worker_jobs[index] += 1
+                        self.worker_actions[index] += actions
+                        self.worker_busy[index] += seconds
+                    self.finished.notify_all()
+        except EOFError:
+            # The worker is gone and everything it sent has been read
+            connection.close()
+            self.connections[index] = None
+
+    def check_workers(self):
+        # Replaces workers that died, stopped stamping their heartbeat or ran
+        # a job past its deadline, and puts the job they were running back on
+        # the queue unless it timed out
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if index in self.broken:
+                continue
+            hung = now - self.heartbeats[index] > self.heartbeat_timeout
+            job_id = self.current[index]
+            timed_out = (self.job_timeout is not None and job_id >= 0
+                         and now - self.job_starts[index] > self.job_timeout)
+            if process.is_alive() and not hung and not timed_out:
+                continue
+            if process.exitcode == 0:
+                continue  # gave up on its backend; the reason is on its way
+            if process.is_alive():
+                process.kill()
+            process.join()
+            # A result sent just before it died decides whether the job is retried
+            self.collect(index)
+            with self.lock:
+                if timed_out:
+                    # The job's fault, not the worker's, so not counted as a death
+                    if job_id not in self.outcomes:
+                        self.outcomes[job_id] = (False, f"timed out after {self.job_timeout:g} s")
+                        self.finished.notify_all()
+                else:
+                    if job_id >= 0 and job_id not in self.outcomes:
+                        if self.attempts[job_id] < MAX_ATTEMPTS:
+                            self.attempts[job_id] += 1
+                            self.jobs.put((job_id, self.submitted[job_id]))
+                        else:
+                            reason = "hung" if hung else f"exit code {process.exitcode}"
+                            self.outcomes[job_id] = (False, f"worker {reason}")
+                            self.finished.notify_all()
+                    self.deaths[index] += 1
+                    if self.deaths[index] >= MAX_RESTARTS:
+                        reason = "hung" if hung else f"exit code {process.exitcode}"
+                        self.broken[index] = f"died {self.deaths[index]} times in a row ({reason})"
+                        self.finished.notify_all()
+                        continue
+                self.restarts += 1
+            self.spawn(index)
+
+    def wait(self, timeout=None):
+        # Blocks until every submitted job has an outcome; returns stats()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while len(self.outcomes) < len(self.submitted):
+                if len(self.broken) == self.workers:
+                    raise RuntimeError(f"no worker could start: {self.broken}")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.finished.wait(HEARTBEAT_INTERVAL if remaining is None
+                                   else min(remaining, HEARTBEAT_INTERVAL))
+        return self.stats()
+
+    def stats(self):
+        with self.lock:
+            elapsed = time.perf_counter() - self.started if self.started else 0.0
+            completed = sum(1 for ok, _ in self.outcomes.values() if ok)
+            actions = sum(self.worker_actions)
+            return {
+                "workers": self.workers,
+                "jobs": len(self.submitted),
+                "completed": completed,
+                "failed": len(self.outcomes) - completed,
+                "pending": len(self.submitted) - len(self.outcomes),
+                "restarts": self.restarts,
+                "seconds": elapsed,
+                "jobs_per_second": len(self.outcomes) / elapsed if elapsed else 0.0,
+                "actions": actions,
+                "actions_per_second": actions / elapsed if elapsed else 0.0,
+                "per_worker": [{"display": self.displays[index], "jobs": self.worker_jobs[index],
+                                "actions": self.worker_actions[index],
+                                "busy_seconds": self.worker_busy[index],
+                                "broken": self.broken.get(index)}
+                               for index in range(self.workers)],
+                "errors": {job_id: error for job_id, (ok, error) in sorted(self.outcomes.items())
+                           if not ok},
+            }
+
+    def close(self):
+        self.stop_event.set()
+        if self.monitor:
+            self.monitor.join()
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            if process:
+                process.join(1.0)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+        for connection in self.connections:
+            if connection:
+                connection.close()
+        for server in self.servers:
+            server.terminate()
+            server.wait()
+
+
+def run_jobs(jobs, **kwargs):
+    # Runs every job to completion and returns the aggregated stats
+    runner = JobRunner(**kwargs)
+    runner.start()
+    try:
+        for job in jobs:
+            runner.submit(job)
+        return runner.wait()
+    finally:
+        runner.close()
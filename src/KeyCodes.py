@@ -0,0 +1,45 @@
+# Recordings store keys as X11 keysyms, which already cover Latin-1
+# characters by their code point. These tables translate to and from the
+# names pyautogui expects and Windows virtual-key codes.
+
+KEYSYM_NAMES = {
+    0x20: 'space', 0xff08: 'backspace', 0xff09: 'tab', 0xff0d: 'enter', 0xff1b: 'esc',
+    0xff50: 'home', 0xff51: 'left', 0xff52: 'up', 0xff53: 'right', 0xff54: 'down',
+    0xff55: 'pageup', 0xff56: 'pagedown', 0xff57: 'end', 0xff63: 'insert', 0xffff: 'delete',
+    0xffe1: 'shiftleft', 0xffe2: 'shiftright', 0xffe3: 'ctrlleft', 0xffe4: 'ctrlright',
+    0xffe5: 'capslock', 0xffe9: 'altleft', 0xffea: 'altright', 0xffeb: 'winleft',
+}
+KEYSYM_NAMES.update({0xffbe + i: f'f{i + 1}' for i in range(12)})
+
+VK_KEYSYMS = {
+    0x08: 0xff08, 0x09: 0xff09, 0x0D: 0xff0d, 0x14: 0xffe5, 0x1B: 0xff1b, 0x20: 0x20,
+    0x21: 0xff55, 0x22: 0xff56, 0x23: 0xff57, 0x24: 0xff50, 0x25: 0xff51, 0x26: 0xff52,
+    0x27: 0xff53, 0x28: 0xff54, 0x2D: 0xff63, 0x2E: 0xffff, 0x5B: 0xffeb,
+    0xA0: 0xffe1, 0xA1: 0xffe2, 0xA2: 0xffe3, 0xA3: 0xffe4, 0xA4: 0xffe9, 0xA5: 0xffea,
+}
+VK_KEYSYMS.update({vk: vk for vk in range(0x30, 0x3A)})  # digits
+VK_KEYSYMS.update({vk: vk + 0x20 for vk in range(0x41, 0x5B)})  # letters, as lowercase
+VK_KEYSYMS.update({0x70 + i: 0xffbe + i for i in range(12)})  # F1-F12
+KEYSYM_VKS = {keysym: vk for vk, keysym in VK_KEYSYMS.items()}
+
+
+def keysym_name(keysym):
+    if keysym in KEYSYM_NAMES:
+        return KEYSYM_NAMES[keysym]
+    if 0x21 <= keysym <= 0x7e:
+        return chr(keysym).lower()
+    return None
+
+NAME_KEYSYMS = {name: keysym for keysym, name in KEYSYM_NAMES.items()}
+NAME_KEYSYMS.update({'return': 0xff0d, 'escape': 0xff1b, 'shift': 0xffe1, 'ctrl': 0xffe3,
+                     'alt': 0xffe9, 'win': 0xffeb})
+
+
+def name_keysym(name):
+    # Inverse of keysym_name; single characters map to their code point
+    name = name.lower()
+    if name in NAME_KEYSYMS:
+        return NAME_KEYSYMS[name]
+    if len(name) == 1 and 0x20 <= ord(name) <= 0xff:
+        return ord(name)
+    return None
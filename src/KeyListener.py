@@ -1,46 +1,53 @@
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtCore import QSettings
-import ctypes
-from ctypes import wintypes
+from PyQt6.QtCore import QSettings, pyqtSignal
+import time
 
+from Hotkeys import create_hotkey_backend, parse_hotkey
+from Metrics import HOTKEY_GUI_LATENCY, HOTKEY_LATENCY
+
+# Hotkeys arrive on the hotkey backend's thread. An action registered as
+# immediate runs right there, so stopping works even while the GUI thread is
+# busy; the regular action is then queued to the GUI thread as a signal.
 class KeyListener(QWidget):
-    def __init__(self, parent=None):
+    hotkey_pressed = pyqtSignal(int, float)
+
+    def __init__(self, parent=None, backend=None):
         super().__init__(parent)
         self.hotkey_actions = {}
-        self.registered_hotkeys = {}
+        self.immediate_actions = {}
         self.settings = QSettings("MyApp", "AutoClicker")
+        self.backend = backend or create_hotkey_backend()
+        self.hotkey_pressed.connect(self.dispatch)
 
-    def nativeEvent(self, eventType, message):
-        try:
-            msg = wintypes.MSG.from_address(int(message))
-            if msg.message == 0x0312:  # WM_HOTKEY
-                hotkey_id = msg.wParam
-                if hotkey_id in self.hotkey_actions:
-                    self.hotkey_actions[hotkey_id]()
-                return True, 0
-        except:
-            pass
-        return False, 0
+    def on_hotkey(self, hotkey_id, pressed_at):
+        # Hotkey backend thread
+        immediate = self.immediate_actions.get(hotkey_id)
+        if immediate:
+            immediate()
+            HOTKEY_LATENCY.record(time.perf_counter() - pressed_at)
+        self.hotkey_pressed.emit(hotkey_id, pressed_at)
 
-    def register_hotkey(self, hotkey_id, key_code, modifiers, callback):
+    def dispatch(self, hotkey_id, pressed_at):
+        # GUI thread
+        HOTKEY_GUI_LATENCY.record(time.perf_counter() - pressed_at)
+        if hotkey_id in self.hotkey_actions:
+            self.hotkey_actions[hotkey_id]()
+
+    def register_hotkey(self, hotkey_id, hotkey, callback, immediate=None):
+        keysym, modifiers = parse_hotkey(hotkey)
         self.hotkey_actions[hotkey_id] = callback
-        try:
-            user32 = ctypes.WinDLL('user32', use_last_error=True)
-            if not user32.RegisterHotKey(int(self.winId()), hotkey_id, modifiers, key_code):
-                print(f"Failed to register hotkey ID {hotkey_id}")
-            else:
-                self.registered_hotkeys[hotkey_id] = (modifiers, key_code)
-        except:
-            print("Hotkey registration not supported on this platform")
+        if immediate:
+            self.immediate_actions[hotkey_id] = immediate
+        if keysym is None:
+            print(f"Failed to register hotkey ID {hotkey_id}")
+            return
+        self.backend.register(hotkey_id, keysym, modifiers)
 
     def unregister_hotkeys(self):
-        try:
-            user32 = ctypes.WinDLL('user32', use_last_error=True)
-            for hotkey_id in self.registered_hotkeys:
-                user32.UnregisterHotKey(int(self.winId()), hotkey_id)
-            self.registered_hotkeys.clear()
-        except:
-            pass
+        self.backend.stop()
+        self.backend.clear()
+        self.hotkey_actions.clear()
+        self.immediate_actions.clear()
 
     def load_hotkeys(self):
         self.unregister_hotkeys()
@@ -49,42 +56,12 @@ class KeyListener(QWidget):
         record_key = self.settings.value("record_hotkey", "F9")
         stop_record_key = self.settings.value("stop_record_hotkey", "F10")
         stop_play_key = self.settings.value("stop_play_hotkey", "F8")
+        replay_key = self.settings.value("save_replay_hotkey", "F11")
 
-        # Map key names to virtual key codes
-        key_map = {
-            "F1": 0x70, "F2": 0x71, "F3": 0x72, "F4": 0x73,
-            "F5": 0x74, "F6": 0x75, "F7": 0x76, "F8": 0x77,
-            "F9": 0x78, "F10": 0x79, "F11": 0x7A, "F12": 0x7B,
-            "CTRL": 0x11, "SHIFT": 0x10, "ALT": 0x12
-            # ...add more keys as needed...
-        }
-
-        # Helper function to parse hotkey string
-        def parse_hotkey(hotkey_str):
-            parts = hotkey_str.upper().split('+')
-            modifiers = 0
-            key_code = 0
-            for part in parts:
-                if part in key_map:
-                    if part == "CTRL":
-                        modifiers |= 0x0002  # MOD_CONTROL
-                    elif part == "SHIFT":
-                        modifiers |= 0x0004  # MOD_SHIFT
-                    elif part == "ALT":
-                        modifiers |= 0x0001  # MOD_ALT
-                    else:
-                        key_code = key_map.get(part, 0)
-            return key_code, modifiers
-
-        # Register hotkeys
-        hk1_code, hk1_mod = parse_hotkey(start_stop_key)
-        self.register_hotkey(1, hk1_code, hk1_mod, self.parent().toggle_clicking)
-
-        hk2_code, hk2_mod = parse_hotkey(record_key)
-        self.register_hotkey(2, hk2_code, hk2_mod, self.parent().start_recording)
-
-        hk3_code, hk3_mod = parse_hotkey(stop_record_key)
-        self.register_hotkey(3, hk3_code, hk3_mod, self.parent().stop_recording)
-
-        hk4_code, hk4_mod = parse_hotkey(stop_play_key)
-        self.register_hotkey(4, hk4_code, hk4_mod, self.parent().stop_playing)
\ No newline at end of file
+        window = self.parent()
+        self.register_hotkey(1, start_stop_key, window.toggle_clicking, immediate=window.stop_clicking_now)
+        self.register_hotkey(2, record_key, window.start_recording)
+        self.register_hotkey(3, stop_record_key, window.stop_recording, immediate=window.stop_recording_now)
+        self.register_hotkey(4, stop_play_key, window.stop_playing, immediate=window.stop_playing_now)
+        self.register_hotkey(5, replay_key, window.replay_saved, immediate=window.save_replay_now)
+        self.backend.start(self.on_hotkey)
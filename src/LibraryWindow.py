@@ -0,0 +1,197 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox, QTableWidget,
+                             QTableWidgetItem, QAbstractItemView, QHeaderView, QPushButton, QLabel,
+                             QMessageBox, QFileDialog, QInputDialog)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPainter, QPen, QColor, QPixmap
+
+from MacroLibrary import ORDERS
+from RecordingFile import EXTENSION
+
+PREVIEW_SIZE = (240, 135)
+PREVIEW_POINTS = 4000  # the path is thinned to about this many points
+
+
+def render_preview(actions, path, screen):
+    # Draws the mouse path of a recording, scaled from screen (width, height),
+    # to a small PNG at path
+    width, height = PREVIEW_SIZE
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor("white"))
+    columns = actions.columns()
+    xs, ys = columns['xs'], columns['ys']
+    step = max(1, len(xs) // PREVIEW_POINTS)
+    xs = xs[::step] * (width / screen[0])
+    ys = ys[::step] * (height / screen[1])
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setPen(QPen(QColor("#0078d7"), 1))
+    for i in range(1, len(xs)):
+        painter.drawLine(int(xs[i - 1]), int(ys[i - 1]), int(xs[i]), int(ys[i]))
+    painter.end()
+    image.save(path)
+
+
+# Browses the macro library. Everything shown comes from the index; a
+# recording is only opened when it is loaded or played.
+class LibraryWindow(QDialog):
+    COLUMNS = ["Name", "Tags", "Duration", "Events", "Screen", "Plays"]
+
+    def __init__(self, library, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Macro Library")
+        self.resize(760, 420)
+        self.library = library
+        self.parent_window = parent
+
+        layout = QVBoxLayout(self)
+
+        # Search row
+        search_layout = QHBoxLayout()
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Search names and tags")
+        self.search_field.textChanged.connect(self.refresh)
+        search_layout.addWidget(self.search_field)
+
+        self.tag_filter = QComboBox()
+        self.tag_filter.currentIndexChanged.connect(self.refresh)
+        search_layout.addWidget(self.tag_filter)
+
+        self.order = QComboBox()
+        for order in ORDERS:
+            self.order.addItem(f"By {order}", order)
+        self.order.currentIndexChanged.connect(self.refresh)
+        search_layout.addWidget(self.order)
+        layout.addLayout(search_layout)
+
+        # Listing and preview
+        list_layout = QHBoxLayout()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.itemSelectionChanged.connect(self.show_preview)
+        self.table.itemDoubleClicked.connect(self.load_selected)
+        list_layout.addWidget(self.table)
+
+        self.preview_label = QLabel()
+        self.preview_label.setFixedSize(*PREVIEW_SIZE)
+        self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.preview_label.setStyleSheet("border: 1px solid #ccc;")
+        list_layout.addWidget(self.preview_label, alignment=Qt.AlignmentFlag.AlignTop)
+        layout.addLayout(list_layout)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        for text, handler in (("Load", self.load_selected), ("Play", self.play_selected),
+                              ("Edit", self.edit_selected), ("Delete", self.delete_selected),
+                              ("Import", self.import_files), ("Close", self.close)):
+            button = QPushButton(text)
+            button.clicked.connect(handler)
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+
+        self.entries = []
+        self.refresh_tags()
+        self.refresh()
+
+    def refresh_tags(self):
+        current = self.tag_filter.currentData()
+        self.tag_filter.blockSignals(True)
+        self.tag_filter.clear()
+        self.tag_filter.addItem("All tags", None)
+        for tag, count in self.library.tags():
+            self.tag_filter.addItem(f"{tag} ({count})", tag)
+        index = self.tag_filter.findData(current)
+        self.tag_filter.setCurrentIndex(max(index, 0))
+        self.tag_filter.blockSignals(False)
+
+    def refresh(self):
+        self.entries = self.library.search(self.search_field.text(), self.tag_filter.currentData(),
+                                           self.order.currentData())
+        self.table.setRowCount(len(self.entries))
+        for row, entry in enumerate(self.entries):
+            duration = f"{entry.duration:.1f} s" if entry.duration is not None else "macro"
+            screen = f"{entry.screen[0]}x{entry.screen[1]}" if entry.screen else ""
+            values = [entry.name, ", ".join(entry.tags), duration, str(entry.events), screen,
+                      str(entry.play_count)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.preview_label.clear()
+
+    def selected_entry(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.entries[rows[0].row()]
+
+    def show_preview(self):
+        entry = self.selected_entry()
+        if entry and entry.preview:
+            self.preview_label.setPixmap(QPixmap(entry.preview))
+        else:
+            self.preview_label.setText("No preview")
+
+    def load_selected(self):
+        entry = self.selected_entry()
+        if not entry:
+            return None
+        try:
+            actions = self.library.load(entry.id)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Load Failed", f"Could not load {entry.name}: {e}")
+            return None
+        self.parent_window.library_entry_loaded(entry, actions)
+        self.refresh()
+        return actions
+
+    def play_selected(self):
+        if self.load_selected() is not None:
+            self.parent_window.play_actions()
+
+    def edit_selected(self):
+        entry = self.selected_entry()
+        if not entry:
+            return
+        name, ok = QInputDialog.getText(self, "Edit Macro", "Name:", text=entry.name)
+        if not ok or not name.strip():
+            return
+        tags, ok = QInputDialog.getText(self, "Edit Macro", "Tags (comma separated):",
+                                        text=", ".join(entry.tags))
+        if not ok:
+            return
+        self.library.update(entry.id, name=name.strip(), tags=tags.split(','))
+        self.refresh_tags()
+        self.refresh()
+
+    def delete_selected(self):
+        entry = self.selected_entry()
+        if not entry:
+            return
+        reply = QMessageBox.question(self, "Delete Macro", f"Delete {entry.name} from the library?")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.library.remove(entry.id)
+            self.refresh_tags()
+            self.refresh()
+
+    def import_files(self):
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Import Macros", "",
+                                                     f"Recordings and Macros (*{EXTENSION} *.json *.acm)")
+        failed = []
+        for file_name in file_names:
+            try:
+                entry = self.library.import_file(file_name)
+            except (OSError, ValueError) as e:
+                failed.append(f"{file_name}: {e}")
+                continue
+            if entry.kind == "recording":
+                self.parent_window.add_library_preview(entry)
+        if failed:
+            QMessageBox.warning(self, "Import Failed", "\n".join(failed))
+        self.refresh_tags()
+        self.refresh()
@@ -0,0 +1,283 @@
+import threading
+import time
+from array import array
+
+from ActionRecording import MOVE, DOWN, UP, SCROLL, KEY_DOWN, KEY_UP, BUTTON_CODES
+from ClickEngine import wait_until
+from KeyCodes import name_keysym
+from Playback import inject, NO_POSITION
+
+# A small macro language, one statement per line:
+#
+#   define NAME VALUE            constant, used later as $NAME
+#   move X Y
+#   click|double|down|up [BUTTON] [X Y]
+#   scroll AMOUNT [X Y]
+#   key|keydown|keyup NAME       key name, single character or keysym number
+#   wait SECONDS                 also 250ms or 2s
+#   repeat [COUNT] ... end       without a count, repeats until stopped
+#   if [not] pixel X Y #RRGGBB [TOLERANCE] ... [else ...] end
+#
+# Lines starting with # are comments. Source compiles to a flat array of
+# fixed width instructions with constants substituted and every jump target
+# resolved, which run() steps through without allocating per iteration.
+
+MACRO_EXTENSION = '.acm'
+
+WIDTH = 5  # op, x, y, arg, target
+
+# Opcodes 0-5 are the recording event codes and go straight to inject(), with
+# arg as the button or data
+WAIT = 8  # arg: index into waits
+JUMP = 9  # target
+LOOP = 10  # arg: count, y: counter slot, target: first instruction after the loop
+NEXT = 11  # y: counter slot, target: first instruction of the body
+IF_PIXEL = 12  # arg: tolerance << 24 | 0xRRGGBB, target: else branch
+IF_NOT_PIXEL = 13
+
+CLICKS = {'click': 1, 'double': 2}
+EVENTS = {'down': DOWN, 'up': UP}
+KEYS = {'key': (KEY_DOWN, KEY_UP), 'keydown': (KEY_DOWN,), 'keyup': (KEY_UP,)}
+
+
+class MacroError(ValueError):
+    pass
+
+
+class MacroProgram:
+    def __init__(self):
+        self.code = array('i')
+        self.waits = array('d')
+        self.loops = 0  # counter slots needed, the deepest nesting of counted loops
+
+    def __len__(self):
+        return len(self.code) // WIDTH
+
+    def emit(self, op, x=NO_POSITION, y=0, arg=0, target=0):
+        self.code.extend((op, x, y, arg, target))
+        return len(self.code) - WIDTH
+
+    def emit_wait(self, seconds):
+        self.waits.append(seconds)
+        return self.emit(WAIT, arg=len(self.waits) - 1)
+
+    # Imports a recording as a straight-line program
+    @classmethod
+    def from_recording(cls, actions):
+        program = cls()
+        last = 0.0
+        for t, x, y, event, button, data in actions:
+            if t > last:
+                program.emit_wait(t - last)
+                last = t
+            program.emit(event, x, y, button if event in (DOWN, UP) else data)
+        return program
+
+
+class Compiler:
+    def __init__(self, params=None):
+        self.constants = dict(params or {})
+        self.program = MacroProgram()
+        self.blocks = []  # open repeat/if blocks, innermost last
+        self.depth = 0  # enclosing counted loops
+        self.line = 0
+
+    def error(self, message):
+        return MacroError(f"line {self.line}: {message}")
+
+    def compile(self, source):
+        for self.line, text in enumerate(source.splitlines(), 1):
+            tokens = text.split()
+            if not tokens or tokens[0].startswith('#'):
+                continue
+            self.statement(tokens[0].lower(), [self.substitute(token) for token in tokens[1:]])
+        if self.blocks:
+            raise self.error(f"missing end for {self.blocks[-1][0]}")
+        return self.program
+
+    def substitute(self, token):
+        if not token.startswith('$'):
+            return token
+        try:
+            return str(self.constants[token[1:]])
+        except KeyError:
+            raise self.error(f"undefined {token}") from None
+
+    def number(self, token, kind=int):
+        try:
+            return kind(token, 0) if kind is int else kind(token)
+        except ValueError:
+            raise self.error(f"expected a number, got {token!r}") from None
+
+    def position(self, args):
+        if not args:
+            return NO_POSITION, 0
+        if len(args) != 2:
+            raise self.error("expected X Y")
+        return self.number(args[0]), self.number(args[1])
+
+    def statement(self, word, args):
+        program = self.program
+        if word == 'define':
+            if len(args) != 2:
+                raise self.error("expected define NAME VALUE")
+            self.constants[args[0]] = args[1]
+        elif word == 'move':
+            if len(args) != 2:
+                raise self.error("expected move X Y")
+            program.emit(MOVE, *self.position(args))
+        elif word in CLICKS or word in EVENTS:
+            button = BUTTON_CODES['left']
+            if args and args[0].lower() in BUTTON_CODES:
+                button = BUTTON_CODES[args.pop(0).lower()]
+            x, y = self.position(args)
+            if word in EVENTS:
+                program.emit(EVENTS[word], x, y, button)
+            else:
+                # Only the first press moves; the rest happen where it left the pointer
+                for _ in range(CLICKS[word]):
+                    program.emit(DOWN, x, y, button)
+                    program.emit(UP, arg=button)
+                    x, y = NO_POSITION, 0
+        elif word == 'scroll':
+            if not args:
+                raise self.error("expected scroll AMOUNT [X Y]")
+            program.emit(SCROLL, *self.position(args[1:]), self.number(args[0]))
+        elif word in KEYS:
+            if len(args) != 1:
+                raise self.error(f"expected {word} NAME")
+            keysym = name_keysym(args[0])
+            if keysym is None:
+                keysym = self.number(args[0])
+            for event in KEYS[word]:
+                program.emit(event, arg=keysym)
+        elif word == 'wait':
+            if len(args) != 1:
+                raise self.error("expected wait SECONDS")
+            text = args[0].lower()
+            if text.endswith('ms'):
+                seconds = self.number(text[:-2], float) / 1000
+            else:
+                seconds = self.number(text.removesuffix('s'), float)
+            if seconds < 0:
+                raise self.error("cannot wait a negative time")
+            program.emit_wait(seconds)
+        elif word == 'repeat':
+            if not args:
+                self.blocks.append(('repeat', len(program.code), None))
+                return
+            count = self.number(args[0])
+            self.blocks.append(('repeat', program.emit(LOOP, y=self.depth, arg=count), self.depth))
+            self.depth += 1
+            program.loops = max(program.loops, self.depth)
+        elif word == 'if':
+            op = IF_PIXEL
+            if args and args[0].lower() == 'not':
+                op = IF_NOT_PIXEL
+                args = args[1:]
+            if len(args) not in (4, 5) or args[0].lower() != 'pixel' or not args[3].startswith('#'):
+                raise self.error("expected if [not] pixel X Y #RRGGBB [TOLERANCE]")
+            color = self.number(args[3][1:], lambda text: int(text, 16))
+            tolerance = self.number(args[4]) if len(args) == 5 else 0
+            if not 0 <= color <= 0xffffff or not 0 <= tolerance <= 127:
+                raise self.error("color must be #RRGGBB and tolerance 0-127")
+            x, y = self.position(args[1:3])
+            self.blocks.append(('if', program.emit(op, x, y, tolerance << 24 | color), None))
+        elif word == 'else':
+            if not self.blocks or self.blocks[-1][0] != 'if':
+                raise self.error("else without if")
+            _, branch, _ = self.blocks.pop()
+            self.blocks.append(('else', program.emit(JUMP), None))
+            program.code[branch + 4] = len(program.code)
+        elif word == 'end':
+            if not self.blocks:
+                raise self.error("end without repeat or if")
+            kind, start, slot = self.blocks.pop()
+            if kind == 'repeat' and slot is None:
+                program.emit(JUMP, target=start)
+            elif kind == 'repeat':
+                program.emit(NEXT, y=slot, target=start + WIDTH)
+                program.code[start + 4] = len(program.code)
+                self.depth -= 1
+            else:
+                program.code[start + 4] = len(program.code)
+        else:
+            raise self.error(f"unknown statement {word!r}")
+
+
+def compile_macro(source, params=None):
+    return Compiler(params).compile(source)
+
+
+def load_macro(path, params=None):
+    # Recordings (.acrec, .acseq or .json) import as straight-line programs
+    from RecordingFile import EXTENSION, SEQUENCE_EXTENSION, load_recording
+    if path.endswith((EXTENSION, SEQUENCE_EXTENSION, '.json')):
+        return MacroProgram.from_recording(load_recording(path))
+    with open(path) as f:
+        return compile_macro(f.read(), params)
+
+
+def pixel_matches(backend, x, y, arg):
+    red, green, blue = backend.grab((x, y, 1, 1))[0, 0, :3]
+    tolerance = arg >> 24
+    return (abs(int(red) - (arg >> 16 & 0xff)) <= tolerance
+            and abs(int(green) - (arg >> 8 & 0xff)) <= tolerance
+            and abs(int(blue) - (arg & 0xff)) <= tolerance)
+
+
+# Executes program through backend on the calling thread. Waits are kept on
+# an absolute schedule like the click engine's, so loops do not drift, but
+# falling behind restarts the schedule from now instead of rushing to catch
+# up. Injected events are flushed before every wait and pixel test and on
+# every loop back-edge, which is also where stop_event is checked. Returns
+# False if it was stopped.
+def run(program, backend, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    code, waits = program.code, program.waits
+    counters = array('q', bytes(8 * program.loops))
+    end = len(code)
+    pc = 0
+    deadline = time.perf_counter()
+    while pc < end:
+        op = code[pc]
+        if op <= KEY_UP:
+            arg = code[pc + 3]
+            inject(backend, op, code[pc + 1], code[pc + 2], arg, arg)
+            pc += WIDTH
+        elif op == WAIT:
+            backend.flush()
+            deadline = max(deadline + waits[code[pc + 3]], time.perf_counter())
+            if not wait_until(deadline, stop_event):
+                return False
+            pc += WIDTH
+        elif op == NEXT:
+            slot = code[pc + 2]
+            counters[slot] -= 1
+            if counters[slot] > 0:
+                backend.flush()
+                if stop_event.is_set():
+                    return False
+                pc = code[pc + 4]
+            else:
+                pc += WIDTH
+        elif op == LOOP:
+            if code[pc + 3] > 0:
+                counters[code[pc + 2]] = code[pc + 3]
+                pc += WIDTH
+            else:
+                pc = code[pc + 4]
+        elif op == JUMP:
+            backend.flush()
+            if stop_event.is_set():
+                return False
+            pc = code[pc + 4]
+        else:
+            backend.flush()
+            matched = pixel_matches(backend, code[pc + 1], code[pc + 2], code[pc + 3])
+            if matched == (op == IF_PIXEL):
+                pc += WIDTH
+            else:
+                pc = code[pc + 4]
+    backend.flush()
+    return True
@@ -0,0 +1,237 @@
+import os
+import re
+import shutil
+import sqlite3
+import time
+from collections import namedtuple
+
+from RecordingFile import EXTENSION, RecordingFile, load_recording
+
+# A catalog of saved recordings and macros. The library owns a directory with
+# one file per entry and an SQLite index holding everything a listing shows,
+# so browsing and searching never open the files; event data is only read by
+# load(), and .acrec recordings are mapped lazily even then.
+
+INDEX_NAME = "library.sqlite3"
+SCHEMA_VERSION = 1
+
+LibraryEntry = namedtuple('LibraryEntry', ['id', 'name', 'path', 'kind', 'duration', 'events',
+                                           'screen', 'preview', 'tags', 'created', 'modified',
+                                           'play_count', 'last_played'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS macros (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    duration REAL,
+    events INTEGER,
+    screen_width INTEGER,
+    screen_height INTEGER,
+    preview TEXT,
+    created REAL NOT NULL,
+    modified REAL NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played REAL
+);
+CREATE INDEX IF NOT EXISTS macros_name ON macros (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS macros_modified ON macros (modified);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL COLLATE NOCASE,
+    macro_id INTEGER NOT NULL REFERENCES macros (id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, macro_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_macro ON tags (macro_id);
+"""
+
+# Full-text index over names and tags, kept in step by hand; its rowid is the macro id
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (name, tags, prefix='2 3')"
+
+ORDERS = {
+    "name": "m.name COLLATE NOCASE",
+    "modified": "m.modified DESC",
+    "played": "m.play_count DESC, m.last_played DESC",
+    "duration": "m.duration DESC",
+}
+
+
+def slug(name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '-', name).strip('-')[:40] or "macro"
+
+
+class MacroLibrary:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "files"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, INDEX_NAME))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.execute(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE
+            self.fts = False
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM macros").fetchone()[0]
+
+    def relative(self, path):
+        # Paths are stored relative to the library so the directory can move
+        return os.path.relpath(path, self.directory) if path else None
+
+    def file_path(self, name, extension):
+        # A fresh file name inside the library for an entry called name
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug(name)}"
+        path = os.path.join(self.directory, "files", base + extension)
+        count = 1
+        while os.path.exists(path):
+            count += 1
+            path = os.path.join(self.directory, "files", f"{base}-{count}{extension}")
+        return path
+
+    def insert(self, name, path, kind, duration, events, screen, preview, tags):
+        now = time.time()
+        width, height = screen if screen else (None, None)
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO macros (name, path, kind, duration, events, screen_width, screen_height,"
+                " preview, created, modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, self.relative(path), kind, duration, events,
+                 width, height, self.relative(preview), now, now))
+            macro_id = cursor.lastrowid
+            self.set_tags(macro_id, name, tags)
+        return self.get(macro_id)
+
+    def set_tags(self, macro_id, name, tags):
+        tags = sorted({tag.strip() for tag in tags if tag.strip()}, key=str.lower)
+        self.db.execute("DELETE FROM tags WHERE macro_id = ?", (macro_id,))
+        self.db.executemany("INSERT OR IGNORE INTO tags (tag, macro_id) VALUES (?, ?)",
+                            [(tag, macro_id) for tag in tags])
+        if self.fts:
+            self.db.execute("DELETE FROM search WHERE rowid = ?", (macro_id,))
+            self.db.execute("INSERT INTO search (rowid, name, tags) VALUES (?, ?, ?)",
+                            (macro_id, name, " ".join(tags)))
+
+    def preview_path(self, entry):
+        # Where an entry's preview image belongs, next to its file
+        return os.path.splitext(entry.path)[0] + ".png"
+
+    def add(self, actions, name, tags=(), screen=None, preview=None):
+        # Saves a recording into the library; screen is (width, height)
+        path = self.file_path(name, EXTENSION)
+        actions.save(path)
+        return self.insert(name, path, "recording", actions.duration(), len(actions),
+                           screen, preview, tags)
+
+    def import_file(self, source, name=None, tags=(), screen=None):
+        # Copies a recording (.acrec, .json) or macro (.acm) into the library.
+        # This is the one time its contents are read.
+        from Macro import MACRO_EXTENSION, compile_macro
+        name = name or os.path.splitext(os.path.basename(source))[0]
+        extension = os.path.splitext(source)[1].lower()
+        if extension == MACRO_EXTENSION:
+            with open(source) as f:
+                program = compile_macro(f.read())
+            kind, duration, events = "macro", None, len(program)
+        elif extension == EXTENSION:
+            recording = RecordingFile(source)
+            kind, duration, events = "recording", recording.duration(), len(recording)
+        elif extension == ".json":
+            recording = load_recording(source)
+            kind, duration, events = "recording", recording.duration(), len(recording)
+        else:
+            raise ValueError(f"not a recording or macro: {source}")
+        path = self.file_path(name, extension)
+        shutil.copyfile(source, path)
+        return self.insert(name, path, kind, duration, events, screen, None, tags)
+
+    def update(self, macro_id, name=None, tags=None, preview=None):
+        entry = self.get(macro_id)
+        name = entry.name if name is None else name
+        with self.db:
+            self.db.execute("UPDATE macros SET name = ?, preview = COALESCE(?, preview), modified = ?"
+                            " WHERE id = ?", (name, self.relative(preview), time.time(), macro_id))
+            self.set_tags(macro_id, name, entry.tags if tags is None else tags)
+        return self.get(macro_id)
+
+    def remove(self, macro_id, delete_files=True):
+        entry = self.get(macro_id)
+        with self.db:
+            self.db.execute("DELETE FROM macros WHERE id = ?", (macro_id,))
+            if self.fts:
+                self.db.execute("DELETE FROM search WHERE rowid = ?", (macro_id,))
+        if delete_files:
+            for path in (entry.path, entry.preview):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def query(self, where="", params=(), order="name", limit=None):
+        sql = ("SELECT m.id, m.name, m.path, m.kind, m.duration, m.events, m.screen_width,"
+               " m.screen_height, m.preview, m.created, m.modified, m.play_count, m.last_played,"
+               " (SELECT GROUP_CONCAT(tag, '\x1f') FROM tags WHERE macro_id = m.id)"
+               f" FROM macros m {where} ORDER BY {ORDERS[order]}")
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        entries = []
+        for row in self.db.execute(sql, params):
+            (macro_id, name, path, kind, duration, events, width, height, preview,
+             created, modified, play_count, last_played, tags) = row
+            entries.append(LibraryEntry(
+                macro_id, name, os.path.join(self.directory, path), kind, duration, events,
+                (width, height) if width is not None else None,
+                os.path.join(self.directory, preview) if preview else None,
+                tuple(sorted(tags.split('\x1f'), key=str.lower)) if tags else (),
+                created, modified, play_count, last_played))
+        return entries
+
+    def get(self, macro_id):
+        entries = self.query("WHERE m.id = ?", (macro_id,))
+        if not entries:
+            raise KeyError(macro_id)
+        return entries[0]
+
+    def search(self, text="", tag=None, order="name", limit=500):
+        # Matches every word of text as a prefix of a word in the name or tags
+        clauses = []
+        params = []
+        words = re.findall(r'\w+', text)
+        if words and self.fts:
+            clauses.append("m.id IN (SELECT rowid FROM search WHERE search MATCH ?)")
+            params.append(" ".join(f'"{word}"*' for word in words))
+        else:
+            for word in words:
+                clauses.append("(m.name LIKE ? OR EXISTS (SELECT 1 FROM tags t"
+                               " WHERE t.macro_id = m.id AND t.tag LIKE ?))")
+                params.extend([f"%{word}%", f"%{word}%"])
+        if tag:
+            clauses.append("m.id IN (SELECT macro_id FROM tags WHERE tag = ?)")
+            params.append(tag)
+        where = "WHERE " + " AND ".join(clauses) if clauses else ""
+        return self.query(where, params, order, limit)
+
+    def tags(self):
+        # (tag, number of entries) for every tag in use
+        return self.db.execute("SELECT tag, COUNT(*) FROM tags GROUP BY tag"
+                               " ORDER BY tag COLLATE NOCASE").fetchall()
+
+    def load(self, macro_id):
+        # The only call that reads event data. Returns a recording, lazily
+        # mapped when stored as .acrec, or a MacroProgram for macros.
+        entry = self.get(macro_id)
+        if entry.kind == "macro":
+            from Macro import load_macro
+            actions = load_macro(entry.path)
+        else:
+            actions = load_recording(entry.path)
+        with self.db:
+            self.db.execute("UPDATE macros SET play_count = play_count + 1, last_played = ?"
+                            " WHERE id = ?", (time.time(), macro_id))
+        return actions
@@ -0,0 +1,273 @@
+import os
+import threading
+from array import array
+
+# Counters and latency histograms for the click, playback and matching loops.
+# Every metric has a single writer, the loop thread it measures, so recording
+# is a few integer operations on an array with no lock; readers copy the
+# array and may see a value a click or two stale, which is fine for stats.
+
+SUB_BUCKET_BITS = 5  # 32 sub-buckets per power of two, about 3% relative error
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(ticks):
+    # HDR-style log-linear bucketing: exact below 64, then 32 buckets for
+    # every doubling
+    magnitude = ticks.bit_length() - SUB_BUCKET_BITS - 1
+    if magnitude <= 0:
+        return ticks
+    return (magnitude << SUB_BUCKET_BITS) + (ticks >> magnitude)
+
+
+def bucket_bounds(index):
+    # (lowest, highest + 1) ticks that land in bucket index
+    magnitude = (index >> SUB_BUCKET_BITS) - 1
+    if magnitude <= 0:
+        return index, index + 1
+    lowest = (index - (magnitude << SUB_BUCKET_BITS)) << magnitude
+    return lowest, lowest + (1 << magnitude)
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def add(self, amount=1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+    def summary(self):
+        return self.value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+class Gauge:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def reset(self):
+        self.value = 0.0
+
+    def summary(self):
+        return self.value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.value}"]
+
+
+# Records durations in seconds at a resolution of unit seconds, up to highest
+class Histogram:
+    def __init__(self, name, help, unit=1e-6, highest=60.0):
+        self.name = name
+        self.help = help
+        self.unit = unit
+        self.scale = 1 / unit
+        self.counts = array('q', bytes(8 * (bucket_index(int(highest / unit)) + 1)))
+        self.last = len(self.counts) - 1
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        if value > 0:
+            # bucket_index() inlined, this runs once per click or event
+            ticks = int(value * self.scale)
+            magnitude = ticks.bit_length() - SUB_BUCKET_BITS - 1
+            index = ticks if magnitude <= 0 else (magnitude << SUB_BUCKET_BITS) + (ticks >> magnitude)
+            self.counts[index if index < self.last else self.last] += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+        else:
+            self.counts[0] += 1
+
+    def reset(self):
+        self.counts = array('q', bytes(8 * len(self.counts)))
+        self.total = 0.0
+        self.max = 0.0
+
+    def snapshot(self):
+        return HistogramSnapshot(self.counts[:], self.unit, self.total, self.max)
+
+    def summary(self):
+        snapshot = self.snapshot()
+        summary = {"count": snapshot.count, "mean": snapshot.mean(), "max": snapshot.max}
+        for quantile in QUANTILES:
+            summary[f"p{quantile * 100:g}"] = snapshot.percentile(quantile * 100)
+        return summary
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        for quantile in QUANTILES:
+            lines.append(f'{self.name}{{quantile="{quantile}"}} {snapshot.percentile(quantile * 100):.9f}')
+        lines.append(f"{self.name}_sum {snapshot.total:.9f}")
+        lines.append(f"{self.name}_count {snapshot.count}")
+        return lines
+
+
+class HistogramSnapshot:
+    def __init__(self, counts, unit, total, max):
+        self.counts = counts
+        self.unit = unit
+        self.count = sum(counts)
+        self.total = total
+        self.max = max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        # Midpoint of the bucket holding the q-th percentile, capped at the max
+        if not self.count:
+            return 0.0
+        rank = max(1, round(q / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                lowest, highest = bucket_bounds(index)
+                return min((lowest + highest) / 2 * self.unit, self.max)
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help):
+        if name not in self.metrics:
+            self.metrics[name] = Counter(name, help)
+        return self.metrics[name]
+
+    def gauge(self, name, help):
+        if name not in self.metrics:
+            self.metrics[name] = Gauge(name, help)
+        return self.metrics[name]
+
+    def histogram(self, name, help, **kwargs):
+        if name not in self.metrics:
+            self.metrics[name] = Histogram(name, help, **kwargs)
+        return self.metrics[name]
+
+    def reset(self):
+        for metric in list(self.metrics.values()):
+            metric.reset()
+
+    def summary(self):
+        # Every metric as plain numbers, keyed by name
+        return {name: metric.summary() for name, metric in list(self.metrics.items())}
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Replaces the file in one step so a scraper never reads half of it
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+
+REGISTRY = Registry()
+
+CLICK_DELAY = REGISTRY.histogram(
+    "autoclicker_click_delay_seconds", "How late each click started after its deadline")
+CLICK_INJECT = REGISTRY.histogram(
+    "autoclicker_click_inject_seconds", "Time the input backend took to perform each click")
+CLICKS = REGISTRY.counter("autoclicker_clicks_total", "Clicks performed")
+CLICKS_MISSED = REGISTRY.counter(
+    "autoclicker_clicks_missed_total", "Click deadlines skipped because the engine was too late for them")
+BURST_RATE = REGISTRY.gauge(
+    "autoclicker_burst_rate", "Clicks per second the running burst achieved over the last quarter second")
+PLAYBACK_LAG = REGISTRY.histogram(
+    "autoclicker_playback_lag_seconds", "How far behind schedule each recorded event was injected")
+PLAYBACK_INJECT = REGISTRY.histogram(
+    "autoclicker_playback_inject_seconds", "Time the input backend took to inject each recorded event")
+PLAYBACK_EVENTS = REGISTRY.counter("autoclicker_playback_events_total", "Recorded events played back")
+HOTKEY_LATENCY = REGISTRY.histogram(
+    "autoclicker_hotkey_latency_seconds", "From a hotkey press to its action being applied")
+HOTKEY_GUI_LATENCY = REGISTRY.histogram(
+    "autoclicker_hotkey_gui_latency_seconds", "From a hotkey press to the window handling it")
+MATCH_TIME = REGISTRY.histogram(
+    "autoclicker_template_match_seconds", "Time taken to search one frame for the trigger image")
+
+
+# Publishes a registry as a Prometheus text file rewritten every interval,
+# on a local HTTP port, or both
+class MetricsExporter:
+    def __init__(self, registry=REGISTRY, path=None, port=None, host="127.0.0.1", interval=5.0):
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.server = None
+        self.writer = None
+
+    def start(self):
+        if self.path:
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
+        if self.port is not None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]  # the real one when 0 was asked for
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def write_loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.registry.write(self.path)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.writer:
+            self.writer.join()
+            self.registry.write(self.path)  # leave the final numbers behind
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def exporter_from_env(registry=REGISTRY):
+    # AUTOCLICKER_METRICS_FILE and AUTOCLICKER_METRICS_PORT turn the exporter
+    # on; returns a started exporter, or None when neither is set
+    path = os.environ.get("AUTOCLICKER_METRICS_FILE")
+    port = os.environ.get("AUTOCLICKER_METRICS_PORT")
+    if not path and not port:
+        return None
+    return MetricsExporter(registry, path=path, port=int(port) if port else None).start()
@@ -0,0 +1,106 @@
+import heapq
+import threading
+import time
+from operator import itemgetter
+
+from ActionRecording import MOVE, DOWN, UP, SCROLL, KEY_DOWN, KEY_UP, BUTTONS
+from ClickEngine import wait_until
+from Metrics import PLAYBACK_EVENTS, PLAYBACK_INJECT, PLAYBACK_LAG
+
+# Playback modes
+REALTIME = "realtime"  # recorded timing, scaled by speed
+FAST = "fast"  # no waiting at all, events still in order
+RESAMPLE = "resample"  # like REALTIME, with moves interpolated to a fixed rate
+
+NO_POSITION = -2 ** 31  # x of a button or scroll event that happens wherever the pointer is
+
+
+# Several recordings played as one, such as a mouse path and the keys typed
+# alongside it. Each track is a recording or a (recording, offset) pair that
+# starts offset seconds in. Iterating k-way merges the tracks by timestamp as
+# it goes, so file-backed tracks are still streamed; at equal times the track
+# listed first goes first.
+class Timeline:
+    def __init__(self, tracks):
+        self.tracks = [track if isinstance(track, tuple) else (track, 0.0) for track in tracks]
+
+    def __len__(self):
+        return sum(len(actions) for actions, _ in self.tracks)
+
+    def duration(self):
+        return max((offset + actions.duration() for actions, offset in self.tracks if len(actions)),
+                   default=0.0)
+
+    def __iter__(self):
+        streams = [iter(actions) if not offset else
+                   ((time + offset, x, y, event, button, data)
+                    for time, x, y, event, button, data in actions)
+                   for actions, offset in self.tracks]
+        if len(streams) == 1:
+            return streams[0]
+        return heapq.merge(*streams, key=itemgetter(0))
+
+    def columns(self):
+        # Concatenated and stably sorted by time, in memory, for the
+        # transforms in RecordingTransforms
+        import numpy as np
+        parts = [(actions.columns(), offset) for actions, offset in self.tracks]
+        columns = {name: np.concatenate([part[name] for part, _ in parts]) for name in parts[0][0]}
+        columns['times'] = np.concatenate([part['times'] + offset for part, offset in parts])
+        order = np.argsort(columns['times'], kind='stable')
+        return {name: column[order] for name, column in columns.items()}
+
+
+# Sends one (event, x, y, button, data) action to backend without flushing.
+# Recordings and macros both inject through here.
+def inject(backend, event, x, y, button, data):
+    if event == MOVE:
+        backend.move(x, y)
+        return
+    if event <= SCROLL and x != NO_POSITION:
+        backend.move(x, y)
+    if event == DOWN:
+        backend.button_down(BUTTONS[button])
+    elif event == UP:
+        backend.button_up(BUTTONS[button])
+    elif event == SCROLL:
+        backend.scroll(data)
+    elif event == KEY_DOWN:
+        backend.key_down(data)
+    elif event == KEY_UP:
+        backend.key_up(data)
+
+
+# Injects a recording through backend on the calling thread. Kept free of Qt
+# so the command line runner can play recordings without a QApplication.
+# Returns False if stop_event was set before the end was reached.
+def play(actions, backend, speed=1.0, mode=REALTIME, rate=60, gate=None, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    if mode == RESAMPLE:
+        # Done up front in one pass, so playback itself only injects
+        from RecordingTransforms import resample
+        actions = resample(actions, rate / speed)
+    timed = mode != FAST
+    start_time = time.perf_counter()
+    for action_time, x, y, event, button, data in actions:
+        scheduled = start_time + action_time / speed
+        if timed and not wait_until(scheduled, stop_event):
+            return False
+        if stop_event.is_set():
+            return False
+        if event == DOWN and gate is not None:
+            waited = time.perf_counter()
+            if not gate.wait(stop_event):
+                return False
+            # Everything after the wait shifts back by however long it took
+            shift = time.perf_counter() - waited
+            start_time += shift
+            scheduled += shift
+        injected = time.perf_counter()
+        inject(backend, event, x, y, button, data)
+        backend.flush()
+        if timed:
+            PLAYBACK_LAG.record(injected - scheduled)
+        PLAYBACK_INJECT.record(time.perf_counter() - injected)
+        PLAYBACK_EVENTS.add()
+    return True
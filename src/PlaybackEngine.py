@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+from ActionRecording import MOVE, DOWN, UP, KEY_DOWN, KEY_UP, BUTTONS
+from ClickEngine import SPIN_THRESHOLD
+from Macro import MacroProgram, run as run_macro
+from Metrics import PLAYBACK_EVENTS, PLAYBACK_INJECT, PLAYBACK_LAG
+from Playback import REALTIME, FAST, RESAMPLE, Timeline, inject
+
+# Plays timelines on an asyncio event loop running in a thread of its own.
+# Every control call (pause, resume, cancel) is handed to that loop and acted
+# on between two events, never in the middle of injecting one. Playback only
+# yields to the loop to wait or when a control call is pending, since every
+# trip through the loop's select() also hands the GIL to other threads.
+# Waits sleep on the loop until SPIN_THRESHOLD before the deadline and spin
+# for the rest, the same as the click engine, because loop timers are only
+# good to about a millisecond.
+class PlaybackEngine:
+    def __init__(self, backend, spin_threshold=SPIN_THRESHOLD):
+        self.backend = backend
+        self.spin_threshold = spin_threshold
+        self.loop = None
+        self.thread = None
+        self.future = None
+        self.paused = False
+        self.pending = False  # a control call is queued on the loop
+
+    def start(self):
+        if self.thread is None:
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+        return self
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.cancel()
+        if self.future:
+            self.future.exception()  # waits for the run to wind down, never raises
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.thread = None
+
+    def is_playing(self):
+        return self.future is not None and not self.future.done()
+
+    # Starts playing and returns a concurrent.futures.Future that resolves to
+    # True when the end is reached and False when cancelled. tracks is a
+    # recording, a list of tracks as Timeline takes them, or a MacroProgram.
+    # on_finished(completed) runs on the engine thread once playback is over.
+    def play(self, tracks, speed=1.0, mode=REALTIME, rate=60, gate=None, on_finished=None):
+        if self.is_playing():
+            raise RuntimeError("already playing")
+        self.start()
+        self.paused = False
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.interrupt = asyncio.Event()  # cuts a wait short for a pause or cancel
+        self.stop_event = threading.Event()  # also seen by the threads work is handed to
+        self.future = asyncio.run_coroutine_threadsafe(
+            self.run(tracks, speed, mode, rate, gate, on_finished), self.loop)
+        return self.future
+
+    def wait(self, timeout=None):
+        return self.future.result(timeout) if self.future else True
+
+    # Safe to call from any thread, including a hotkey backend's
+    def pause(self):
+        if self.is_playing():
+            self.paused = True
+            self.loop.call_soon_threadsafe(self.set_paused, True)
+            self.pending = True
+
+    def resume(self):
+        if self.is_playing():
+            self.paused = False
+            self.loop.call_soon_threadsafe(self.set_paused, False)
+            self.pending = True
+
+    def cancel(self):
+        if self.is_playing():
+            self.stop_event.set()
+            self.loop.call_soon_threadsafe(self.wake)
+
+    def set_paused(self, paused):
+        # Engine thread
+        if paused:
+            self.resumed.clear()
+            self.interrupt.set()
+        else:
+            self.resumed.set()
+
+    def wake(self):
+        # Engine thread, after stop_event was set
+        self.interrupt.set()
+        self.resumed.set()
+
+    async def run(self, tracks, speed, mode, rate, gate, on_finished):
+        completed = False
+        try:
+            if isinstance(tracks, MacroProgram):
+                completed = await self.run_macro(tracks)
+            else:
+                if not isinstance(tracks, (list, tuple)):
+                    tracks = [tracks]
+                timeline = Timeline(tracks)
+                if mode == RESAMPLE:
+                    from RecordingTransforms import resample
+                    timeline = resample(timeline, rate / speed)
+                completed = await self.run_timeline(timeline, speed, mode != FAST, gate)
+        finally:
+            self.paused = False
+            if on_finished:
+                on_finished(completed)
+        return completed
+
+    async def run_macro(self, program):
+        # Macros keep their own timing, so they run as they are on a worker
+        # thread; pause does not apply, cancel does
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, run_macro, program, self.backend, self.stop_event)
+
+    async def wait_until(self, deadline):
+        # Returns False if interrupted before the deadline
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return True
+            if self.interrupt.is_set():
+                return False
+            if remaining > self.spin_threshold:
+                try:
+                    await asyncio.wait_for(self.interrupt.wait(), remaining - self.spin_threshold)
+                    return False
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_timeline(self, timeline, speed, timed, gate):
+        backend = self.backend
+        stop_event = self.stop_event
+        held = set()  # buttons and keys down, released if cancelled
+        completed = False
+        start_time = time.perf_counter()
+        try:
+            for action_time, x, y, event, button, data in timeline:
+                while True:
+                    if self.pending:
+                        # Set after the call was queued, so this runs it
+                        self.pending = False
+                        await asyncio.sleep(0)
+                    if not self.resumed.is_set():
+                        paused_at = time.perf_counter()
+                        await self.resumed.wait()
+                        # The rest of the timeline moves back by the pause
+                        start_time += time.perf_counter() - paused_at
+                    if stop_event.is_set():
+                        return False
+                    scheduled = start_time + action_time / speed
+                    if not timed or scheduled <= time.perf_counter() or await self.wait_until(scheduled):
+                        break
+                    self.interrupt.clear()
+                if event == DOWN and gate is not None:
+                    waited = time.perf_counter()
+                    loop = asyncio.get_running_loop()
+                    if not await loop.run_in_executor(None, gate.wait, stop_event):
+                        return False
+                    shift = time.perf_counter() - waited
+                    start_time += shift
+                    scheduled += shift
+                injected = time.perf_counter()
+                inject(backend, event, x, y, button, data)
+                backend.flush()
+                if event != MOVE:
+                    if event == DOWN or event == KEY_DOWN:
+                        held.add((event, button if event == DOWN else data))
+                    elif event == UP or event == KEY_UP:
+                        held.discard((event - 1, button if event == UP else data))
+                if timed:
+                    PLAYBACK_LAG.record(injected - scheduled)
+                PLAYBACK_INJECT.record(time.perf_counter() - injected)
+                PLAYBACK_EVENTS.add()
+            completed = True
+            return True
+        finally:
+            # Leave nothing pressed after a cancel
+            for event, code in held if not completed else ():
+                if event == DOWN:
+                    backend.button_up(BUTTONS[code])
+                else:
+                    backend.key_up(code)
+            backend.flush()
@@ -4,8 +4,9 @@ from PyQt6.QtGui import QPainter, QColor
 
 class PositionSelector(QWidget):
     position_selected = pyqtSignal(QPoint)
+    positions_selected = pyqtSignal(list)
 
-    def __init__(self):
+    def __init__(self, multiple=False):
         super().__init__()
         self.setWindowTitle("Select Position")
         self.setWindowFlags(
@@ -13,6 +14,10 @@ class PositionSelector(QWidget):
         )
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setMouseTracking(True)
+        # In multiple mode every left click adds a point; right click or
+        # Enter finishes, Escape cancels
+        self.multiple = multiple
+        self.points = []
         self.showFullScreen()  # Display the window in fullscreen mode
 
     def paintEvent(self, event):
@@ -21,9 +26,33 @@ class PositionSelector(QWidget):
         # Example: Semi-transparent gray
         color = QColor(128, 128, 128, 100)  # RGB: Gray, Alpha: 100/255
         painter.fillRect(self.rect(), color)
+        # Mark the points picked so far with their order
+        painter.setPen(QColor(255, 0, 0))
+        for number, point in enumerate(self.points, 1):
+            local = self.mapFromGlobal(point)
+            painter.drawEllipse(local, 6, 6)
+            painter.drawText(local + QPoint(8, -8), str(number))
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             # Emit the global position where the user clicked
-            self.position_selected.emit(event.globalPosition().toPoint())
-            self.close()
\ No newline at end of file
+            point = event.globalPosition().toPoint()
+            if self.multiple:
+                self.points.append(point)
+                self.update()
+                return
+            self.position_selected.emit(point)
+            self.close()
+        elif event.button() == Qt.MouseButton.RightButton and self.multiple:
+            self.finish()
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and self.multiple:
+            self.finish()
+        elif event.key() == Qt.Key.Key_Escape:
+            self.close()
+
+    def finish(self):
+        if self.points:
+            self.positions_selected.emit(self.points)
+        self.close()
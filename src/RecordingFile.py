@@ -0,0 +1,200 @@
+import bisect
+import mmap
+import os
+import queue
+import shutil
+import struct
+import threading
+from collections import namedtuple
+
+from ActionRecording import ActionRecording
+
+# On-disk recording format (.acrec): a fixed header followed by fixed-size
+# little-endian records, so the event count follows from the file size and
+# any event can be located without reading the ones before it.
+MAGIC = b'ACREC\x00'
+VERSION = 1
+HEADER = struct.Struct('<6sHHxxQd')  # magic, version, record size, count, duration
+RECORD = struct.Struct('<diiBBxxi')  # time, x, y, event, button, data
+TIME = struct.Struct('<d')  # the time field alone, for seeking
+HEADER_SIZE = 32
+EXTENSION = '.acrec'
+SEQUENCE_EXTENSION = '.acseq'  # segments of other recordings, see RecordingSegments
+
+DEFAULT_CHUNK_SIZE = 4096  # events per chunk handed to the writer thread
+PREFETCH_SIZE = 16384  # events decoded per block during playback
+
+RecordingHeader = namedtuple('RecordingHeader', ['version', 'count', 'duration'])
+
+
+def record_dtype():
+    # RECORD as a NumPy structured type
+    import numpy as np
+    return np.dtype({'names': ['times', 'xs', 'ys', 'events', 'buttons', 'data'],
+                     'formats': ['<f8', '<i4', '<i4', 'u1', 'u1', '<i4'],
+                     'offsets': [0, 8, 12, 16, 17, 20], 'itemsize': RECORD.size})
+
+
+def write_header(f, count, duration):
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, duration).ljust(HEADER_SIZE, b'\0'))
+
+
+# Appends events to a recording file while capture is running. Events are
+# packed into fixed-size chunks and a background thread writes each full
+# chunk. The capturing thread only waits for the disk once per chunk, when
+# it hands a full one over: it goes on once the chunk is written and synced,
+# so a crash loses at most the chunk that was still being filled.
+class RecordingWriter:
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_bytes = chunk_size * RECORD.size
+        self.chunk = bytearray()
+        self.count = 0
+        self.last_time = 0.0
+        self.file = open(path, 'wb')
+        write_header(self.file, 0, 0.0)
+        self.file.flush()
+        self.chunks = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.write_chunks, daemon=True)
+        self.thread.start()
+
+    def append(self, time, x, y, event=0, button=0, data=0):
+        self.chunk += RECORD.pack(time, x, y, event, button, data)
+        self.count += 1
+        self.last_time = time
+        if len(self.chunk) >= self.chunk_bytes:
+            self.chunks.put(self.chunk)
+            self.chunk = bytearray()
+            self.chunks.join()
+
+    def write_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            self.file.write(chunk)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.chunks.task_done()
+
+    def close(self):
+        if self.chunk:
+            self.chunks.put(self.chunk)
+            self.chunk = bytearray()
+        self.chunks.put(None)
+        self.thread.join()
+        # The header is only filled in on a clean close; readers fall back to
+        # the file size and the last record for files that were never closed
+        write_header(self.file, self.count, self.last_time)
+        self.file.close()
+        return RecordingFile(self.path)
+
+
+# A handle on a recording file. Opening it only reads the header, so it takes
+# the same time for any file size. Iterating memory-maps the file and decodes
+# one block at a time, asking the OS to read the next block ahead and to drop
+# the ones already played, so memory stays bounded however large the file is.
+class RecordingFile:
+    def __init__(self, path):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            magic, version, record_size, count, duration = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"{path} is not a recording file")
+            # Trust the file size over the header, which is stale if the
+            # writer never got to close the file
+            actual_count = (size - HEADER_SIZE) // RECORD.size
+            if count != actual_count and actual_count:
+                f.seek(HEADER_SIZE + (actual_count - 1) * RECORD.size)
+                duration = RECORD.unpack(f.read(RECORD.size))[0]
+            self.header = RecordingHeader(version, actual_count, duration)
+
+    def __len__(self):
+        return self.header.count
+
+    def duration(self):
+        return self.header.duration
+
+    def __iter__(self):
+        return self.iter_range(0, self.header.count)
+
+    def seek(self, time):
+        # Index of the first event at or after time. Records are fixed size
+        # and in time order, so the file is its own index: a binary search
+        # reads about log2(n) records.
+        count = self.header.count
+        if not count:
+            return 0
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return bisect.bisect_left(range(count), time,
+                                      key=lambda index: TIME.unpack_from(mm, HEADER_SIZE + index * RECORD.size)[0])
+
+    def iter_range(self, first, last):
+        # Iterates events first to last - 1, starting with a seek rather than
+        # reading the ones before
+        if last <= first:
+            return
+        block_bytes = PREFETCH_SIZE * RECORD.size
+        end = HEADER_SIZE + last * RECORD.size
+        can_advise = hasattr(mmap, 'MADV_WILLNEED')
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # madvise offsets have to be page aligned, and the records start
+            # right after the header, so advise from the page below
+            position = HEADER_SIZE + first * RECORD.size
+            dropped = position - position % mmap.PAGESIZE
+            while position < end:
+                block_end = min(position + block_bytes, end)
+                if can_advise and block_end < end:
+                    ahead = block_end - block_end % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_WILLNEED, ahead, min(block_bytes, end - ahead))
+                view = memoryview(mm)[position:block_end]
+                try:
+                    yield from RECORD.iter_unpack(view)
+                finally:
+                    view.release()
+                done = block_end - block_end % mmap.PAGESIZE
+                if can_advise and done > dropped:
+                    mm.madvise(mmap.MADV_DONTNEED, dropped, done - dropped)
+                    dropped = done
+                position = block_end
+
+    def columns(self):
+        # Field views over a read-only memory map; nothing is decoded up front
+        import numpy as np
+        dtype = record_dtype()
+        if not self.header.count:
+            return {name: np.empty(0, dtype[name]) for name in dtype.names}
+        records = np.memmap(self.path, dtype=dtype, mode='r', offset=HEADER_SIZE,
+                            shape=(self.header.count,))
+        return {name: records[name] for name in dtype.names}
+
+    def to_recording(self):
+        recording = ActionRecording()
+        for action in self:
+            recording.append(*action)
+        return recording
+
+    def save_json(self, path):
+        ActionRecording.write_json(self, path)
+
+    def save(self, path):
+        if os.path.abspath(path) != os.path.abspath(self.path):
+            shutil.copyfile(self.path, path)
+
+
+def save_recording(actions, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = RecordingWriter(path, chunk_size)
+    for action in actions:
+        writer.append(*action)
+    return writer.close()
+
+
+def load_recording(path):
+    if path.endswith(SEQUENCE_EXTENSION):
+        from RecordingSegments import load_sequence
+        return load_sequence(path)
+    if path.endswith(EXTENSION):
+        return RecordingFile(path)
+    return ActionRecording.load_json(path)
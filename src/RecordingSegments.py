@@ -0,0 +1,173 @@
+import bisect
+import json
+import os
+
+from ActionRecording import ActionRecording
+from RecordingFile import save_recording
+
+# Cutting and joining recordings without copying their events. A Segment is a
+# time range of a recording and a Sequence plays segments back to back; both
+# are recordings themselves, so they play, seek, nest and save like any other.
+# Recordings are seekable by time because .acrec files and ActionRecording
+# are both sorted by time: seek() is a binary search over the events as they
+# are, with no separate index to build or keep in step.
+
+SEQUENCE_VERSION = 1
+
+
+class RecordingView:
+    def __iter__(self):
+        return self.iter_range(0, len(self))
+
+    def to_recording(self):
+        recording = ActionRecording()
+        for action in self:
+            recording.append(*action)
+        return recording
+
+    def save(self, path):
+        # Writes the events out as a recording file of their own
+        save_recording(self, path)
+
+    def save_json(self, path):
+        ActionRecording.write_json(self, path)
+
+
+# Events of recording from start up to end seconds, retimed to start at 0.
+# Both ends are found with seek(), so making a segment takes O(log n) whatever
+# the range, and playing one reads nothing before start.
+class Segment(RecordingView):
+    def __init__(self, recording, start=0.0, end=None):
+        self.recording = recording
+        self.start = max(start, 0.0)
+        self.end = end
+        self.first = recording.seek(self.start) if self.start else 0
+        self.last = max(self.first, recording.seek(end) if end is not None else len(recording))
+
+    def __len__(self):
+        return self.last - self.first
+
+    def duration(self):
+        # Up to end when one is given, so a looped segment keeps its rhythm
+        # even if the range finishes with a pause
+        end = recording_end = self.recording.duration()
+        if self.end is not None:
+            end = min(self.end, recording_end)
+        return max(end - self.start, 0.0)
+
+    def seek(self, time):
+        index = self.recording.seek(time + self.start)
+        return min(max(index, self.first), self.last) - self.first
+
+    def iter_range(self, first, last):
+        first = self.first + max(first, 0)
+        last = self.first + min(last, len(self))
+        events = self.recording.iter_range(first, last)
+        start = self.start
+        if not start:
+            return events
+        return ((time - start, x, y, event, button, data)
+                for time, x, y, event, button, data in events)
+
+    def columns(self):
+        columns = {name: column[self.first:self.last] for name, column in self.recording.columns().items()}
+        columns['times'] = columns['times'] - self.start
+        return columns
+
+
+# Recordings played one after another, each starting where the one before
+# ends by duration(). Parts are referenced, not copied, and the same part may
+# appear any number of times, which is how loops are made.
+class Sequence(RecordingView):
+    def __init__(self, parts):
+        self.parts = list(parts)
+        self.offsets = []  # start time of each part
+        self.counts = []  # events before each part
+        offset = 0.0
+        count = 0
+        for part in self.parts:
+            self.offsets.append(offset)
+            self.counts.append(count)
+            offset += part.duration()
+            count += len(part)
+        self.total_duration = offset
+        self.total_count = count
+
+    def __len__(self):
+        return self.total_count
+
+    def duration(self):
+        return self.total_duration
+
+    def seek(self, time):
+        if not self.parts:
+            return 0
+        index = max(bisect.bisect_right(self.offsets, time) - 1, 0)
+        return self.counts[index] + self.parts[index].seek(time - self.offsets[index])
+
+    def iter_range(self, first, last):
+        last = min(last, self.total_count)
+        index = max(bisect.bisect_right(self.counts, first) - 1, 0)
+        while first < last and index < len(self.parts):
+            part, offset, count = self.parts[index], self.offsets[index], self.counts[index]
+            stop = min(last - count, len(part))
+            if first - count < stop:
+                events = part.iter_range(first - count, stop)
+                if offset:
+                    yield from ((time + offset, x, y, event, button, data)
+                                for time, x, y, event, button, data in events)
+                else:
+                    yield from events
+            first = max(first, count + stop)
+            index += 1
+
+    def columns(self):
+        import numpy as np
+        parts = [(part.columns(), offset) for part, offset in zip(self.parts, self.offsets)]
+        if not parts:
+            return ActionRecording().columns()
+        columns = {name: np.concatenate([part[name] for part, _ in parts]) for name in parts[0][0]}
+        columns['times'] = np.concatenate([part['times'] + offset for part, offset in parts])
+        return columns
+
+
+def loop(recording, count):
+    return Sequence([recording] * count)
+
+
+def load_sequence(path):
+    # A .acseq file lists segments of other recordings, by path relative to
+    # itself. Only the headers of the files it names are read.
+    from RecordingFile import load_recording
+    with open(path) as f:
+        spec = json.load(f)
+    if spec.get("version") != SEQUENCE_VERSION:
+        raise ValueError(f"{path} is not a sequence file")
+    directory = os.path.dirname(os.path.abspath(path))
+    recordings = {}
+    parts = []
+    for item in spec["segments"]:
+        file = os.path.join(directory, item["file"])
+        if file not in recordings:
+            recordings[file] = load_recording(file)
+        segment = Segment(recordings[file], item.get("start", 0.0), item.get("end"))
+        parts.extend([segment] * item.get("loops", 1))
+    return Sequence(parts)
+
+
+def save_sequence(path, segments):
+    # Writes segments, each a (file, start, end, loops) tuple with end None
+    # for the end of the file, as a .acseq file referring to the recordings
+    directory = os.path.dirname(os.path.abspath(path))
+    items = []
+    for file, start, end, loops in segments:
+        item = {"file": os.path.relpath(os.path.abspath(file), directory)}
+        if start:
+            item["start"] = start
+        if end is not None:
+            item["end"] = end
+        if loops != 1:
+            item["loops"] = loops
+        items.append(item)
+    with open(path, 'w') as f:
+        json.dump({"version": SEQUENCE_VERSION, "segments": items}, f, indent=2)
@@ -0,0 +1,128 @@
+import numpy as np
+
+from ActionRecording import ActionRecording, MOVE, SCROLL
+
+# Whole-recording transforms. Each one works on the NumPy columns of an
+# ActionRecording or RecordingFile in a handful of vectorized passes and
+# returns a new ActionRecording.
+
+
+def compact(recording, pixel_tolerance=1.0, time_tolerance=0.05):
+    columns = recording.columns()
+    events = columns['events']
+    # Only pointer events make up the path, as in resample(): keys do not
+    # carry a reliable position (the Windows hook records them at 0, 0), so
+    # they are kept as they are and merged back in by index
+    pointer = np.flatnonzero(events <= SCROLL)
+    if len(pointer) < 3:
+        return ActionRecording.from_columns(columns)
+    xs = columns['xs'][pointer]
+    ys = columns['ys'][pointer]
+    is_move = events[pointer] == MOVE
+
+    # A move to where the pointer already is changes nothing on replay
+    stationary = np.zeros(len(xs), dtype=bool)
+    stationary[1:] = (xs[1:] == xs[:-1]) & (ys[1:] == ys[:-1])
+    survivors = np.flatnonzero(~(is_move & stationary))
+
+    # Clicks and wheel are never dropped; moves are simplified in between
+    # them. Time is scaled into a third coordinate so a point is kept either
+    # when it bends the path by more than pixel_tolerance or when dropping it
+    # would shift the timing by more than time_tolerance.
+    points = (
+        xs[survivors].astype(np.float64),
+        ys[survivors].astype(np.float64),
+        columns['times'][pointer[survivors]] * (pixel_tolerance / time_tolerance),
+    )
+    keep = ~is_move[survivors]
+    keep[0] = keep[-1] = True
+    keep = simplify(points, keep, pixel_tolerance)
+
+    selected = events > SCROLL
+    selected[pointer[survivors[keep]]] = True
+    return ActionRecording.from_columns({name: column[selected] for name, column in columns.items()})
+
+
+def simplify(points, keep, tolerance):
+    # Ramer-Douglas-Peucker over points given as one array per coordinate,
+    # run breadth-first: every pass splits all unfinished segments at once at
+    # their farthest point, and drops the points of segments that are already
+    # within tolerance from later passes. Each point still in play carries the
+    # index of the segment it lies in, which a split only shifts, so no pass
+    # searches for it again.
+    keep = keep.copy()
+    active = np.flatnonzero(~keep)
+    segment = np.searchsorted(np.flatnonzero(keep), active) - 1
+    limit = tolerance * tolerance  # distances are compared squared
+    while len(active):
+        kept = np.flatnonzero(keep)
+        first, last = kept[:-1], kept[1:]
+        dx, dy, dz = ((axis[last] - axis[first])[segment] for axis in points)
+        ox, oy, oz = (axis[active] - axis[first][segment] for axis in points)
+        length = dx * dx + dy * dy + dz * dz
+        cross = (oy * dz - oz * dy) ** 2 + (oz * dx - ox * dz) ** 2 + (ox * dy - oy * dx) ** 2
+        # Degenerate segments measure straight to the start point
+        distance = np.divide(cross, length, out=ox * ox + oy * oy + oz * oz, where=length > 0)
+
+        # active is sorted, so the points of each segment are contiguous
+        starts = np.flatnonzero(np.r_[True, segment[1:] != segment[:-1]])
+        counts = np.diff(np.r_[starts, len(segment)])
+        longest = np.maximum.reduceat(distance, starts)
+        unfinished = longest > limit
+        if not unfinished.any():
+            break
+
+        # First point reaching its segment's maximum, for unfinished segments
+        remaining = np.repeat(unfinished, counts)
+        candidates = np.flatnonzero((distance == np.repeat(longest, counts)) & remaining)
+        candidate_segments = segment[candidates]
+        farthest = candidates[np.r_[True, candidate_segments[1:] != candidate_segments[:-1]]]
+        keep[active[farthest]] = True
+
+        # Every newly kept point moves the segments from it on up by one
+        split = np.zeros(len(active), dtype=np.intp)
+        split[farthest] = 1
+        segment += np.cumsum(split)
+        remaining[farthest] = False
+        active = active[remaining]
+        segment = segment[remaining]
+    return keep
+
+
+def resample(recording, rate):
+    # Replaces the recorded moves with moves on a fixed grid of rate per
+    # second, linearly interpolated between the recorded positions. Other
+    # events keep their exact times. Grid points that land on the position
+    # the pointer already has are dropped, so idle stretches cost nothing.
+    columns = recording.columns()
+    times = columns['times']
+    events = columns['events']
+    is_move = events == MOVE
+    if not is_move.any():
+        return ActionRecording.from_columns(columns)
+
+    # Every pointer event (moves, clicks, wheel) pins the path; keys do not
+    # carry a reliable position
+    pointer = events <= SCROLL
+    path_times = times[pointer]
+    move_times = times[is_move]
+    grid = np.arange(move_times[0], move_times[-1], 1 / rate)
+    grid = np.r_[grid, move_times[-1]]
+    grid_xs = np.rint(np.interp(grid, path_times, columns['xs'][pointer])).astype(np.int32)
+    grid_ys = np.rint(np.interp(grid, path_times, columns['ys'][pointer])).astype(np.int32)
+    moved = np.r_[True, (grid_xs[1:] != grid_xs[:-1]) | (grid_ys[1:] != grid_ys[:-1])]
+
+    others = ~is_move
+    merged_times = np.r_[grid[moved], times[others]]
+    # Stable sort puts a grid move before an event at the same instant
+    order = np.argsort(merged_times, kind='stable')
+    grid_count = int(moved.sum())
+    zeros = np.zeros(grid_count, dtype=np.int32)
+    return ActionRecording.from_columns({
+        'times': merged_times[order],
+        'xs': np.r_[grid_xs[moved], columns['xs'][others]][order],
+        'ys': np.r_[grid_ys[moved], columns['ys'][others]][order],
+        'events': np.r_[np.full(grid_count, MOVE, dtype=np.uint8), events[others]][order],
+        'buttons': np.r_[zeros.astype(np.uint8), columns['buttons'][others]][order],
+        'data': np.r_[zeros, columns['data'][others]][order],
+    })
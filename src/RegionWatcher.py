@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+from ClickEngine import wait_until
+
+# Watchers poll the screen at a fixed rate on their own thread and open a
+# gate when their condition holds. The click engine and the player wait on
+# the gate between clicks, so a change is acted on within one poll period.
+
+
+class Watcher(threading.Thread):
+    # A level watcher's condition holds for as long as polls say so, and the
+    # gate is closed again by the first poll it no longer holds for. Others
+    # report events, which stay until a waiter takes them.
+    level = False
+
+    def __init__(self, backend, rate=60, close_backend=False):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.close_backend = close_backend  # the backend was opened for this watcher alone
+        self.period = 1 / rate
+        self.stop_event = threading.Event()
+        self.triggered = threading.Event()
+        self.polls = 0
+        self.triggers = 0
+
+    def run(self):
+        deadline = time.perf_counter()
+        try:
+            # Polls do not need sub-millisecond timing, so never spin for them.
+            # A poll slower than the period leaves nothing to wait for, and
+            # wait_until only sees the stop event while it waits
+            while wait_until(deadline, self.stop_event, spin_threshold=0) and not self.stop_event.is_set():
+                self.polls += 1
+                if self.poll():
+                    self.triggers += 1
+                    self.triggered.set()
+                elif self.level:
+                    self.triggered.clear()
+                # Drop polls we fell behind on rather than running them back to back
+                deadline = max(deadline + self.period, time.perf_counter())
+        finally:
+            if self.close_backend:
+                self.backend.close()
+
+    def poll(self):
+        raise NotImplementedError
+
+    def wait(self, interrupt_event):
+        # Blocks until the condition fires and consumes it. Returns False if
+        # interrupt_event is set first; that is only checked once per poll
+        # period, the trigger itself wakes the waiter immediately.
+        while not self.triggered.wait(self.period):
+            if interrupt_event.is_set():
+                return False
+        self.triggered.clear()
+        return not interrupt_event.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# Fires when any block_size x block_size block of the region differs from
+# the previous frame. An unchanged frame costs one array comparison; a
+# changed one is reduced to a per-block dirty map, touching only the bands of
+# rows where something changed.
+class RegionWatcher(Watcher):
+    def __init__(self, backend, region, rate=60, block_size=16, min_blocks=1, close_backend=False):
+        super().__init__(backend, rate, close_backend)
+        self.region = region  # (left, top, width, height)
+        self.block_size = block_size
+        self.min_blocks = min_blocks
+        self.previous = None
+        self.dirty = None  # boolean block map of the last change
+
+    def poll(self):
+        frame = np.ascontiguousarray(self.backend.grab(self.region))
+        if self.previous is None:
+            self.previous = frame.copy()
+            return False
+        if np.array_equal(frame, self.previous):
+            return False
+        changed = frame != self.previous
+        np.copyto(self.previous, frame)
+        # Find the changed rows with one contiguous pass, then build the block
+        # map only for the bands of rows that contain a change
+        size = self.block_size
+        height, width = changed.shape[:2]
+        changed_rows = changed.reshape(height, -1).any(axis=1)
+        bands = np.logical_or.reduceat(changed_rows, np.arange(0, height, size))
+        starts = np.arange(0, width, size)
+        dirty = np.zeros((len(bands), len(starts)), dtype=bool)
+        for band in np.flatnonzero(bands):
+            columns = changed[band * size:(band + 1) * size].any(axis=0).any(axis=1)
+            dirty[band] = np.logical_or.reduceat(columns, starts)
+        if dirty.sum() >= self.min_blocks:
+            self.dirty = dirty
+            return True
+        return False
+
+
+# Fires while the pixel at (x, y) is within tolerance of color on every channel
+class PixelWatcher(Watcher):
+    level = True
+
+    def __init__(self, backend, position, color, tolerance=0, rate=60, close_backend=False):
+        super().__init__(backend, rate, close_backend)
+        self.region = (position[0], position[1], 1, 1)
+        self.color = np.array(color, dtype=np.int16)
+        self.tolerance = tolerance
+
+    def poll(self):
+        pixel = self.backend.grab(self.region)[0, 0, :3].astype(np.int16)
+        return bool((np.abs(pixel - self.color) <= self.tolerance).all())
@@ -19,7 +19,8 @@ class SettingsWindow(QDialog):
             "Start/Stop Clicking Hotkey": "start_stop_hotkey",
             "Start Recording Hotkey": "record_hotkey",
             "Stop Recording Hotkey": "stop_record_hotkey",
-            "Stop Playing Hotkey": "stop_play_hotkey"
+            "Stop Playing Hotkey": "stop_play_hotkey",
+            "Save Instant Replay Hotkey": "save_replay_hotkey"
         }
 
         for label_text, key in self.hotkeys.items():
@@ -107,7 +108,8 @@ class SettingsWindow(QDialog):
                 "start_stop_hotkey": "F6",
                 "record_hotkey": "F9",
                 "stop_record_hotkey": "F10",
-                "stop_play_hotkey": "F8"
+                "stop_play_hotkey": "F8",
+                "save_replay_hotkey": "F11"
             }.get(key, "")
             self.settings.setValue(key, default)
             self.hotkey_fields[key].setText(default)
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import numpy as np
+
+from ClickEngine import wait_until
+from Metrics import MATCH_TIME
+
+# Finds a template image inside a grayscale screen region by normalized
+# cross-correlation. The full search runs on a downsampled pyramid level and
+# is refined a few pixels at a time on the way back to full resolution; the
+# last match location is tried first, which is enough when the target has
+# not moved.
+
+MIN_TEMPLATE_SIZE = 8  # smallest template side worth searching at a coarse level
+REFINE_RADIUS = 2  # pixels searched around the upscaled match at each finer level
+
+
+def to_grayscale(image):
+    # Accepts a PIL image or an array and returns float32 luminance
+    if hasattr(image, 'convert'):
+        image = image.convert('L')
+    array = np.asarray(image, dtype=np.float32)
+    if array.ndim == 3:
+        array = array[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return array
+
+
+def downsample(image):
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    image = image[:height, :width]
+    return (image[0::2, 0::2] + image[1::2, 0::2] + image[0::2, 1::2] + image[1::2, 1::2]) * 0.25
+
+
+def window_sums(image, height, width):
+    # Sum of every height x width window, from an integral image
+    integral = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.float64)
+    integral[1:, 1:] = image.cumsum(0).cumsum(1)
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+def ncc_map(image, template):
+    # Normalized cross-correlation of template at every position it fits
+    height, width = template.shape
+    if image.shape[0] < height or image.shape[1] < width:
+        return np.zeros((0, 0))
+    centered = template - template.mean()
+    template_norm = np.sqrt((centered * centered).sum())
+    shape = image.shape
+    # Circular correlation is exact for every position the template fits in
+    correlation = np.fft.irfft2(np.fft.rfft2(image) * np.conj(np.fft.rfft2(centered, shape)), shape)
+    correlation = correlation[:shape[0] - height + 1, :shape[1] - width + 1]
+    sums = window_sums(image, height, width)
+    squares = window_sums(image.astype(np.float64) ** 2, height, width)
+    variance = np.maximum(squares - sums * sums / (height * width), 0)
+    denominator = np.sqrt(variance) * template_norm
+    return np.where(denominator > 1e-6, correlation / np.where(denominator > 1e-6, denominator, 1), 0)
+
+
+def ncc_at(image, template):
+    # Score of a template against an equally sized patch
+    patch = image - image.mean()
+    centered = template - template.mean()
+    denominator = np.sqrt((patch * patch).sum() * (centered * centered).sum())
+    return float((patch * centered).sum() / denominator) if denominator > 1e-6 else 0.0
+
+
+class TemplateMatcher:
+    def __init__(self, template, threshold=0.9, max_levels=3):
+        self.template = to_grayscale(template)
+        self.threshold = threshold
+        self.last = None
+        self.templates = [self.template]
+        while (len(self.templates) <= max_levels - 1
+               and min(self.templates[-1].shape) >= 2 * MIN_TEMPLATE_SIZE):
+            self.templates.append(downsample(self.templates[-1]))
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        from PIL import Image
+        return cls(Image.open(path), **kwargs)
+
+    def match(self, image):
+        # Returns (x, y, score) of the template's top-left corner, or None
+        image = to_grayscale(image)
+        height, width = self.template.shape
+        if self.last is not None:
+            x, y = self.last
+            if y + height <= image.shape[0] and x + width <= image.shape[1]:
+                score = ncc_at(image[y:y + height, x:x + width], self.template)
+                if score >= self.threshold:
+                    return x, y, score
+
+        images = [image]
+        for _ in self.templates[1:]:
+            images.append(downsample(images[-1]))
+
+        # Exhaustive search only at the coarsest level
+        scores = ncc_map(images[-1], self.templates[-1])
+        if not scores.size:
+            self.last = None
+            return None
+        y, x = np.unravel_index(np.argmax(scores), scores.shape)
+        score = scores[y, x]
+
+        for level in range(len(self.templates) - 2, -1, -1):
+            template = self.templates[level]
+            level_image = images[level]
+            x, y = 2 * x, 2 * y
+            top = max(0, y - REFINE_RADIUS)
+            left = max(0, x - REFINE_RADIUS)
+            window = level_image[top:y + REFINE_RADIUS + template.shape[0],
+                                 left:x + REFINE_RADIUS + template.shape[1]]
+            scores = ncc_map(window, template)
+            if not scores.size:
+                break
+            dy, dx = np.unravel_index(np.argmax(scores), scores.shape)
+            x, y, score = left + dx, top + dy, scores[dy, dx]
+
+        if score >= self.threshold:
+            self.last = (int(x), int(y))
+            return int(x), int(y), float(score)
+        self.last = None
+        return None
+
+
+# Polls a screen region off the GUI thread and clicks the center of the
+# template whenever it is found. Shares the ClickEngine interface so the
+# window can start and stop either one the same way.
+class TemplateTrigger(threading.Thread):
+    def __init__(self, plan, matcher, region, backend, on_finished=None, capture=None):
+        super().__init__(daemon=True)
+        self.plan = plan  # interval is the poll period, repeat the number of matches to click
+        self.matcher = matcher
+        self.region = region  # (left, top, width, height) in screen coordinates
+        self.backend = backend
+        # Backend the screen is grabbed through, when not the one clicks go
+        # to; it belongs to the trigger and is closed when the trigger ends
+        self.capture = capture
+        self.on_finished = on_finished
+        self.stop_event = threading.Event()
+
+        self.frames = 0
+        self.clicks = 0
+        self.match_time = 0.0
+
+    def swap_plan(self, plan):
+        if isinstance(plan, tuple):
+            plan = plan[0]
+        self.plan = plan
+
+    def run(self):
+        deadline = time.perf_counter()
+        height, width = self.matcher.template.shape
+        grab = (self.capture or self.backend).grab
+        try:
+            # wait_until only sees the stop event while it waits, and matching
+            # slower than the interval leaves nothing to wait for
+            while wait_until(deadline, self.stop_event) and not self.stop_event.is_set():
+                plan = self.plan
+                frame = grab(self.region)
+                start = time.perf_counter()
+                found = self.matcher.match(frame)
+                elapsed = time.perf_counter() - start
+                self.match_time += elapsed
+                MATCH_TIME.record(elapsed)
+                self.frames += 1
+                if found:
+                    x, y, _ = found
+                    position = (self.region[0] + x + width // 2, self.region[1] + y + height // 2)
+                    self.backend.click(plan.button, plan.clicks, position)
+                    self.backend.flush()
+                    self.clicks += 1
+                    if plan.repeat is not None and self.clicks >= plan.repeat:
+                        break
+                deadline = max(deadline + plan.interval, time.perf_counter())
+        finally:
+            if self.capture is not None:
+                self.capture.close()
+        if self.on_finished and not self.stop_event.is_set():
+            self.on_finished()
+
+    def summary(self):
+        mean = self.match_time / self.frames * 1000 if self.frames else 0.0
+        return f"{self.clicks} matches clicked, {self.frames} frames, {mean:.2f} ms per match"
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,707 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from array import array
+
+from ActionRecording import ActionRecording
+from ClickEngine import ClickEngine
+from ClickPlan import ClickPlan
+from InputBackend import NullBackend
+
+# Headless benchmarks for the click loop, the recorder and the player. Every
+# case injects into a stand-in backend, so no display is needed, and results
+# are printed (or written) as JSON for comparing across commits.
+
+
+class TimingBackend(NullBackend):
+    # Timestamps every injected event instead of logging it
+    def __init__(self):
+        super().__init__(record=False)
+        self.times = array('d')
+
+    def move(self, x, y):
+        self.times.append(time.perf_counter())
+
+    def button_down(self, button="left"):
+        self.times.append(time.perf_counter())
+
+    def button_up(self, button="left"):
+        pass
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_us(values):
+    values = sorted(values)
+    return {
+        "p50_us": percentile(values, 50) * 1e6,
+        "p99_us": percentile(values, 99) * 1e6,
+        "max_us": (values[-1] if values else 0.0) * 1e6,
+    }
+
+
+def bench_click_throughput(duration):
+    backend = NullBackend(record=False)
+    # An interval far below the cost of one click keeps the engine saturated
+    engine = ClickEngine(ClickPlan(interval=1e-9), backend)
+    start = time.perf_counter()
+    engine.start()
+    time.sleep(duration)
+    engine.stop()
+    engine.join()
+    elapsed = time.perf_counter() - start
+    return {"clicks": engine.clicks, "clicks_per_second": engine.clicks / elapsed}
+
+
+def bench_humanized(clicks):
+    from ClickPlan import Humanize
+    from ClickSchedule import schedule_stream
+
+    # Per-click cost of a saturated engine with a fixed and with a humanized
+    # schedule, and of drawing from the schedule stream alone
+    humanize = Humanize(jitter=1e-10, offset=5, pause_every=1000, pause=1e-9, pause_jitter=1e-10, seed=1)
+    result = {"clicks": clicks}
+    for name, plan in (("fixed", ClickPlan(interval=1e-9, position=(500, 500), repeat=clicks)),
+                       ("humanized", ClickPlan(interval=1e-9, position=(500, 500), repeat=clicks,
+                                               humanize=humanize))):
+        engine = ClickEngine(plan, NullBackend(record=False))
+        start = time.perf_counter()
+        engine.start()
+        engine.join()
+        result[f"{name}_ns_per_click"] = (time.perf_counter() - start) / clicks * 1e9
+    stream = schedule_stream(ClickPlan(interval=0.001, humanize=humanize))
+    start = time.perf_counter()
+    for _ in range(clicks):
+        next(stream)
+    result["stream_ns_per_click"] = (time.perf_counter() - start) / clicks * 1e9
+    return result
+
+
+class RoundTripBackend(NullBackend):
+    # Stands in for a display connection: every flush busy-waits for a round
+    # trip, as XFlush plus the server's processing would
+    def __init__(self, round_trip=50e-6):
+        super().__init__(record=False)
+        self.round_trip = round_trip
+
+    def flush(self):
+        end = time.perf_counter() + self.round_trip
+        while time.perf_counter() < end:
+            pass
+
+
+def bench_burst(duration, warmup=0.25):
+    from BurstEngine import BurstEngine
+
+    # Achieved against target rate for the burst engine, on a backend with
+    # free flushes and one with a 50 us round trip per flush. The interval
+    # engine given an interval far too short to keep up with, on the same
+    # backends, is the baseline.
+    results = []
+    for name, make_backend in (("null", lambda: NullBackend(record=False)), ("round_trip_50us", RoundTripBackend)):
+        baseline = ClickEngine(ClickPlan(interval=1e-7), make_backend())
+        baseline.start()
+        time.sleep(warmup)
+        first = baseline.clicks
+        time.sleep(duration)
+        baseline_rate = (baseline.clicks - first) / duration
+        baseline.stop()
+        baseline.join()
+        for rate in (1000, 10000, 100000, None):
+            engine = BurstEngine(ClickPlan(interval=0.0), make_backend(), rate)
+            engine.start()
+            time.sleep(warmup)
+            first = engine.clicks
+            start = time.perf_counter()
+            time.sleep(duration)
+            achieved = (engine.clicks - first) / (time.perf_counter() - start)
+            engine.stop()
+            engine.join()
+            result = {"backend": name, "target": rate or "max", "achieved": achieved,
+                      "batch_size": engine.batch_size, "interval_engine_max": baseline_rate}
+            if rate:
+                result["error_pct"] = (achieved - rate) / rate * 100
+            results.append(result)
+    return results
+
+
+def bench_multi_target(targets, duration):
+    # Many targets at staggered intervals, all served by the one engine thread
+    plans = [ClickPlan(interval=0.001 + i * 1e-5, position=(i, i)) for i in range(targets)]
+    errors = []
+    engine = ClickEngine(plans, NullBackend(record=False), error_log=errors)
+    engine.start()
+    time.sleep(duration)
+    engine.stop()
+    engine.join()
+    result = {"targets": targets, "clicks_per_second": engine.clicks / duration}
+    result.update(summarize_us(errors))
+    return result
+
+
+def bench_click_jitter(interval, clicks):
+    errors = []
+    engine = ClickEngine(ClickPlan(interval=interval, repeat=clicks), NullBackend(record=False),
+                         error_log=errors)
+    engine.start()
+    engine.join()
+    result = {"interval_ms": interval * 1000, "clicks": engine.clicks}
+    result.update(summarize_us(errors))
+    return result
+
+
+def bench_recorder_overhead(duration, events=200000):
+    from ActionRecorder import ActionRecorder
+    from ActionRecording import MOVE
+    from InputHooks import SyntheticEventSource
+
+    source = SyntheticEventSource()
+    recorder = ActionRecorder(NullBackend(record=False), source=source)
+    thread = threading.Thread(target=recorder.run)
+    thread.start()
+    while source.callback is None:
+        time.sleep(0.001)
+
+    # CPU burnt while nothing happens should be close to zero
+    cpu_start = time.process_time()
+    time.sleep(duration)
+    idle_cpu = time.process_time() - cpu_start
+
+    start = time.perf_counter()
+    for i in range(events):
+        source.emit(MOVE, i % 1920, i % 1080)
+    elapsed = time.perf_counter() - start
+    recorder.stop()
+    thread.join()
+    return {
+        "events": len(recorder.recorded_actions),
+        "events_per_second": events / elapsed,
+        "overhead_per_event_us": elapsed / events * 1e6,
+        "idle_cpu_percent": idle_cpu / duration * 100,
+    }
+
+
+def bench_playback_fidelity(size, duration):
+    from Playback import play
+
+    step = duration / size
+    actions = ActionRecording()
+    for i in range(size):
+        actions.append(i * step, i % 1920, i % 1080)
+    backend = TimingBackend()
+    start = time.perf_counter()
+    play(actions, backend)
+    elapsed = time.perf_counter() - start
+
+    # Lag of each event relative to where it should have landed after the first
+    first = backend.times[0]
+    lags = [max(0.0, (t - first) - scheduled) for t, scheduled in zip(backend.times, actions.times)]
+    result = {"events": size, "scheduled_s": actions.duration(), "elapsed_s": elapsed}
+    result.update(summarize_us(lags))
+    return result
+
+
+def bench_playback_engine(size, duration, load=False):
+    from Playback import Timeline, play
+    from PlaybackEngine import PlaybackEngine
+
+    # The same two tracks through the plain playback loop and through the
+    # engine, optionally with another thread keeping the interpreter busy
+    step = duration / size
+    mouse = ActionRecording()
+    keys = ActionRecording()
+    for i in range(size):
+        (mouse if i % 4 else keys).append(i * step, i % 1920, i % 1080)
+    scheduled = sorted(mouse.times + keys.times)
+
+    def lags(backend):
+        first = backend.times[0]
+        return summarize_us([max(0.0, (t - first) - s) for t, s in zip(backend.times, scheduled)])
+
+    stop = threading.Event()
+    if load:
+        def spin():
+            while not stop.is_set():
+                sum(range(1000))
+        threading.Thread(target=spin, daemon=True).start()
+    try:
+        backend = TimingBackend()
+        play(Timeline([mouse, keys]), backend)
+        thread_lags = lags(backend)
+
+        backend = TimingBackend()
+        engine = PlaybackEngine(backend)
+        engine.play([mouse, keys]).result()
+        engine.close()
+        engine_lags = lags(backend)
+    finally:
+        stop.set()
+    return {"events": size, "load": load, "thread": thread_lags, "engine": engine_lags}
+
+
+def bench_instant_replay(minutes=10, events=1000000):
+    import os
+    import tempfile
+    from InputHooks import SyntheticEventSource
+    from InstantReplay import InstantReplay
+
+    # Capture cost per event through the event source callback, and the time
+    # to save a full buffer while capture is running
+    source = SyntheticEventSource()
+    replay = InstantReplay(source, minutes=minutes)
+    replay.start()
+    record = replay.buffer.record
+    now = time.perf_counter()
+    start = time.perf_counter()
+    for i in range(events):
+        record(now, 0, i & 1023, i & 511, 0, 0)
+    capture = (time.perf_counter() - start) / events
+    fd, path = tempfile.mkstemp(suffix='.acrec')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        saved = replay.save(path)
+        save = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    replay.stop()
+    return {"minutes": minutes, "buffer_mb": replay.buffer.nbytes() / 2 ** 20,
+            "capture_ns_per_event": capture * 1e9, "saved_events": len(saved), "save_ms": save * 1e3}
+
+
+def bench_recording_open(size):
+    import os
+    import tempfile
+    from RecordingFile import RecordingWriter, RecordingFile
+
+    fd, path = tempfile.mkstemp(suffix='.acrec')
+    os.close(fd)
+    try:
+        writer = RecordingWriter(path, chunk_size=65536)
+        for i in range(size):
+            writer.append(i * 1e-3, i % 1920, i % 1080)
+        writer.close()
+        start = time.perf_counter()
+        recording = RecordingFile(path)
+        opened = time.perf_counter()
+        next(iter(recording))
+        first_event = time.perf_counter()
+    finally:
+        os.remove(path)
+    return {"events": size, "open_us": (opened - start) * 1e6,
+            "first_event_us": (first_event - start) * 1e6}
+
+
+def bench_seek(size, runs=1000):
+    import os
+    import random
+    import tempfile
+    from RecordingFile import RecordingWriter, RecordingFile
+    from RecordingSegments import Segment
+
+    # Seek time by timestamp, and the time from asking to start 90% of the
+    # way in to holding the first event, against skipping there by iterating
+    fd, path = tempfile.mkstemp(suffix='.acrec')
+    os.close(fd)
+    try:
+        writer = RecordingWriter(path, chunk_size=65536)
+        for i in range(size):
+            writer.append(i * 1e-3, i % 1920, i % 1080)
+        writer.close()
+        recording = RecordingFile(path)
+        duration = recording.duration()
+        seeks = []
+        for _ in range(runs):
+            target = random.random() * duration
+            start = time.perf_counter()
+            recording.seek(target)
+            seeks.append(time.perf_counter() - start)
+        offset = duration * 0.9
+        start = time.perf_counter()
+        next(iter(Segment(recording, offset)))
+        first_event = time.perf_counter() - start
+        start = time.perf_counter()
+        next(action for action in recording if action[0] >= offset)
+        skipped = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    return {"events": size, "seek_us": summarize_us(seeks),
+            "offset_first_event_us": first_event * 1e6, "skip_first_event_us": skipped * 1e6}
+
+
+def bench_compaction(size, noisy=False):
+    import numpy as np
+    from RecordingTransforms import compact
+
+    # A wandering pointer sampled every millisecond, with a click every
+    # second. The noisy walk jitters every sample, the worst case for
+    # simplification since hardly any point lies on a straight run.
+    rng = np.random.default_rng(0)
+    times = np.arange(size) * 0.001
+    if noisy:
+        xs = np.cumsum(rng.integers(-2, 3, size)).astype(np.int32)
+        ys = np.cumsum(rng.integers(-2, 3, size)).astype(np.int32)
+    else:
+        angle = np.cumsum(rng.normal(0, 0.01, size))
+        xs = np.cumsum(np.cos(angle) * 0.5).astype(np.int32)
+        ys = np.cumsum(np.sin(angle) * 0.5).astype(np.int32)
+    events = np.zeros(size, dtype=np.uint8)
+    events[::1000] = 1
+    recording = ActionRecording.from_columns({'times': times, 'xs': xs, 'ys': ys, 'events': events,
+                                              'buttons': events, 'data': np.zeros(size)})
+    start = time.perf_counter()
+    compacted = compact(recording)
+    elapsed = time.perf_counter() - start
+    return {"events": size, "noisy": noisy, "compacted_events": len(compacted), "seconds": elapsed}
+
+
+def bench_resample(size, rate=60):
+    import numpy as np
+    from RecordingTransforms import resample
+
+    # A pointer moving every millisecond, replayed at rate moves per second
+    times = np.arange(size) * 0.001
+    recording = ActionRecording.from_columns({
+        'times': times, 'xs': (times * 200) % 1920, 'ys': (times * 100) % 1080,
+        'events': np.zeros(size), 'buttons': np.zeros(size), 'data': np.zeros(size)})
+    start = time.perf_counter()
+    resampled = resample(recording, rate)
+    elapsed = time.perf_counter() - start
+    return {"events": size, "rate": rate, "resampled_events": len(resampled), "seconds": elapsed}
+
+
+def bench_template_matching(duration):
+    import numpy as np
+    from TemplateMatcher import TemplateMatcher
+
+    # A blocky synthetic 1280x720 screenshot and a 64x48 template cut from it
+    rng = np.random.default_rng(0)
+    screen = (rng.random((90, 160)) * 255).repeat(8, 0).repeat(8, 1).astype(np.float32)
+    matcher = TemplateMatcher(screen[320:368, 640:704])
+
+    def rate(frames):
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            for frame in frames:
+                matcher.match(frame)
+                count += 1
+        return count / (time.perf_counter() - start)
+
+    # Cached: the target stays put. Search: it moves every frame, so the
+    # pyramid search runs each time.
+    moved = [np.roll(screen, (i * 8, i * 16), (0, 1)) for i in range(1, 5)]
+    return {"screen": "1280x720", "template": "64x48",
+            "cached_matches_per_second": rate([screen]),
+            "search_matches_per_second": rate(moved)}
+
+
+def bench_region_watcher(duration):
+    import numpy as np
+    from InputBackend import NullBackend
+    from RegionWatcher import RegionWatcher
+
+    # Cost of one poll on an unchanged and on a changing 1920x1080 frame,
+    # and the CPU the watcher thread uses at 60 Hz
+    rng = np.random.default_rng(0)
+    screen = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    backend = NullBackend(record=False, screen=screen)
+    watcher = RegionWatcher(backend, (0, 0, 1920, 1080))
+    watcher.poll()
+
+    def mean_poll(change):
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            if change:
+                screen[count % 1080, 0, 0] ^= 1
+            watcher.poll()
+            count += 1
+        return (time.perf_counter() - start) / count * 1e6
+
+    unchanged_us = mean_poll(False)
+    changed_us = mean_poll(True)
+
+    watcher = RegionWatcher(backend, (0, 0, 1920, 1080), rate=60)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    watcher.start()
+    time.sleep(duration)
+    watcher.stop()
+    watcher.join()
+    cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100
+    return {"region": "1920x1080", "unchanged_poll_us": unchanged_us,
+            "changed_poll_us": changed_us, "cpu_percent_at_60hz": cpu}
+
+
+def bench_metrics(count=1000000):
+    from Metrics import Counter, Histogram
+
+    # Per-call cost of what the click and playback loops add for instrumentation
+    histogram = Histogram("bench_seconds", "")
+    counter = Counter("bench_total", "")
+    values = [(i % 5000) * 1e-6 for i in range(count)]
+    start = time.perf_counter()
+    for value in values:
+        histogram.record(value)
+    record = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for _ in values:
+        counter.add()
+    add = (time.perf_counter() - start) / count
+    return {"histogram_record_ns": record * 1e9, "counter_add_ns": add * 1e9}
+
+
+def bench_hotkey_latency(runs=50, interval=0.01):
+    from Hotkeys import SyntheticHotkeyBackend
+
+    # From a hotkey press to the click engine's thread having exited, with
+    # the stop dispatched on the hotkey thread as the window does
+    latencies = []
+    hotkeys = SyntheticHotkeyBackend()
+    hotkeys.register(1, 0xffc3)
+    for _ in range(runs):
+        engine = ClickEngine(ClickPlan(interval=interval), NullBackend(record=False))
+        hotkeys.start(lambda hotkey_id, pressed_at: engine.stop())
+        engine.start()
+        time.sleep(interval * 2.5)
+        pressed = time.perf_counter()
+        hotkeys.press(1)
+        engine.join()
+        latencies.append(time.perf_counter() - pressed)
+        hotkeys.stop()
+    result = {"runs": runs, "interval_ms": interval * 1000}
+    result.update(summarize_us(latencies))
+    return result
+
+
+def bench_control(runs=2000, starts=50):
+    import os
+    import tempfile
+    from ControlClient import ControlClient
+    from ControlServer import Controller, ControlServer
+    from PlaybackEngine import PlaybackEngine
+
+    # Round trips through the control API over a Unix socket and localhost
+    # TCP, the dispatch cost alone, and from sending a click command to the
+    # backend seeing the first click
+    backend = TimingBackend()
+    player = PlaybackEngine(backend).start()
+    controller = Controller(backend, player)
+    path = os.path.join(tempfile.mkdtemp(), "control.sock")
+    servers = [ControlServer(controller, path=path).start(), ControlServer(controller, port=0).start()]
+    result = {"runs": runs}
+    try:
+        dispatch = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            controller.dispatch({"cmd": "status"})
+            dispatch.append(time.perf_counter() - start)
+        result["dispatch_us"] = summarize_us(dispatch)
+        for name, client in (("unix", ControlClient(path)), ("tcp", ControlClient(port=servers[1].port, token=servers[1].token))):
+            with client:
+                for cmd in ("ping", "status"):
+                    latencies = []
+                    for _ in range(runs):
+                        start = time.perf_counter()
+                        client.call(cmd)
+                        latencies.append(time.perf_counter() - start)
+                    result[f"{name}_{cmd}_us"] = summarize_us(latencies)
+        with ControlClient(path) as client:
+            batch = [("status", {})] * 20
+            start = time.perf_counter()
+            for _ in range(runs // 20):
+                client.batch(batch)
+            result["unix_batch20_us_per_command"] = (time.perf_counter() - start) / (runs // 20 * 20) * 1e6
+            latencies = []
+            for _ in range(starts):
+                del backend.times[:]
+                start = time.perf_counter()
+                client.click(1.0)
+                while not backend.times:
+                    time.sleep(0)
+                latencies.append(backend.times[0] - start)
+                client.stop_clicking()
+            result["click_start_us"] = summarize_us(latencies)
+    finally:
+        for server in servers:
+            server.stop()
+        player.close()
+        os.rmdir(os.path.dirname(path))
+    return result
+
+
+def bench_macro(iterations):
+    import tracemalloc
+    from Macro import compile_macro, run
+
+    # A tight loop with no waits measures the interpreter itself; the traced
+    # run checks that memory does not grow with the iteration count
+    program = compile_macro(f"repeat {iterations}\n  click left 10 20\nend")
+    backend = NullBackend(record=False)
+    start = time.perf_counter()
+    run(program, backend)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run(program, NullBackend(record=False))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"iterations": iterations, "seconds": elapsed,
+            "clicks_per_second": iterations / elapsed, "peak_traced_bytes": peak}
+
+
+def bench_job_runner(workers, jobs=16, clicks=20000):
+    from JobRunner import run_jobs
+
+    # CPU-bound click jobs on the null backend; throughput should grow with
+    # workers up to the core count. Includes starting the worker processes.
+    stats = run_jobs([f"click --interval 1e-9 --repeat {clicks}"] * jobs, workers=workers,
+                     backend="null")
+    return {key: stats[key] for key in ("workers", "jobs", "completed", "failed", "restarts",
+                                        "seconds", "jobs_per_second", "actions_per_second")}
+
+
+CLI_STARTUP_BUDGET = 0.1  # seconds from spawning the CLI to it exiting after one click
+
+
+def bench_library(entries=10000, runs=50):
+    import shutil
+    import tempfile
+    from MacroLibrary import MacroLibrary
+
+    # Index-only costs: the entries point at files that do not exist, which
+    # listing and searching must never notice
+    directory = tempfile.mkdtemp()
+    words = ["farm", "login", "daily", "quest", "craft", "trade", "boss", "fish"]
+    try:
+        library = MacroLibrary(directory)
+        start = time.perf_counter()
+        for i in range(entries):
+            name = f"{words[i % 8]} {words[i // 8 % 8]} {i}"
+            library.insert(name, f"{directory}/files/{i}.acrec", "recording", i * 0.1, i,
+                           (1920, 1080), None, [words[i % 5], f"set{i % 100}"])
+        insert = (time.perf_counter() - start) / entries
+        cases = {"list": lambda: library.search(),
+                 "search_prefix": lambda: library.search("fa qu"),
+                 "search_tag": lambda: library.search(tag="set7"),
+                 "get": lambda: library.get(entries // 2)}
+        result = {"entries": entries, "insert_us": insert * 1e6}
+        for case, query in cases.items():
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                query()
+                times.append(time.perf_counter() - start)
+            result[case] = summarize_us(times)
+        library.close()
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+
+def bench_cli_startup(runs=20):
+    import os
+
+    # Spawn-to-exit of a one-click run bounds cold start to first click from
+    # above; a bare interpreter start is measured alongside for reference
+    directory = os.path.dirname(os.path.abspath(__file__))
+    click = [sys.executable, os.path.join(directory, "cli.py"),
+             "--backend", "null", "--quiet", "click", "--interval", "0.001", "--repeat", "1"]
+
+    def median_run(command):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, cwd=directory)
+            times.append(time.perf_counter() - start)
+        return percentile(sorted(times), 50)
+
+    first_click = median_run(click)
+    imports_qt = subprocess.run(
+        [sys.executable, "-c", "import sys, cli; cli.main(sys.argv[1:]); "
+         "print(any(name.startswith('PyQt6') for name in sys.modules))"] + click[2:],
+        capture_output=True, text=True, check=True, cwd=directory).stdout.strip() == "True"
+    return {"runs": runs, "interpreter_ms": median_run([sys.executable, "-c", "pass"]) * 1000,
+            "first_click_ms": first_click * 1000, "budget_ms": CLI_STARTUP_BUDGET * 1000,
+            "within_budget": first_click <= CLI_STARTUP_BUDGET, "imports_qt": imports_qt}
+
+
+def worker_counts():
+    import os
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoClicker benchmarks")
+    parser.add_argument("--duration", type=float, default=1.0,
+                        help="seconds to run each timed case")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma separated playback recording sizes (up to 10000000)")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = {
+        "click_throughput": bench_click_throughput(args.duration),
+        "metrics": bench_metrics(),
+        "click_jitter": [bench_click_jitter(interval, max(100, int(args.duration / interval)))
+                         for interval in (0.0005, 0.001, 0.01)],
+        "humanized": [bench_humanized(clicks) for clicks in (100000, 1000000)],
+        "burst": bench_burst(args.duration),
+        "multi_target": [bench_multi_target(targets, args.duration) for targets in (1, 100, 500)],
+        "recorder_overhead": bench_recorder_overhead(args.duration),
+        "playback_fidelity": [bench_playback_fidelity(int(size), args.duration)
+                              for size in args.sizes.split(",")],
+        "playback_engine": [bench_playback_engine(int(size), args.duration, load)
+                            for size in args.sizes.split(",")[:3] for load in (False, True)],
+        "instant_replay": bench_instant_replay(),
+        "recording_open": [bench_recording_open(int(size)) for size in args.sizes.split(",")],
+        "seek": [bench_seek(int(size)) for size in args.sizes.split(",")],
+        "compaction": [bench_compaction(int(size)) for size in args.sizes.split(",")]
+                      + [bench_compaction(10000000, noisy=True)],
+        "template_matching": bench_template_matching(args.duration),
+        "region_watcher": bench_region_watcher(args.duration),
+        "resample": [bench_resample(int(size)) for size in args.sizes.split(",")],
+        "macro": [bench_macro(int(size)) for size in args.sizes.split(",")],
+        "hotkey_latency": bench_hotkey_latency(),
+        "library": bench_library(),
+        "control": bench_control(),
+        "cli_startup": bench_cli_startup(),
+        "job_runner": [bench_job_runner(workers) for workers in worker_counts()],
+    }
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
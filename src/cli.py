@@ -0,0 +1,348 @@
+import argparse
+import os
+import re
+import signal
+import sys
+import time
+
+# Runs clicking jobs and recordings without the GUI. Nothing from Qt is ever
+# imported, and the engine modules are only imported once the command that
+# needs them has been parsed, so a scripted run pays for the Python start and
+# the input backend before its first click and little else.
+
+
+def parse_position(text):
+    try:
+        x, y = text.split(",")
+        return int(x), int(y)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected X,Y, got {text!r}")
+
+
+def run_worker(worker, duration=None, report=None):
+    # Waits for an engine thread to finish on its own, for duration seconds
+    # or until interrupted, whichever comes first, then stops it. report(),
+    # if given, is called about once a second meanwhile.
+    deadline = None if duration is None else time.perf_counter() + duration
+    next_report = time.perf_counter() + 1
+    try:
+        while worker.is_alive():
+            timeout = 0.1
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.perf_counter())
+                if timeout <= 0:
+                    break
+            worker.join(timeout)
+            if report and time.perf_counter() >= next_report:
+                report()
+                next_report += 1
+    except KeyboardInterrupt:
+        pass
+    worker.stop()
+    worker.join()
+
+
+def click_command(args, backend):
+    from dataclasses import replace
+    from ClickEngine import ClickEngine
+    from ClickPlan import ClickPlan, Humanize
+
+    if args.burst is None and (args.interval is None or args.interval <= 0):
+        sys.exit("interval must be greater than zero")
+    humanize = Humanize(jitter=args.jitter, min_interval=args.min_interval, offset=args.offset,
+                        offset_sigma=args.offset_sigma, pause_every=args.pause_every,
+                        pause=args.pause, pause_jitter=args.pause_jitter, seed=args.seed)
+    # Options that only shape another one are refused without it rather
+    # than dropped without a word
+    for option, needs in (("min_interval", "jitter"), ("offset_sigma", "offset"),
+                          ("pause", "pause_every"), ("pause_jitter", "pause_every")):
+        if getattr(humanize, option) and not getattr(humanize, needs):
+            sys.exit(f"--{option.replace('_', '-')} needs --{needs.replace('_', '-')}")
+    if humanize == Humanize():
+        humanize = None
+    plan = ClickPlan(interval=args.interval or 0.0, button=args.button,
+                     clicks=2 if args.double else 1, repeat=args.repeat, humanize=humanize)
+    if args.at:
+        plan = tuple(replace(plan, position=position) for position in args.at)
+        if len(plan) == 1:
+            plan = plan[0]
+    report = None
+    if args.burst is not None:
+        from BurstEngine import BurstEngine
+        engine = BurstEngine(plan, backend, args.burst or None)
+        if not args.quiet and sys.stderr.isatty():
+            def report():
+                print(f"\r{engine.achieved_rate:,.0f} clicks/s in batches of {engine.batch_size}   ",
+                      end="", file=sys.stderr, flush=True)
+    else:
+        engine = ClickEngine(plan, backend)
+    engine.start()
+    run_worker(engine, args.duration, report)
+    if not args.quiet:
+        if report:
+            print(file=sys.stderr)
+        print(engine.summary())
+
+
+def play_command(args, backend):
+    from Playback import Timeline, play
+    from RecordingFile import load_recording
+    from RecordingSegments import Segment
+
+    tracks = []
+    offsets = args.offset or []
+    for index, file in enumerate(args.files):
+        try:
+            tracks.append((load_recording(file), offsets[index] if index < len(offsets) else 0.0))
+        except (OSError, ValueError) as e:
+            sys.exit(f"cannot load {file}: {e}")
+    if args.start or args.end is not None:
+        # Cut every track to the same stretch of the combined timeline
+        tracks = [(Segment(actions, args.start - offset, None if args.end is None else args.end - offset),
+                   max(offset - args.start, 0.0))
+                  for actions, offset in tracks]
+    # Several files play together, merged by timestamp
+    actions = Timeline(tracks) if len(tracks) > 1 or offsets else tracks[0][0]
+    start = time.perf_counter()
+    loops = 0
+    try:
+        while args.loops == 0 or loops < args.loops:
+            play(actions, backend, speed=args.speed, mode=args.mode, rate=args.rate)
+            loops += 1
+    except KeyboardInterrupt:
+        pass
+    if not args.quiet:
+        print(f"{loops} loops of {len(actions)} events in {time.perf_counter() - start:.3f} s")
+
+
+def parse_segment(spec):
+    # FILE[@START:END][xN], times in seconds and either end optional
+    match = re.fullmatch(r'(.+?)(?:@([\d.]*):([\d.]*))?(?:x(\d+))?', spec)
+    file, start, end, loops = match.groups()
+    try:
+        return file, float(start or 0), float(end) if end else None, int(loops or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected FILE[@START:END][xN], got {spec!r}")
+
+
+def splice_command(args):
+    from RecordingFile import SEQUENCE_EXTENSION, load_recording
+    from RecordingSegments import Segment, Sequence, save_sequence
+
+    if args.output.endswith(SEQUENCE_EXTENSION):
+        # Only refers to the segments; no events are copied
+        for file, _, _, _ in args.segments:
+            if not os.path.exists(file):
+                sys.exit(f"cannot load {file}: no such file")
+        save_sequence(args.output, args.segments)
+        return
+    recordings = {}
+    parts = []
+    for file, start, end, loops in args.segments:
+        try:
+            if file not in recordings:
+                recordings[file] = load_recording(file)
+        except (OSError, ValueError) as e:
+            sys.exit(f"cannot load {file}: {e}")
+        parts.extend([Segment(recordings[file], start, end)] * loops)
+    sequence = Sequence(parts)
+    if args.output.endswith('.json'):
+        sequence.save_json(args.output)
+    else:
+        sequence.save(args.output)
+    if not args.quiet:
+        print(f"{len(sequence)} events, {sequence.duration():.3f} s")
+
+
+def macro_command(args, backend):
+    from Macro import load_macro, run
+
+    params = dict(define.split("=", 1) for define in args.define or [])
+    try:
+        program = load_macro(args.file, params)
+    except (OSError, ValueError) as e:
+        sys.exit(f"cannot load {args.file}: {e}")
+    start = time.perf_counter()
+    try:
+        run(program, backend)
+    except KeyboardInterrupt:
+        pass
+    if not args.quiet:
+        print(f"{len(program)} instructions in {time.perf_counter() - start:.3f} s")
+
+
+def serve_command(args, backend):
+    from ControlClient import TOKEN_VARIABLE
+    from ControlServer import Controller, ControlServer
+    from PlaybackEngine import PlaybackEngine
+
+    player = PlaybackEngine(backend).start()
+    controller = Controller(backend, player)
+    server = ControlServer(controller, path=args.socket, port=args.port,
+                           token=os.environ.get(TOKEN_VARIABLE)).start()
+    if not args.quiet:
+        print(f"listening on {server.path or f'{server.host}:{server.port}'}", flush=True)
+    if server.token is not None and not os.environ.get(TOKEN_VARIABLE):
+        # Always shown: clients cannot connect without it
+        print(f"token {server.token}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        controller.stop()
+        player.close()
+
+
+def batch_command(args):
+    import json
+    from JobRunner import run_jobs
+
+    try:
+        with open(args.file) as f:
+            jobs = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    except OSError as e:
+        sys.exit(f"cannot read {args.file}: {e}")
+    try:
+        stats = run_jobs(jobs, workers=args.workers, displays=args.display, xvfb=args.xvfb,
+                         backend=args.backend, job_timeout=args.job_timeout)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if not args.quiet:
+        print(json.dumps(stats, indent=2))
+    if stats["failed"]:
+        sys.exit(1)
+
+
+def parse_define(text):
+    if "=" not in text:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="autoclicker", description="AutoClicker without the GUI")
+    parser.add_argument("--backend", help="input backend: auto, xtest, pyautogui or null "
+                                          "(default: $AUTOCLICKER_BACKEND or auto)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="print nothing when done")
+    parser.add_argument("--metrics-file", help="keep Prometheus-format metrics in this file "
+                                               "(default: $AUTOCLICKER_METRICS_FILE)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus-format metrics on this "
+                                                         "local port (default: $AUTOCLICKER_METRICS_PORT)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    click_parser = commands.add_parser("click", help="click on an interval, or at a rate with --burst")
+    click_parser.add_argument("-i", "--interval", type=float, help="seconds between clicks")
+    click_parser.add_argument("--burst", type=float, nargs="?", const=0.0, metavar="RATE",
+                              help="click RATE times a second in batches, instead of on an interval; "
+                                   "without RATE, as fast as the backend takes them")
+    click_parser.add_argument("-b", "--button", choices=["left", "right", "middle"], default="left")
+    click_parser.add_argument("--double", action="store_true", help="double click")
+    click_parser.add_argument("--at", type=parse_position, action="append", metavar="X,Y",
+                              help="click here instead of at the pointer; repeat for several targets")
+    click_parser.add_argument("-n", "--repeat", type=int, help="stop after this many clicks per target")
+    click_parser.add_argument("-d", "--duration", type=float, help="stop after this many seconds")
+    humanize = click_parser.add_argument_group("humanize", "randomize the schedule; clicks stay "
+                                                           "reproducible for a given --seed")
+    humanize.add_argument("--jitter", type=float, default=0.0,
+                          help="standard deviation of each interval in seconds")
+    humanize.add_argument("--min-interval", type=float, default=0.0,
+                          help="shortest interval allowed after jitter")
+    humanize.add_argument("--offset", type=int, default=0,
+                          help="click up to this many pixels from each --at position")
+    humanize.add_argument("--offset-sigma", type=float,
+                          help="draw offsets from a normal distribution with this deviation")
+    humanize.add_argument("--pause-every", type=int, default=0, metavar="N",
+                          help="pause after every N clicks")
+    humanize.add_argument("--pause", type=float, default=0.0, help="mean pause length in seconds")
+    humanize.add_argument("--pause-jitter", type=float, default=0.0,
+                          help="standard deviation of the pause length")
+    humanize.add_argument("--seed", type=int, help="seed for the random schedule")
+    click_parser.set_defaults(run=click_command)
+
+    play_parser = commands.add_parser("play", help="play recordings (.acrec, .acseq or .json), "
+                                                   "several at once as parallel tracks")
+    play_parser.add_argument("files", nargs="+", metavar="file")
+    play_parser.add_argument("-o", "--offset", type=float, action="append",
+                             help="seconds to delay a file by, given once per file in order")
+    play_parser.add_argument("-s", "--speed", type=float, default=1.0)
+    play_parser.add_argument("-m", "--mode", choices=["realtime", "fast", "resample"], default="realtime")
+    play_parser.add_argument("-r", "--rate", type=float, default=60,
+                             help="moves per second in resample mode")
+    play_parser.add_argument("-l", "--loops", type=int, default=1, help="times to play it, 0 for forever")
+    play_parser.add_argument("--start", type=float, default=0.0, help="seconds into the recording to start at")
+    play_parser.add_argument("--end", type=float, help="seconds into the recording to stop at")
+    play_parser.set_defaults(run=play_command)
+
+    splice_parser = commands.add_parser("splice", help="cut and join recordings into a new one; "
+                                                       "an .acseq output refers to the inputs instead "
+                                                       "of copying them")
+    splice_parser.add_argument("output")
+    splice_parser.add_argument("segments", nargs="+", type=parse_segment, metavar="FILE[@START:END][xN]",
+                               help="a recording, or the part of it from START to END seconds, "
+                                    "repeated N times")
+    splice_parser.set_defaults(run=splice_command, needs_backend=False)
+
+    macro_parser = commands.add_parser("macro", help="run a macro (.acm), or a recording as one")
+    macro_parser.add_argument("file")
+    macro_parser.add_argument("-D", "--define", type=parse_define, action="append", metavar="NAME=VALUE",
+                              help="set a macro constant, as if by define")
+    macro_parser.set_defaults(run=macro_command)
+
+    serve_parser = commands.add_parser("serve", help="take commands from other processes over the "
+                                                     "local control API until stopped")
+    serve_parser.add_argument("--socket", help="Unix socket path (default: autoclicker.sock in "
+                                               "$XDG_RUNTIME_DIR or the temp directory)")
+    serve_parser.add_argument("--port", type=int, help="listen on this localhost port instead of a socket; "
+                                                         "clients need $AUTOCLICKER_CONTROL_TOKEN, or the "
+                                                         "token printed when it is not set")
+    serve_parser.set_defaults(run=serve_command)
+
+    batch_parser = commands.add_parser("batch", help="run a file of commands, one per line, "
+                                                     "in parallel worker processes")
+    batch_parser.add_argument("file")
+    batch_parser.add_argument("-w", "--workers", type=int, help="worker processes (default: CPU count)")
+    batch_parser.add_argument("--display", action="append",
+                              help="X display for one worker; repeat for each worker")
+    batch_parser.add_argument("--xvfb", action="store_true",
+                              help="start a private Xvfb server for every worker")
+    batch_parser.add_argument("--job-timeout", type=float, metavar="SECONDS",
+                              help="fail a job still running after this long, such as a click "
+                                   "without -n or one stuck on its display")
+    batch_parser.set_defaults(run=batch_command, needs_backend=False)
+    return parser
+
+
+def raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Job systems stop runs with SIGTERM; treat it like Ctrl+C
+    signal.signal(signal.SIGTERM, raise_interrupt)
+    if not getattr(args, "needs_backend", True):
+        # Batches open a backend in each worker, never in this process
+        args.run(args)
+        return
+
+    from InputBackend import create_backend
+    if args.metrics_file or args.metrics_port is not None:
+        from Metrics import MetricsExporter
+        exporter = MetricsExporter(path=args.metrics_file, port=args.metrics_port).start()
+    else:
+        from Metrics import exporter_from_env
+        exporter = exporter_from_env()
+    backend = create_backend(args.backend)
+    try:
+        args.run(args, backend)
+    finally:
+        backend.close()
+        if exporter:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
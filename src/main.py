@@ -1,29 +1,47 @@
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                           QHBoxLayout, QLabel, QSpinBox, QPushButton, 
+                           QHBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QPushButton, 
                            QComboBox, QCheckBox, QGroupBox, QGridLayout, 
                            QStatusBar, QFileDialog, QMessageBox, 
-                           QDialog, QFormLayout, QLineEdit, QRadioButton)
-from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal, QSettings, QPoint
-from PyQt6.QtGui import QKeySequence, QPainter, QColor
-import pyautogui
-import json
+                           QDialog, QFormLayout, QLineEdit, QRadioButton, QInputDialog)
+from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal, QSettings, QPoint, QStandardPaths
+from PyQt6.QtGui import QKeySequence, QPainter, QColor, QIntValidator
+import os
 import time
-import ctypes
-from ctypes import wintypes
+from dataclasses import replace
 
 from KeyListener import KeyListener
 from PositionSelector import PositionSelector
-from ActionRecorder import ActionRecorder
-from ActionPlayer import ActionPlayer
-from SettingsWindow import SettingsWindow
+from PlaybackEngine import PlaybackEngine
+from Playback import REALTIME, FAST, RESAMPLE
+from ActionRecording import ActionRecording
+from BurstEngine import BurstEngine
+from ClickEngine import ClickEngine
+from ClickPlan import ClickPlan, Humanize
+from ControlServer import Controller, server_from_env
+from InputBackend import create_backend
+from RecordingFile import EXTENSION, SEQUENCE_EXTENSION, load_recording
+from RecordingSegments import Segment, loop
+from Macro import MacroProgram
+import Metrics
 
 class AutoClickerWindow(QMainWindow):
+    clicking_finished = pyqtSignal()
+    playback_finished = pyqtSignal(bool)
+    control_changed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AutoClicker")
         self.is_clicking = False
         self.click_position = None  # Initialize click position
+        self.click_targets = []  # Positions for the Multiple Positions mode
+        self.input_backend = create_backend()
+        self.player = PlaybackEngine(self.input_backend)
+        # Holds the click engine, so jobs started here and over the control
+        # API are the same jobs; control_changed brings the window up to date
+        self.control = Controller(self.input_backend, self.player, on_change=self.control_changed.emit)
+        self.extra_tracks = []  # recordings played alongside the current one
 
         self.key_listener = KeyListener(self)
         self.key_listener.load_hotkeys()
@@ -47,14 +65,15 @@ class AutoClickerWindow(QMainWindow):
         self.minutes_spinbox.setToolTip("Set the minutes interval for clicking")
         self.seconds_spinbox = QSpinBox()
         self.seconds_spinbox.setToolTip("Set the seconds interval for clicking")
-        self.milliseconds_spinbox = QSpinBox()
+        self.milliseconds_spinbox = QDoubleSpinBox()
+        self.milliseconds_spinbox.setDecimals(3)  # Allow sub-millisecond intervals
         self.milliseconds_spinbox.setToolTip("Set the milliseconds interval for clicking")
 
         for spinbox in [self.hours_spinbox, self.minutes_spinbox, 
                        self.seconds_spinbox, self.milliseconds_spinbox]:
             spinbox.setMinimumWidth(70)
             if spinbox == self.milliseconds_spinbox:
-                spinbox.setRange(0, 999)
+                spinbox.setRange(0, 999.999)
             else:
                 spinbox.setRange(0, 59)
 
@@ -72,6 +91,68 @@ class AutoClickerWindow(QMainWindow):
         # Add Click Intervals group to top layout
         top_layout.addWidget(interval_group)
 
+        # Humanize Group: random variation drawn from a precomputed schedule
+        self.humanize_group = QGroupBox("Humanize")
+        self.humanize_group.setCheckable(True)
+        self.humanize_group.setChecked(False)
+        self.humanize_group.setToolTip("Vary intervals and positions randomly; the same seed repeats the same run")
+        humanize_layout = QGridLayout()
+
+        self.jitter_spinbox = QDoubleSpinBox()
+        self.jitter_spinbox.setRange(0, 10000)
+        self.jitter_spinbox.setDecimals(1)
+        self.jitter_spinbox.setSuffix(" ms")
+        self.jitter_spinbox.setToolTip("Standard deviation of each interval")
+        self.offset_spinbox = QSpinBox()
+        self.offset_spinbox.setRange(0, 500)
+        self.offset_spinbox.setSuffix(" px")
+        self.offset_spinbox.setToolTip("Click up to this far from the chosen position")
+        self.pause_every_spinbox = QSpinBox()
+        self.pause_every_spinbox.setRange(0, 1000000)
+        self.pause_every_spinbox.setToolTip("Pause after this many clicks, 0 for never")
+        self.pause_spinbox = QDoubleSpinBox()
+        self.pause_spinbox.setRange(0, 3600)
+        self.pause_spinbox.setSuffix(" s")
+        self.pause_spinbox.setToolTip("Mean pause length, varied by a fifth either way")
+        self.seed_field = QLineEdit()
+        self.seed_field.setPlaceholderText("Random")
+        self.seed_field.setValidator(QIntValidator(0, 2 ** 31 - 1))
+        self.seed_field.setMaximumWidth(90)
+        self.seed_field.setToolTip("Seed for a reproducible schedule")
+
+        humanize_layout.addWidget(QLabel("Jitter"), 0, 0)
+        humanize_layout.addWidget(self.jitter_spinbox, 0, 1)
+        humanize_layout.addWidget(QLabel("Offset"), 0, 2)
+        humanize_layout.addWidget(self.offset_spinbox, 0, 3)
+        humanize_layout.addWidget(QLabel("Seed"), 0, 4)
+        humanize_layout.addWidget(self.seed_field, 0, 5)
+        humanize_layout.addWidget(QLabel("Pause every"), 1, 0)
+        humanize_layout.addWidget(self.pause_every_spinbox, 1, 1)
+        humanize_layout.addWidget(QLabel("clicks for"), 1, 2)
+        humanize_layout.addWidget(self.pause_spinbox, 1, 3)
+        self.humanize_group.setLayout(humanize_layout)
+        top_layout.addWidget(self.humanize_group)
+
+        self.burst_group = QGroupBox("Burst")
+        self.burst_group.setCheckable(True)
+        self.burst_group.setChecked(False)
+        self.burst_group.setToolTip("Click at a target rate instead of an interval, batching clicks "
+                                    "as needed to reach it")
+        burst_layout = QGridLayout()
+        self.burst_rate_spinbox = QSpinBox()
+        self.burst_rate_spinbox.setRange(0, 10000000)
+        self.burst_rate_spinbox.setValue(1000)
+        self.burst_rate_spinbox.setSingleStep(100)
+        self.burst_rate_spinbox.setSuffix(" /s")
+        self.burst_rate_spinbox.setSpecialValueText("Maximum")
+        self.burst_rate_spinbox.setToolTip("Clicks per second to aim for, 0 for as many as the system takes")
+        self.burst_rate_label = QLabel("Achieved: -")
+        burst_layout.addWidget(QLabel("Rate"), 0, 0)
+        burst_layout.addWidget(self.burst_rate_spinbox, 0, 1)
+        burst_layout.addWidget(self.burst_rate_label, 1, 0, 1, 2)
+        self.burst_group.setLayout(burst_layout)
+        top_layout.addWidget(self.burst_group)
+
         # Second row with Click Options, Click Repeat, Click Position, and Click Speed groups
         second_row_layout = QHBoxLayout()
         second_row_layout.setSpacing(10)
@@ -180,10 +261,15 @@ class AutoClickerWindow(QMainWindow):
         self.mouse_position_radio = QRadioButton("Mouse Position")
         self.mouse_position_radio.setChecked(True)
         self.custom_position_radio = QRadioButton("Custom Position")
+        self.multiple_positions_radio = QRadioButton("Multiple Positions")
+        self.multiple_positions_radio.setToolTip("Click several positions in turn, "
+                                                 "each on its own schedule")
         self.mouse_position_radio.toggled.connect(self.toggle_position_mode)
+        self.multiple_positions_radio.toggled.connect(self.toggle_position_mode)
 
         position_layout.addWidget(self.mouse_position_radio)
         position_layout.addWidget(self.custom_position_radio)
+        position_layout.addWidget(self.multiple_positions_radio)
 
         self.position_label = QLabel("Position: (X, Y)")
         self.position_label.setToolTip("Set the position for clicking")
@@ -260,36 +346,281 @@ class AutoClickerWindow(QMainWindow):
         self.load_button.setToolTip("Load actions from a file")
         recording_layout.addWidget(self.load_button)
 
+        # Library Buttons
+        self.save_library_button = QPushButton("Save to Library")
+        self.save_library_button.clicked.connect(self.save_to_library)
+        self.save_library_button.setToolTip("Add the recorded actions to the macro library")
+        self.save_library_button.setEnabled(False)
+        recording_layout.addWidget(self.save_library_button)
+
+        self.library_button = QPushButton("Library")
+        self.library_button.clicked.connect(self.open_library)
+        self.library_button.setToolTip("Search and load saved macros")
+        recording_layout.addWidget(self.library_button)
+
+        # Stream to Disk Checkbox
+        self.stream_checkbox = QCheckBox("Stream to Disk")
+        self.stream_checkbox.setToolTip("Write actions to a file while recording so long sessions use constant memory")
+        recording_layout.addWidget(self.stream_checkbox)
+
+        # Compact on Save Checkbox
+        self.compact_checkbox = QCheckBox("Compact on Save")
+        self.compact_checkbox.setToolTip("Drop repeated positions and simplify mouse paths when saving")
+        recording_layout.addWidget(self.compact_checkbox)
+
         main_layout.addLayout(recording_layout)
 
+        # Instant Replay row: always-on capture of the last few minutes
+        replay_layout = QHBoxLayout()
+        self.replay_checkbox = QCheckBox("Instant Replay: keep the last")
+        self.replay_checkbox.setToolTip("Capture input in the background so it can be saved after the fact")
+        self.replay_checkbox.toggled.connect(self.toggle_instant_replay)
+        replay_layout.addWidget(self.replay_checkbox)
+
+        self.replay_minutes = QSpinBox()
+        self.replay_minutes.setRange(1, 240)
+        self.replay_minutes.setSuffix(" min")
+        self.replay_minutes.setToolTip("How much input to keep; memory is reserved up front")
+        self.replay_minutes.valueChanged.connect(self.resize_instant_replay)
+        replay_layout.addWidget(self.replay_minutes)
+
+        self.replay_memory_label = QLabel()
+        replay_layout.addWidget(self.replay_memory_label)
+
+        self.save_replay_button = QPushButton("Save Replay")
+        self.save_replay_button.clicked.connect(self.save_replay)
+        self.save_replay_button.setToolTip("Save the captured input as a recording without stopping capture")
+        self.save_replay_button.setEnabled(False)
+        replay_layout.addWidget(self.save_replay_button)
+        replay_layout.addStretch()
+        main_layout.addLayout(replay_layout)
+
+        # Fourth row with Playback Options
+        playback_layout = QHBoxLayout()
+
+        playback_layout.addWidget(QLabel("Playback Speed:"))
+        self.playback_speed = QDoubleSpinBox()
+        self.playback_speed.setRange(0.1, 100.0)
+        self.playback_speed.setValue(1.0)
+        self.playback_speed.setSingleStep(0.5)
+        self.playback_speed.setSuffix("x")
+        self.playback_speed.setToolTip("Scale the recorded timing during playback")
+        playback_layout.addWidget(self.playback_speed)
+
+        playback_layout.addWidget(QLabel("Playback Mode:"))
+        self.playback_mode = QComboBox()
+        self.playback_mode.addItem("Recorded Timing", REALTIME)
+        self.playback_mode.addItem("As Fast As Possible", FAST)
+        self.playback_mode.addItem("Smoothed (Display Rate)", RESAMPLE)
+        self.playback_mode.setToolTip("Replay at the recorded timing, as fast as possible, "
+                                      "or with mouse paths interpolated to the display refresh rate")
+        playback_layout.addWidget(self.playback_mode)
+
+        playback_layout.addWidget(QLabel("From:"))
+        self.play_from = QDoubleSpinBox()
+        self.play_from.setRange(0.0, 86400.0)
+        self.play_from.setDecimals(2)
+        self.play_from.setSuffix(" s")
+        self.play_from.setToolTip("Start playback this many seconds into the recording")
+        playback_layout.addWidget(self.play_from)
+
+        playback_layout.addWidget(QLabel("To:"))
+        self.play_to = QDoubleSpinBox()
+        self.play_to.setRange(0.0, 86400.0)
+        self.play_to.setDecimals(2)
+        self.play_to.setSuffix(" s")
+        self.play_to.setSpecialValueText("End")
+        self.play_to.setToolTip("Stop playback this many seconds into the recording")
+        playback_layout.addWidget(self.play_to)
+
+        playback_layout.addWidget(QLabel("Loop:"))
+        self.play_loops = QSpinBox()
+        self.play_loops.setRange(1, 10000)
+        self.play_loops.setSuffix("x")
+        self.play_loops.setToolTip("Play the range from From to To this many times in a row")
+        playback_layout.addWidget(self.play_loops)
+
+        self.tracks_button = QPushButton("Extra Tracks")
+        self.tracks_button.clicked.connect(self.choose_tracks)
+        self.tracks_button.setToolTip("Pick recordings to play at the same time as the current one, "
+                                      "such as keyboard input over a mouse path")
+        playback_layout.addWidget(self.tracks_button)
+
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.pause_button.setToolTip("Pause or resume playback")
+        self.pause_button.setEnabled(False)
+        playback_layout.addWidget(self.pause_button)
+        playback_layout.addStretch()
+
+        main_layout.addLayout(playback_layout)
+
+        # Image Trigger Group
+        trigger_group = QGroupBox("Image Trigger")
+        trigger_group_layout = QVBoxLayout()
+        trigger_layout = QHBoxLayout()
+
+        self.image_trigger_checkbox = QCheckBox("Click when image appears")
+        self.image_trigger_checkbox.setToolTip("Instead of clicking on a timer, search the region "
+                                               "every interval and click the image when found")
+        trigger_layout.addWidget(self.image_trigger_checkbox)
+
+        self.template_button = QPushButton("Choose Image")
+        self.template_button.setToolTip("Choose the image to look for")
+        self.template_button.clicked.connect(self.choose_template)
+        trigger_layout.addWidget(self.template_button)
+
+        self.region_button = QPushButton("Set Search Region")
+        self.region_button.setToolTip("Click two opposite corners of the area to search")
+        self.region_button.clicked.connect(self.set_search_region)
+        trigger_layout.addWidget(self.region_button)
+
+        self.trigger_label = QLabel("Image: none, Region: full screen")
+        trigger_layout.addWidget(self.trigger_label)
+        trigger_layout.addStretch()
+        trigger_group_layout.addLayout(trigger_layout)
+
+        gate_layout = QHBoxLayout()
+        gate_layout.addWidget(QLabel("Wait before each click:"))
+        self.gate_mode = QComboBox()
+        self.gate_mode.addItems(["Nothing", "Region changes", "Pixel matches color"])
+        self.gate_mode.setToolTip("Hold every click (and every recorded press during playback) "
+                                  "until the search region changes or the pixel has the color")
+        gate_layout.addWidget(self.gate_mode)
+
+        self.pixel_button = QPushButton("Pick Pixel")
+        self.pixel_button.setToolTip("Click the pixel to watch; its current color is filled in")
+        self.pixel_button.clicked.connect(self.set_watch_pixel)
+        gate_layout.addWidget(self.pixel_button)
+
+        self.pixel_color = QLineEdit("#000000")
+        self.pixel_color.setInputMask("\\#HHHHHH")
+        self.pixel_color.setFixedWidth(80)
+        gate_layout.addWidget(self.pixel_color)
+
+        self.pixel_label = QLabel("Pixel: none")
+        gate_layout.addWidget(self.pixel_label)
+        gate_layout.addStretch()
+        trigger_group_layout.addLayout(gate_layout)
+
+        trigger_group.setLayout(trigger_group_layout)
+        main_layout.addWidget(trigger_group)
+
+        self.template_matcher = None
+        self.template_path = None
+        self.search_region = None
+        self.watch_pixel = None
+        self.watcher = None
+
+        # Stats Group
+        stats_group = QGroupBox("Stats")
+        stats_layout = QHBoxLayout()
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("font-family: monospace;")
+        stats_layout.addWidget(self.stats_label)
+        stats_layout.addStretch()
+        stats_reset_button = QPushButton("Reset")
+        stats_reset_button.setToolTip("Clear the counters and latency histograms")
+        stats_reset_button.clicked.connect(self.reset_stats)
+        stats_layout.addWidget(stats_reset_button)
+        stats_group.setLayout(stats_layout)
+        main_layout.addWidget(stats_group)
+
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(500)
+        self.update_stats()
+        self.metrics_exporter = Metrics.exporter_from_env()
+        self.control_server = server_from_env(self.control)
+        if self.control_server:
+            self.control_changed.connect(self.control_command_done)
+
         # Settings Button
         settings_button = QPushButton("Settings")
         settings_button.clicked.connect(self.open_settings)
         main_layout.addWidget(settings_button)
 
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.perform_click)
+        self.click_engine = None
+        self.clicking_finished.connect(self.repeat_count_reached)
+        self.playback_finished.connect(self.playback_done)
+
+        for spinbox in [self.hours_spinbox, self.minutes_spinbox,
+                        self.seconds_spinbox, self.milliseconds_spinbox]:
+            spinbox.valueChanged.connect(self.update_click_plan)
+        self.mouse_button.currentTextChanged.connect(self.update_click_plan)
+        for spinbox in [self.jitter_spinbox, self.offset_spinbox,
+                        self.pause_every_spinbox, self.pause_spinbox]:
+            spinbox.valueChanged.connect(self.update_click_plan)
+        self.humanize_group.toggled.connect(self.update_click_plan)
+        self.burst_rate_spinbox.valueChanged.connect(self.update_burst_rate)
+        self.seed_field.editingFinished.connect(self.update_click_plan)
+        self.click_type.currentTextChanged.connect(self.update_click_plan)
 
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
 
         self.resize(600, 400)  # Increased height for better layout
 
-        self.recorded_actions = []
+        self.recorded_actions = ActionRecording()
+        self.library = None  # MacroLibrary, opened the first time it is used
+
+        self.instant_replay = None
+        self.last_replay = None
+        self.replay_directory = self.data_directory("replays")
+        settings = QSettings("MyApp", "AutoClicker")
+        self.replay_minutes.setValue(int(settings.value("instant_replay_minutes", 10)))
+        self.update_replay_memory()
+        self.replay_checkbox.setChecked(settings.value("instant_replay", "false") == "true")
+
+    def update_stats(self):
+        def latency(histogram):
+            snapshot = histogram.snapshot()
+            return (f"p50 {snapshot.percentile(50) * 1000:7.3f}  p99 {snapshot.percentile(99) * 1000:7.3f}"
+                    f"  max {snapshot.max * 1000:7.3f} ms")
+
+        self.stats_label.setText(
+            f"Clicks: {Metrics.CLICKS.value} ({Metrics.CLICKS_MISSED.value} missed)\n"
+            f"  delay   {latency(Metrics.CLICK_DELAY)}\n"
+            f"  inject  {latency(Metrics.CLICK_INJECT)}\n"
+            f"Playback: {Metrics.PLAYBACK_EVENTS.value} events\n"
+            f"  lag     {latency(Metrics.PLAYBACK_LAG)}\n"
+            f"  inject  {latency(Metrics.PLAYBACK_INJECT)}\n"
+            f"Hotkeys:  action {latency(Metrics.HOTKEY_LATENCY)}\n"
+            f"          window {latency(Metrics.HOTKEY_GUI_LATENCY)}")
+        engine = self.click_engine
+        if self.is_clicking and isinstance(engine, BurstEngine):
+            self.burst_rate_label.setText(f"Achieved: {engine.achieved_rate:,.0f} /s "
+                                          f"in batches of {engine.batch_size}")
+
+    def reset_stats(self):
+        Metrics.REGISTRY.reset()
+        self.update_stats()
 
     def update_toggle_button(self):
         start_stop_key = self.key_listener.settings.value("start_stop_hotkey", "F6")
         self.toggle_button.setText(f"Start Clicking ({start_stop_key})" if not self.is_clicking else f"Stop Clicking ({start_stop_key})")
 
     def set_position(self):
-        self.overlay = PositionSelector()
-        self.overlay.position_selected.connect(self.position_captured)
+        multiple = self.multiple_positions_radio.isChecked()
+        self.overlay = PositionSelector(multiple=multiple)
+        if multiple:
+            self.status_bar.showMessage("Left click each position, then right click or press Enter")
+            self.overlay.positions_selected.connect(self.positions_captured)
+        else:
+            self.overlay.position_selected.connect(self.position_captured)
         self.overlay.show()
 
+    def positions_captured(self, points):
+        self.click_targets = [(point.x(), point.y()) for point in points]
+        self.position_label.setText(f"Positions: {len(points)} targets")
+        self.status_bar.showMessage(f"{len(points)} positions set", 5000)
+        self.update_click_plan()
+
     def position_captured(self, point):
         self.click_position = (point.x(), point.y())
         self.position_label.setText(f"Position: ({point.x()}, {point.y()})")
         self.status_bar.showMessage(f"Position set to ({point.x()}, {point.y()})", 5000)
+        self.update_click_plan()
 
     def update_speed_label(self):
         speed = self.speed_slider.value()
@@ -301,50 +632,194 @@ class AutoClickerWindow(QMainWindow):
         else:
             self.repeat_count.setEnabled(False)
 
-    def perform_click(self):
-        button = self.mouse_button.currentText().lower()
-        clicks = 2 if self.click_type.currentText() == "Double" else 1
-        
-        if self.custom_position_radio.isChecked() and self.click_position:
-            pyautogui.click(x=self.click_position[0], y=self.click_position[1], button=button, clicks=clicks)
+    def repeat_count_reached(self):
+        if not self.is_clicking:
+            return
+        self.is_clicking = False
+        self.stop_watcher()
+        self.update_toggle_button()
+        self.status_bar.showMessage(
+            f"Clicking stopped after reaching repeat count ({self.click_engine.summary()})", 5000)
+
+    def choose_template(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Choose Image", "", "Images (*.png *.bmp *.jpg)")
+        if file_name:
+            from TemplateMatcher import TemplateMatcher
+            self.template_matcher = TemplateMatcher.from_file(file_name)
+            self.template_path = file_name
+            self.update_trigger_label()
+
+    def set_search_region(self):
+        self.overlay = PositionSelector(multiple=True)
+        self.status_bar.showMessage("Click two opposite corners of the search region")
+        self.overlay.positions_selected.connect(self.search_region_captured)
+        self.overlay.show()
+
+    def search_region_captured(self, points):
+        if len(points) < 2:
+            self.search_region = None
         else:
-            pyautogui.click(button=button, clicks=clicks)
-        
-        if self.repeat_for_radio.isChecked():
-            self.click_count += 1
-            if self.click_count >= self.repeat_count.value():
-                self.timer.stop()
-                self.toggle_button.setText(f"Start Clicking ({self.key_listener.settings.value('start_stop_hotkey', 'F6')})")
-                self.is_clicking = False
-                self.status_bar.showMessage("Clicking stopped after reaching repeat count", 5000)
+            xs = [point.x() for point in points[:2]]
+            ys = [point.y() for point in points[:2]]
+            self.search_region = (min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+        self.update_trigger_label()
+
+    def update_trigger_label(self):
+        image = os.path.basename(self.template_path) if self.template_path else "none"
+        region = "full screen" if self.search_region is None else "%d, %d, %dx%d" % self.search_region
+        self.trigger_label.setText(f"Image: {image}, Region: {region}")
+
+    def create_template_trigger(self, plan):
+        from TemplateMatcher import TemplateTrigger
+        if isinstance(plan, tuple):
+            plan = plan[0]
+        region = self.search_region
+        if region is None:
+            geometry = self.screen().geometry()
+            region = (geometry.x(), geometry.y(), geometry.width(), geometry.height())
+        return TemplateTrigger(plan, self.template_matcher, region, self.input_backend,
+                               on_finished=self.clicking_finished.emit, capture=self.capture_backend())
+
+    def capture_backend(self):
+        # A backend of the same kind for a thread that grabs the screen while
+        # clicks are injected, so the two never share a display connection
+        return create_backend(self.input_backend.name)
+
+    def set_watch_pixel(self):
+        self.overlay = PositionSelector()
+        self.overlay.position_selected.connect(self.watch_pixel_captured)
+        self.overlay.show()
+
+    def watch_pixel_captured(self, point):
+        self.watch_pixel = (point.x(), point.y())
+        try:
+            red, green, blue = self.input_backend.grab((point.x(), point.y(), 1, 1))[0, 0, :3]
+            self.pixel_color.setText(f"#{red:02X}{green:02X}{blue:02X}")
+        except Exception as e:
+            self.status_bar.showMessage(f"Could not read the pixel color: {e}", 5000)
+        self.pixel_label.setText(f"Pixel: ({point.x()}, {point.y()})")
+
+    def start_watcher(self):
+        # Returns the gate for the engine or player, or None to click freely
+        self.stop_watcher()
+        mode = self.gate_mode.currentText()
+        if mode == "Region changes":
+            from RegionWatcher import RegionWatcher
+            region = self.search_region
+            if region is None:
+                geometry = self.screen().geometry()
+                region = (geometry.x(), geometry.y(), geometry.width(), geometry.height())
+            self.watcher = RegionWatcher(self.capture_backend(), region, rate=self.screen().refreshRate(),
+                                         close_backend=True)
+        elif mode == "Pixel matches color":
+            from RegionWatcher import PixelWatcher
+            if self.watch_pixel is None:
+                QMessageBox.warning(self, "No Pixel", "Pick the pixel to watch first.")
+                return None
+            color = QColor(self.pixel_color.text())
+            self.watcher = PixelWatcher(self.capture_backend(), self.watch_pixel,
+                                        (color.red(), color.green(), color.blue()),
+                                        rate=self.screen().refreshRate(), close_backend=True)
+        else:
+            return None
+        self.watcher.start()
+        return self.watcher
+
+    def stop_watcher(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def compile_click_plan(self):
+        interval = (
+            self.hours_spinbox.value() * 3600 +
+            self.minutes_spinbox.value() * 60 +
+            self.seconds_spinbox.value() +
+            self.milliseconds_spinbox.value() / 1000
+        )
+        if interval == 0 and not self.burst_group.isChecked():
+            return None
+        plan = ClickPlan(
+            interval=interval,
+            button=self.mouse_button.currentText().lower(),
+            clicks=2 if self.click_type.currentText() == "Double" else 1,
+            position=self.click_position if self.custom_position_radio.isChecked() else None,
+            repeat=self.repeat_count.value() if self.repeat_for_radio.isChecked() else None,
+            humanize=self.compile_humanize(),
+        )
+        if self.multiple_positions_radio.isChecked() and self.click_targets:
+            # One target per position; the engine schedules them all together
+            return tuple(replace(plan, position=position) for position in self.click_targets)
+        return plan
+
+    def compile_humanize(self):
+        if not self.humanize_group.isChecked():
+            return None
+        pause = self.pause_spinbox.value()
+        return Humanize(
+            jitter=self.jitter_spinbox.value() / 1000,
+            offset=self.offset_spinbox.value(),
+            pause_every=self.pause_every_spinbox.value() if pause else 0,
+            pause=pause,
+            pause_jitter=pause / 5,
+            seed=int(self.seed_field.text()) if self.seed_field.text() else None,
+        )
+
+    def burst_rate(self):
+        return self.burst_rate_spinbox.value() or None
+
+    def update_click_plan(self):
+        # Apply option changes to a running engine without restarting it
+        if self.is_clicking:
+            plan = self.compile_click_plan()
+            if plan:
+                self.click_engine.swap_plan(plan)
+
+    def update_burst_rate(self):
+        if self.is_clicking and isinstance(self.click_engine, BurstEngine):
+            self.click_engine.set_rate(self.burst_rate())
 
     def toggle_clicking(self):
         self.is_clicking = not self.is_clicking
         if self.is_clicking:
-            self.click_count = 0
-            interval = (
-                self.hours_spinbox.value() * 3600000 +
-                self.minutes_spinbox.value() * 60000 +
-                self.seconds_spinbox.value() * 1000 +
-                self.milliseconds_spinbox.value()
-            )
-            if interval == 0:
+            plan = self.compile_click_plan()
+            if plan is None:
                 QMessageBox.warning(self, "Invalid Interval", "Click interval cannot be zero.")
                 self.is_clicking = False
                 return
-            self.timer.start(interval)
+            if self.image_trigger_checkbox.isChecked():
+                if self.template_matcher is None:
+                    QMessageBox.warning(self, "No Image", "Choose an image to look for first.")
+                    self.is_clicking = False
+                    return
+                self.click_engine = self.create_template_trigger(plan)
+            elif self.burst_group.isChecked():
+                self.click_engine = BurstEngine(plan, self.input_backend, self.burst_rate(),
+                                                on_finished=self.clicking_finished.emit)
+            else:
+                gate = self.start_watcher()
+                if gate is None and self.gate_mode.currentText() != "Nothing":
+                    self.is_clicking = False
+                    return
+                self.click_engine = ClickEngine(plan, self.input_backend,
+                                                on_finished=self.clicking_finished.emit,
+                                                gate=gate)
+            self.click_engine.start()
             self.update_toggle_button()
             self.status_bar.showMessage("Auto-clicking started", 5000)
         else:
-            self.timer.stop()
+            self.click_engine.stop()
+            self.stop_watcher()
             self.update_toggle_button()
-            self.status_bar.showMessage("Auto-clicking stopped", 5000)
+            self.status_bar.showMessage(f"Auto-clicking stopped ({self.click_engine.summary()})", 5000)
 
     def start_recording(self):
         self.record_button.setEnabled(False)
         self.stop_record_button.setEnabled(True)
         self.status_bar.showMessage("Recording started...", 5000)
-        self.recorder = ActionRecorder()
+        stream_path = self.new_stream_path() if self.stream_checkbox.isChecked() else None
+        from ActionRecorder import ActionRecorder  # pulls in the OS input hooks
+        self.recorder = ActionRecorder(self.input_backend, stream_path=stream_path)
         self.recorder.actions_recorded.connect(self.recording_finished)
         self.recorder.start()
 
@@ -355,52 +830,293 @@ class AutoClickerWindow(QMainWindow):
             self.record_button.setEnabled(True)
             self.status_bar.showMessage("Recording stopped", 5000)
 
+    def data_directory(self, name):
+        directory = os.path.join(QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.GenericDataLocation), "AutoClicker", name)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def new_stream_path(self):
+        return os.path.join(self.data_directory("recordings"),
+                            time.strftime("recording-%Y%m%d-%H%M%S") + EXTENSION)
+
+    def toggle_instant_replay(self, checked):
+        QSettings("MyApp", "AutoClicker").setValue("instant_replay", "true" if checked else "false")
+        if checked and self.instant_replay is None:
+            from InputHooks import create_event_source
+            from InstantReplay import InstantReplay
+            self.instant_replay = InstantReplay(create_event_source(self.input_backend),
+                                                minutes=self.replay_minutes.value())
+            self.instant_replay.start()
+            self.status_bar.showMessage("Instant replay capture started", 5000)
+        elif not checked and self.instant_replay is not None:
+            self.instant_replay.stop()
+            self.instant_replay = None  # frees the buffer
+        self.save_replay_button.setEnabled(checked)
+
+    def resize_instant_replay(self, minutes):
+        QSettings("MyApp", "AutoClicker").setValue("instant_replay_minutes", minutes)
+        self.update_replay_memory()
+        if self.instant_replay is not None:
+            # A new buffer; what the old one held is dropped
+            self.toggle_instant_replay(False)
+            self.toggle_instant_replay(True)
+
+    def update_replay_memory(self):
+        from InstantReplay import EVENTS_PER_SECOND
+        from RecordingFile import RECORD
+        megabytes = self.replay_minutes.value() * 60 * EVENTS_PER_SECOND * RECORD.size / 2 ** 20
+        self.replay_memory_label.setText(f"({megabytes:.1f} MB)")
+
+    # Runs on the hotkey thread too, so the moment saved is the moment the
+    # hotkey was pressed whatever the GUI is doing
+    def save_replay_now(self):
+        replay = self.instant_replay
+        if replay is None:
+            self.last_replay = None
+            return
+        path = os.path.join(self.replay_directory, time.strftime("replay-%Y%m%d-%H%M%S") + EXTENSION)
+        try:
+            self.last_replay = replay.save(path)
+        except OSError as e:
+            print(f"Failed to save instant replay: {e}")
+            self.last_replay = None
+
+    def replay_saved(self):
+        if self.last_replay is None:
+            self.status_bar.showMessage("No instant replay to save", 5000)
+            return
+        self.recorded_actions = self.last_replay
+        self.play_button.setEnabled(True)
+        self.save_button.setEnabled(True)
+        self.save_library_button.setEnabled(True)
+        self.status_bar.showMessage(f"Saved {len(self.last_replay)} actions "
+                                    f"({self.last_replay.duration():.1f} s) to {self.last_replay.path}", 5000)
+
+    def save_replay(self):
+        self.save_replay_now()
+        self.replay_saved()
+
     def recording_finished(self, actions):
         self.recorded_actions = actions
         self.record_button.setEnabled(True)
         self.stop_record_button.setEnabled(False)
         self.play_button.setEnabled(True)
         self.save_button.setEnabled(True)
+        self.save_library_button.setEnabled(True)
         self.status_bar.showMessage("Recording finished", 5000)
 
     def play_actions(self):
         if not self.recorded_actions:
             QMessageBox.warning(self, "No Actions", "No recorded actions to play.")
             return
+        if self.player.is_playing():
+            self.status_bar.showMessage("Already playing", 5000)
+            return
+        gate = self.start_watcher()
+        if gate is None and self.gate_mode.currentText() != "Nothing":
+            return
         self.status_bar.showMessage("Playing actions...", 5000)
-        self.player = ActionPlayer(self.recorded_actions)
-        self.player.start()
+        tracks = self.recorded_actions
+        if not isinstance(tracks, MacroProgram):
+            tracks = [self.playback_range(track) for track in [tracks] + self.extra_tracks]
+        # playback_finished hops from the engine thread back to this one
+        self.player.play(tracks, speed=self.playback_speed.value(),
+                         mode=self.playback_mode.currentData(),
+                         rate=self.screen().refreshRate(),
+                         gate=gate, on_finished=self.playback_finished.emit)
+        self.pause_button.setEnabled(not isinstance(tracks, MacroProgram))
+
+    def playback_range(self, actions):
+        # actions cut to From and To and looped; found by seeking, so
+        # starting late into a long recording costs nothing extra
+        start = self.play_from.value()
+        end = self.play_to.value() or None
+        if start or end is not None:
+            actions = Segment(actions, start, end)
+        if self.play_loops.value() > 1:
+            actions = loop(actions, self.play_loops.value())
+        return actions
+
+    def playback_done(self, completed):
+        self.stop_watcher()
+        self.pause_button.setEnabled(False)
+        self.pause_button.setText("Pause")
+        if completed:
+            self.status_bar.showMessage("Playback finished", 5000)
+
+    def toggle_pause(self):
+        if self.player.paused:
+            self.player.resume()
+            self.pause_button.setText("Pause")
+            self.status_bar.showMessage("Playback resumed", 5000)
+        else:
+            self.player.pause()
+            self.pause_button.setText("Resume")
+            self.status_bar.showMessage("Playback paused", 5000)
+
+    def choose_tracks(self):
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Extra Tracks", "",
+                                                     f"Recordings (*{EXTENSION} *{SEQUENCE_EXTENSION} *.json)")
+        # Cancelling the dialog clears the extra tracks
+        try:
+            self.extra_tracks = [load_recording(file_name) for file_name in file_names]
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Load Failed", str(e))
+            self.extra_tracks = []
+        self.tracks_button.setText(f"Extra Tracks ({len(self.extra_tracks)})" if self.extra_tracks
+                                   else "Extra Tracks")
 
     def save_actions(self):
         if not self.recorded_actions:
             QMessageBox.warning(self, "No Actions", "No recorded actions to save.")
             return
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Actions", "", "JSON Files (*.json)")
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Actions", "",
+                                                   f"Recordings (*{EXTENSION});;JSON Files (*.json)")
         if file_name:
-            with open(file_name, 'w') as f:
-                json.dump(self.recorded_actions, f)
+            actions = self.recorded_actions
+            if self.compact_checkbox.isChecked():
+                from RecordingTransforms import compact
+                actions = compact(actions)
+            if file_name.endswith(EXTENSION):
+                actions.save(file_name)
+            else:
+                actions.save_json(file_name)
             self.status_bar.showMessage("Actions saved", 5000)
 
     def load_actions(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Load Actions", "", "JSON Files (*.json)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "Load Actions", "",
+                                                   f"Recordings (*{EXTENSION} *{SEQUENCE_EXTENSION} *.json)")
         if file_name:
-            with open(file_name, 'r') as f:
-                self.recorded_actions = json.load(f)
+            self.recorded_actions = load_recording(file_name)
+            self.play_button.setEnabled(True)
+            self.save_button.setEnabled(True)
+            self.save_library_button.setEnabled(True)
+            self.status_bar.showMessage(f"Loaded {len(self.recorded_actions)} actions "
+                                        f"({self.recorded_actions.duration():.1f} s)", 5000)
+
+    def open_library(self):
+        from LibraryWindow import LibraryWindow
+        self.library_window = LibraryWindow(self.macro_library(), self)
+        self.library_window.show()
+
+    def macro_library(self):
+        if self.library is None:
+            from MacroLibrary import MacroLibrary
+            self.library = MacroLibrary(os.path.join(QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.GenericDataLocation), "AutoClicker", "library"))
+        return self.library
+
+    def screen_size(self):
+        # In device pixels, the coordinates recordings are made in
+        size = self.screen().size() * self.screen().devicePixelRatio()
+        return size.width(), size.height()
+
+    def save_to_library(self):
+        if not self.recorded_actions:
+            QMessageBox.warning(self, "No Actions", "No recorded actions to save.")
+            return
+        name, ok = QInputDialog.getText(self, "Save to Library", "Name:",
+                                        text=time.strftime("Recording %Y-%m-%d %H:%M"))
+        if not ok or not name.strip():
+            return
+        tags, ok = QInputDialog.getText(self, "Save to Library", "Tags (comma separated):")
+        if not ok:
+            return
+        actions = self.recorded_actions
+        if self.compact_checkbox.isChecked():
+            from RecordingTransforms import compact
+            actions = compact(actions)
+        entry = self.macro_library().add(actions, name.strip(), tags.split(','), screen=self.screen_size())
+        self.add_library_preview(entry, actions)
+        self.status_bar.showMessage(f"Saved {entry.name} to the library", 5000)
+
+    def add_library_preview(self, entry, actions=None):
+        from LibraryWindow import render_preview
+        path = self.library.preview_path(entry)
+        try:
+            render_preview(actions or load_recording(entry.path), path, entry.screen or self.screen_size())
+        except (OSError, ValueError) as e:
+            print(f"No preview for {entry.name}: {e}")
+            return
+        self.library.update(entry.id, preview=path)
+
+    @property
+    def click_engine(self):
+        return self.control.engine
+
+    @click_engine.setter
+    def click_engine(self, engine):
+        self.control.engine = engine
+
+    def control_command_done(self, what):
+        # A control API command, or a job one started, changed what; the
+        # command itself has already been carried out
+        if what == "clicking":
+            clicking = self.control.is_clicking()
+            if clicking != self.is_clicking:
+                self.is_clicking = clicking
+                self.update_toggle_button()
+                self.status_bar.showMessage("Auto-clicking started" if clicking else
+                                            f"Auto-clicking stopped ({self.click_engine.summary()})", 5000)
+        elif what == "playback":
+            self.pause_button.setEnabled(self.player.is_playing())
+            self.pause_button.setText("Resume" if self.player.paused else "Pause")
+        elif what == "recording":
+            self.recorded_actions = self.control.recording
             self.play_button.setEnabled(True)
             self.save_button.setEnabled(True)
-            self.status_bar.showMessage("Actions loaded", 5000)
+            self.save_library_button.setEnabled(True)
+            self.status_bar.showMessage(f"Loaded {len(self.recorded_actions)} actions "
+                                        f"({self.recorded_actions.duration():.1f} s)", 5000)
+
+    def library_entry_loaded(self, entry, actions):
+        self.recorded_actions = actions
+        self.play_button.setEnabled(True)
+        # Macros are compiled programs, only recordings can be saved as files
+        self.save_button.setEnabled(entry.kind == "recording")
+        self.save_library_button.setEnabled(False)
+        self.status_bar.showMessage(f"Loaded {entry.name} from the library", 5000)
 
     def open_settings(self):
+        from SettingsWindow import SettingsWindow
         self.settings_window = SettingsWindow(self)
         self.settings_window.show()
 
+    # The *_now methods run on the hotkey thread the moment a hotkey is
+    # pressed. They only signal the worker threads to stop; the matching GUI
+    # handlers above and below follow through the event loop.
+    def stop_clicking_now(self):
+        if self.is_clicking and self.click_engine:
+            self.click_engine.stop()
+
+    def stop_recording_now(self):
+        if hasattr(self, 'recorder'):
+            self.recorder.stop()
+
+    def stop_playing_now(self):
+        self.player.cancel()
+
     def stop_playing(self):
-        if hasattr(self, 'player') and self.player.isRunning():
-            self.player.terminate()
+        if self.player.is_playing():
+            self.player.cancel()
+            self.stop_watcher()
             self.status_bar.showMessage("Playback stopped", 5000)
 
     def closeEvent(self, event):
         self.key_listener.unregister_hotkeys()
+        if self.click_engine:
+            self.click_engine.stop()
+        self.stop_watcher()
+        self.player.close()
+        if self.instant_replay is not None:
+            self.instant_replay.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.control_server:
+            self.control_server.stop()
+        if self.library:
+            self.library.close()
         try:
             if hasattr(self, 'recorder') and self.recorder.isRunning():
                 self.recorder.stop()
@@ -409,7 +1125,11 @@ class AutoClickerWindow(QMainWindow):
         super().closeEvent(event)
 
     def toggle_position_mode(self):
-        if self.custom_position_radio.isChecked():
+        if self.multiple_positions_radio.isChecked():
+            self.position_button.setText("Set Positions")
+        else:
+            self.position_button.setText("Set Position")
+        if self.custom_position_radio.isChecked() or self.multiple_positions_radio.isChecked():
             self.position_button.setEnabled(True)
         else:
             self.position_button.setEnabled(False)
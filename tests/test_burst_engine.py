@@ -0,0 +1,36 @@
+import threading
+import time
+
+from BurstEngine import BurstEngine
+from ClickPlan import ClickPlan
+from InputBackend import NullBackend
+
+
+def test_repeat_stops_at_the_count():
+    backend = NullBackend(record=True)
+    finished = threading.Event()
+    engine = BurstEngine(ClickPlan(interval=0.001, repeat=3), backend, on_finished=finished.set)
+    engine.start()
+    engine.join(5)
+    assert finished.is_set()
+    assert engine.clicks == 3
+    assert len([event for event in backend.events if event[0] == "down"]) == 3
+
+
+def test_swapping_in_a_plan_already_done_stops_without_clicking():
+    backend = NullBackend()
+    finished = threading.Event()
+    engine = BurstEngine(ClickPlan(interval=0.001), backend, rate=1000, on_finished=finished.set)
+    engine.start()
+    deadline = time.monotonic() + 5
+    while engine.clicks < 20 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    engine.swap_plan(ClickPlan(interval=0.001, repeat=5))
+    engine.join(5)
+    assert not engine.is_alive()
+    assert finished.is_set()
+    clicks = engine.clicks
+    assert clicks >= 20
+    assert engine.batch_size > 0
+    time.sleep(0.02)
+    assert engine.clicks == clicks
@@ -0,0 +1,144 @@
+import os
+import socket
+import stat
+
+import numpy as np
+import pytest
+
+from ActionRecording import ActionRecording, DOWN, UP, BUTTON_CODES
+from BurstEngine import BurstEngine
+from ClickEngine import ClickEngine
+from ClickPlan import ClickPlan
+from ControlClient import ControlClient, ControlError
+from ControlServer import Controller, ControlServer
+from InputBackend import NullBackend
+from PlaybackEngine import PlaybackEngine
+from RecordingFile import save_recording
+from TemplateMatcher import TemplateMatcher, TemplateTrigger
+
+
+@pytest.fixture
+def backend():
+    return NullBackend(screen=np.zeros((64, 64, 3), np.uint8))
+
+
+@pytest.fixture
+def controller(backend):
+    player = PlaybackEngine(backend).start()
+    changes = []
+    controller = Controller(backend, player, on_change=changes.append)
+    controller.changes = changes
+    yield controller
+    controller.stop()
+    player.close()
+
+
+def result(controller, cmd, **args):
+    reply = controller.dispatch(dict(args, cmd=cmd))
+    assert reply["ok"], reply["error"]
+    return reply["result"]
+
+
+def test_ping_and_errors(controller):
+    assert result(controller, "ping") == "pong"
+    assert controller.dispatch({"cmd": "nope"}) == {"ok": False, "error": "ValueError: unknown command 'nope'"}
+    assert not controller.dispatch({"cmd": "click", "interval": 0})["ok"]
+    assert not controller.dispatch({"cmd": "ping", "extra": 1})["ok"]
+    assert result(controller, "status")["click"] is None
+
+
+def test_click_runs_and_takes_new_settings(controller, backend):
+    assert result(controller, "click", interval=0.001, positions=[[5, 6]], repeat=3) == {"started": True}
+    engine = controller.engine
+    assert result(controller, "wait", timeout=5) is True
+    assert engine.clicks == 3
+    assert ("move", 5, 6) in backend.events
+
+    result(controller, "click", interval=10.0)
+    engine = controller.engine
+    assert result(controller, "click", interval=0.001, repeat=2) == {"started": False}
+    assert controller.engine is engine
+    assert result(controller, "wait", timeout=5) is True
+    status = result(controller, "status")
+    assert not status["clicking"]
+    assert set(status["click"]) == {"clicks", "mean_error", "max_error"}
+    assert "clicking" in controller.changes
+
+
+def test_burst_is_replaced_by_a_click_job(controller):
+    result(controller, "burst", rate=1000)
+    assert isinstance(controller.engine, BurstEngine)
+    assert set(result(controller, "status")["click"]) == {"clicks", "target_rate", "achieved_rate", "batch_size"}
+    assert result(controller, "click", interval=0.01) == {"started": True}
+    assert isinstance(controller.engine, ClickEngine)
+    assert set(result(controller, "stop_clicking")) == {"clicks", "mean_error", "max_error"}
+    assert result(controller, "stop_clicking") is None
+
+
+def template_trigger(backend):
+    # What the window hands the controller when it starts image clicking
+    matcher = TemplateMatcher(np.full((8, 8, 3), 255, np.uint8))
+    return TemplateTrigger(ClickPlan(interval=0.001), matcher, (0, 0, 64, 64), backend)
+
+
+def test_status_and_stop_with_a_template_trigger(controller, backend):
+    trigger = template_trigger(backend)
+    controller.start_engine(trigger)
+    status = result(controller, "status")
+    assert status["clicking"]
+    assert set(status["click"]) == {"clicks", "frames", "match_time"}
+    stopped = result(controller, "stop")
+    assert stopped["clicks"] == 0
+    assert stopped["frames"] >= 1
+    assert not trigger.is_alive()
+
+
+def test_click_replaces_a_template_trigger(controller, backend):
+    trigger = template_trigger(backend)
+    controller.start_engine(trigger)
+    assert result(controller, "click", interval=0.01) == {"started": True}
+    assert not trigger.is_alive()
+    assert trigger.plan.interval == 0.001
+    assert isinstance(controller.engine, ClickEngine)
+
+
+def test_load_and_play(controller, backend, tmp_path):
+    actions = ActionRecording()
+    for i in range(20):
+        actions.append(i * 0.001, i, i, DOWN if i % 2 == 0 else UP, BUTTON_CODES['left'])
+    path = str(tmp_path / "clicks.acrec")
+    save_recording(actions, path)
+    assert result(controller, "play", path=path, mode="fast", start=0.01, loops=2)["events"] == 20
+    assert result(controller, "wait", timeout=5) is True
+    assert result(controller, "status")["recording"]["events"] == 20
+    assert [event for event in backend.events if event[0] != "move"] == [("down", "left"), ("up", "left")] * 10
+    assert not controller.dispatch({"cmd": "play", "mode": "sideways"})["ok"]
+
+
+def test_unix_socket_is_private(controller, tmp_path):
+    path = str(tmp_path / "control.sock")
+    server = ControlServer(controller, path=path).start()
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0
+        with ControlClient(path) as client:
+            assert client.batch([("ping", {}), ("status", {})])[0] == "pong"
+            with pytest.raises(ControlError):
+                client.call("nope")
+    finally:
+        server.stop()
+    assert not os.path.exists(path)
+
+
+def test_tcp_needs_the_token(controller):
+    server = ControlServer(controller, port=0).start()
+    try:
+        assert server.token
+        with ControlClient(port=server.port, token=server.token) as client:
+            assert client.ping() == "pong"
+        with pytest.raises(ControlError):
+            ControlClient(port=server.port, token="wrong")
+        with socket.create_connection(("127.0.0.1", server.port)) as sock:
+            sock.sendall(b'{"cmd": "ping"}\n{"cmd": "ping"}\n')
+            assert sock.makefile('rb').read() == b'{"ok": false, "error": "bad token"}\n'
+    finally:
+        server.stop()
@@ -0,0 +1,43 @@
+import time
+
+from JobRunner import JobRunner, run_jobs
+
+
+def test_runs_jobs_and_reports_failures():
+    stats = run_jobs(["click -i 0.001 -n 5", "click -i 0.001 -n 3 --double", "bogus"],
+                     workers=1, backend="null")
+    assert stats["completed"] == 2
+    assert stats["failed"] == 1
+    assert stats["pending"] == 0
+    assert stats["actions"] == 5 * 2 + 3 * 4
+    assert "invalid choice: 'bogus'" in stats["errors"][2]
+
+
+def test_job_that_never_ends_times_out():
+    # Clicks without -n run until stopped; the heartbeat thread keeps
+    # stamping meanwhile, so only the job deadline ends it
+    start = time.monotonic()
+    stats = run_jobs(["click -i 0.01", "click -i 0.001 -n 5"], workers=1, backend="null", job_timeout=1.0)
+    assert time.monotonic() - start < 30
+    assert stats["errors"] == {0: "timed out after 1 s"}
+    assert stats["completed"] == 1
+    assert stats["restarts"] == 1
+    assert stats["per_worker"][0]["broken"] is None
+
+
+def test_job_of_a_killed_worker_is_retried_then_failed():
+    runner = JobRunner(workers=1, backend="null")
+    runner.start()
+    try:
+        runner.submit("click -i 0.01")
+        for attempt in range(2):
+            deadline = time.monotonic() + 30
+            while runner.current[0] != 0 or runner.attempts[0] != attempt + 1:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            runner.processes[0].kill()
+        stats = runner.wait(timeout=30)
+    finally:
+        runner.close()
+    assert stats["errors"] == {0: "worker exit code -9"}
+    assert stats["restarts"] == 2
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from ActionRecorder import ActionRecorder
+from ActionRecording import ActionRecording, MOVE, DOWN, UP, SCROLL, KEY_DOWN, BUTTON_CODES
+from InputBackend import NullBackend
+from InputHooks import SyntheticEventSource
+from RecordingFile import RecordingFile
+
+
+def record(events, stream_path=None):
+    # Runs a recorder against a synthetic source on a plain thread, feeds it
+    # (time, event, x, y, button, data) events and returns what it recorded
+    source = SyntheticEventSource()
+    recorder = ActionRecorder(NullBackend(), source=source, stream_path=stream_path)
+    thread = threading.Thread(target=recorder.run)
+    thread.start()
+    while source.callback is None:
+        time.sleep(0.001)
+    start = recorder.start_time
+    for offset, event, x, y, button, data in events:
+        source.emit(event, x, y, button, data, timestamp=start + offset)
+    recorder.stop()
+    thread.join()
+    assert source.callback is None
+    if stream_path:
+        return RecordingFile(stream_path)
+    return recorder.recorded_actions
+
+
+def assert_recorded(actions, events):
+    # Recordings hold (time, x, y, event, button, data)
+    assert len(actions) == len(events)
+    for action, (offset, event, x, y, button, data) in zip(actions, events):
+        assert action[0] == pytest.approx(offset)
+        assert action[1:] == (x, y, event, button, data)
+
+
+EVENTS = [
+    (0.0, MOVE, 10, 20, 0, 0),
+    (0.5, DOWN, 10, 20, BUTTON_CODES['left'], 0),
+    (0.625, UP, 10, 20, BUTTON_CODES['left'], 0),
+    (1.0, SCROLL, 12, 22, 0, -1),
+    (1.5, KEY_DOWN, 12, 22, 0, 0x61),
+]
+
+
+def test_records_events_relative_to_start():
+    actions = record(EVENTS)
+    assert isinstance(actions, ActionRecording)
+    assert_recorded(actions, EVENTS)
+    assert actions.duration() == pytest.approx(1.5)
+
+
+def test_streams_events_to_a_file(tmp_path):
+    # Enough events to go through the writer thread in several chunks
+    events = [(i / 1000, MOVE, i % 1920, i % 1080, 0, 0) for i in range(10000)] + EVENTS[1:]
+    events[-4:] = [(10 + offset, *event) for offset, *event in events[-4:]]
+    recording = record(events, stream_path=str(tmp_path / "capture.acrec"))
+    assert recording.header.count == len(events)  # written on close
+    assert_recorded(recording, events)
+
+
+def test_events_after_stop_are_dropped():
+    source = SyntheticEventSource()
+    seen = []
+    source.start(lambda *event: seen.append(event))
+    source.emit(MOVE, 1, 2, timestamp=1.0)
+    source.stop()
+    source.emit(MOVE, 3, 4, timestamp=2.0)
+    assert seen == [(1.0, MOVE, 1, 2, 0, 0)]
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from RecordingFile import RecordingFile, RecordingWriter
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / "events.acrec")
+    writer = RecordingWriter(path, chunk_size=16)
+    for i in range(100):
+        writer.append(i * 0.01, i, -i, 1, 2, i * 3)
+    recording = writer.close()
+    assert recording.header.count == 100
+    assert recording.duration() == pytest.approx(0.99)
+    assert list(recording)[42] == (pytest.approx(0.42), 42, -42, 1, 2, 126)
+
+
+def test_crash_loses_only_the_chunk_being_filled(tmp_path):
+    # The process dies without closing the writer, partway into its fourth
+    # chunk; the three full chunks before it have to be on disk
+    path = str(tmp_path / "crashed.acrec")
+    script = textwrap.dedent(f"""
+        import os
+        from RecordingFile import RecordingWriter
+        writer = RecordingWriter({path!r}, chunk_size=100)
+        for i in range(350):
+            writer.append(i * 0.001, i, i)
+        os._exit(1)
+    """)
+    result = subprocess.run([sys.executable, "-c", script], env=dict(os.environ, PYTHONPATH=SRC))
+    assert result.returncode == 1
+    recording = RecordingFile(path)
+    assert len(recording) == 300
+    assert [x for _, x, *_ in recording] == list(range(300))
+    assert recording.duration() == pytest.approx(0.299)
@@ -0,0 +1,94 @@
+import pytest
+
+from ActionRecording import ActionRecording, DOWN, MOVE
+from RecordingFile import load_recording, save_recording
+from RecordingSegments import Segment, Sequence, load_sequence, loop, save_sequence
+
+
+def recording(count=100, step=0.1):
+    actions = ActionRecording()
+    for i in range(count):
+        actions.append(i * step, i, 2 * i, DOWN if i % 10 == 0 else MOVE)
+    return actions
+
+
+@pytest.fixture(params=["memory", "file"])
+def actions(request, tmp_path):
+    # The same events in memory and in a .acrec file, which seeks on disk
+    actions = recording()
+    if request.param == "file":
+        path = str(tmp_path / "actions.acrec")
+        save_recording(actions, path)
+        return load_recording(path)
+    return actions
+
+
+def test_seek_finds_first_event_at_or_after(actions):
+    assert actions.seek(0.0) == 0
+    assert actions.seek(0.05) == 1
+    assert actions.seek(0.1) == 1
+    assert actions.seek(4.25) == 43
+    assert actions.seek(9.9) == 99
+    assert actions.seek(100.0) == 100
+
+
+def test_iter_range_matches_slicing(actions):
+    events = list(recording())
+    assert list(actions.iter_range(0, 100)) == events
+    assert list(actions.iter_range(17, 42)) == events[17:42]
+    assert list(actions.iter_range(42, 42)) == []
+
+
+def test_segment_is_retimed_to_start_at_zero(actions):
+    segment = Segment(actions, 2.0, 5.0)
+    assert len(segment) == 30
+    assert segment.duration() == pytest.approx(3.0)
+    events = list(segment)
+    assert events[0][0] == pytest.approx(0.0)
+    assert [event[1:] for event in events] == [event[1:] for event in list(recording())[20:50]]
+    assert segment.seek(1.0) == 10
+    assert segment.seek(-1.0) == 0
+    assert segment.seek(10.0) == 30
+    assert [event[1] for event in segment.iter_range(5, 8)] == [25, 26, 27]
+
+
+def test_segment_past_the_end_is_empty(actions):
+    segment = Segment(actions, 50.0)
+    assert len(segment) == 0
+    assert list(segment) == []
+    assert segment.duration() == 0.0
+
+
+def test_sequence_seeks_and_iterates_across_parts(actions):
+    first = Segment(actions, 0.0, 1.0)  # events 0-9, 1 s long
+    second = Segment(actions, 5.0, 5.5)  # events 50-54, 0.5 s long
+    sequence = Sequence([first, second, first])
+    assert len(sequence) == 25
+    assert sequence.duration() == pytest.approx(2.5)
+    assert sequence.seek(0.0) == 0
+    assert sequence.seek(1.2) == 12
+    assert sequence.seek(1.5) == 15
+    assert sequence.seek(1.55) == 16
+    xs = [event[1] for event in sequence.iter_range(8, 17)]
+    assert xs == [8, 9, 50, 51, 52, 53, 54, 0, 1]
+    times = [event[0] for event in sequence]
+    assert times == sorted(times)
+    assert times[10] == pytest.approx(1.0)
+    assert times[15] == pytest.approx(1.5)
+
+
+def test_loop_repeats_on_the_duration(actions):
+    looped = loop(Segment(actions, 0.0, 0.5), 3)
+    assert len(looped) == 15
+    assert [event[1] for event in looped] == list(range(5)) * 3
+    assert [event[0] for event in looped][5] == pytest.approx(0.5)
+
+
+def test_sequence_file_round_trip(tmp_path):
+    path = str(tmp_path / "base.acrec")
+    save_recording(recording(), path)
+    sequence_path = str(tmp_path / "cut.acseq")
+    save_sequence(sequence_path, [(path, 1.0, 2.0, 2), (path, 9.0, None, 1)])
+    sequence = load_sequence(sequence_path)
+    assert len(sequence) == 10 + 10 + 10
+    assert [event[1] for event in sequence] == list(range(10, 20)) * 2 + list(range(90, 100))
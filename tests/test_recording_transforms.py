@@ -0,0 +1,42 @@
+import numpy as np
+
+from ActionRecording import ActionRecording, MOVE, DOWN, KEY_DOWN, KEY_UP, BUTTON_CODES
+from RecordingTransforms import compact
+
+
+def recording(events):
+    actions = ActionRecording()
+    for event in events:
+        actions.append(*event)
+    return actions
+
+
+def test_compact_straightens_a_line_and_keeps_clicks():
+    events = [(i * 0.001, i, 2 * i, MOVE) for i in range(100)]
+    events[50] = (0.05, 50, 100, DOWN, BUTTON_CODES['left'])
+    compacted = compact(recording(events)).columns()
+    assert list(compacted['xs']) == [0, 50, 99]
+    assert list(compacted['events']) == [MOVE, DOWN, MOVE]
+
+
+def test_compact_keys_do_not_bend_the_path():
+    # Keys come from the hook at 0, 0; a straight drag typed over must still
+    # compact to its ends, with every key kept where it was
+    events = [(i * 0.001, 100 + i, 100, MOVE) for i in range(100)]
+    for i in (20, 60):
+        events.insert(i, (i * 0.001, 0, 0, KEY_DOWN, 0, 65))
+        events.insert(i + 1, (i * 0.001, 0, 0, KEY_UP, 0, 65))
+    compacted = compact(recording(events)).columns()
+    assert list(compacted['events']) == [MOVE, KEY_DOWN, KEY_UP, KEY_DOWN, KEY_UP, MOVE]
+    assert list(compacted['xs']) == [100, 0, 0, 0, 0, 199]
+    assert list(compacted['data'][1:5]) == [65] * 4
+
+
+def test_compact_keeps_timing_within_tolerance():
+    # The pointer stays on a line but stops halfway; dropping the stop would
+    # shift the second half by far more than the time tolerance
+    times = np.r_[np.arange(50) * 0.001, 1.0 + np.arange(50) * 0.001]
+    events = [(t, i, 0, MOVE) for i, t in enumerate(times)]
+    compacted = compact(recording(events), time_tolerance=0.05).columns()
+    assert list(compacted['xs']) == [0, 49, 50, 99]
+    assert compacted['times'][2] == 1.0
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import numpy as np
+
+from InputBackend import NullBackend
+from RegionWatcher import PixelWatcher, RegionWatcher
+
+RATE = 500  # polls a second, so each case takes a few milliseconds
+
+
+def watch(watcher):
+    watcher.start()
+    deadline = time.perf_counter() + 5
+    while watcher.polls < 2 and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return watcher
+
+
+def settle(watcher, polls=3):
+    # Waits for a few polls to have seen the screen as it is now
+    target = watcher.polls + polls
+    deadline = time.perf_counter() + 5
+    while watcher.polls < target and time.perf_counter() < deadline:
+        time.sleep(0.001)
+
+
+def test_pixel_gate_follows_the_pixel():
+    screen = np.zeros((4, 4, 3), np.uint8)
+    screen[1, 2] = (255, 0, 0)
+    watcher = watch(PixelWatcher(NullBackend(screen=screen), (2, 1), (250, 5, 0), tolerance=5, rate=RATE))
+    interrupt = threading.Event()
+    try:
+        assert watcher.wait(interrupt)
+
+        # A match from before the pixel changed must not open the gate
+        settle(watcher)
+        assert watcher.triggered.is_set()
+        screen[1, 2] = (0, 0, 255)
+        settle(watcher)
+        assert not watcher.triggered.is_set()
+        threading.Timer(0.05, interrupt.set).start()
+        start = time.perf_counter()
+        assert not watcher.wait(interrupt)
+        assert time.perf_counter() - start >= 0.04
+
+        interrupt.clear()
+        threading.Timer(0.02, lambda: screen.__setitem__((1, 2), (255, 0, 0))).start()
+        assert watcher.wait(interrupt)
+    finally:
+        watcher.stop()
+        watcher.join(5)
+    assert not watcher.is_alive()
+
+
+def test_region_gate_opens_on_change_and_is_consumed():
+    screen = np.zeros((64, 64, 3), np.uint8)
+    watcher = watch(RegionWatcher(NullBackend(screen=screen), (0, 0, 64, 64), rate=RATE, block_size=16))
+    interrupt = threading.Event()
+    try:
+        settle(watcher)
+        assert not watcher.triggered.is_set()
+
+        screen[20, 40] = (1, 1, 1)
+        assert watcher.wait(interrupt)
+        assert watcher.dirty.nonzero() == (np.array([1]), np.array([2]))
+
+        # The change was taken by the wait above; an unchanged screen stays shut
+        settle(watcher)
+        interrupt.set()
+        assert not watcher.wait(interrupt)
+
+        # A change is kept until a waiter takes it, even after later polls
+        interrupt.clear()
+        screen[60, 0] = (9, 9, 9)
+        settle(watcher)
+        assert watcher.wait(interrupt)
+        assert watcher.dirty.nonzero() == (np.array([3]), np.array([0]))
+    finally:
+        watcher.stop()
+        watcher.join(5)
+    assert not watcher.is_alive()
+
+
+def test_region_changes_below_min_blocks_do_not_fire():
+    screen = np.zeros((64, 64, 3), np.uint8)
+    watcher = watch(RegionWatcher(NullBackend(screen=screen), (0, 0, 64, 64), rate=RATE,
+                                  block_size=16, min_blocks=2))
+    try:
+        screen[0, 0] = (1, 1, 1)
+        settle(watcher)
+        assert not watcher.triggered.is_set()
+        screen[0, 0] = (0, 0, 0)
+        screen[63, 63] = (1, 1, 1)
+        settle(watcher)
+        assert watcher.triggered.is_set()
+    finally:
+        watcher.stop()
+        watcher.join(5)
+
+
+def test_stop_closes_an_owned_backend():
+    backend = NullBackend(screen=np.zeros((4, 4, 3), np.uint8))
+    closed = []
+    backend.close = lambda: closed.append(backend)
+    watcher = watch(PixelWatcher(backend, (0, 0), (0, 0, 0), rate=RATE, close_backend=True))
+    watcher.stop()
+    watcher.join(5)
+    assert not watcher.is_alive()
+    assert closed == [backend]
+
+
+def test_stop_while_polls_fall_behind():
+    class SlowBackend(NullBackend):
+        def grab(self, region):
+            time.sleep(0.01)
+            return super().grab(region)
+
+    watcher = watch(PixelWatcher(SlowBackend(screen=np.zeros((4, 4, 3), np.uint8)), (0, 0), (1, 1, 1),
+                                 rate=1000))
+    watcher.stop()
+    watcher.join(5)
+    assert not watcher.is_alive()
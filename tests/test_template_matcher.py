@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pytest
+
+from ClickPlan import ClickPlan
+from InputBackend import NullBackend
+from TemplateMatcher import TemplateMatcher, TemplateTrigger, to_grayscale
+
+
+def screen(seed=0, height=240, width=320):
+    # Smooth random RGB image, closer to a screen than pixel noise, which no
+    # longer correlates with itself once downsampled at an odd offset
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 8 + 2, width // 8 + 2, 3)).astype(np.float32)
+    image = np.kron(coarse, np.ones((8, 8, 1), np.float32))
+    for axis in (0, 1):
+        image = sum(np.roll(image, shift, axis) for shift in range(-3, 4)) / 7
+    return image[8:8 + height, 8:8 + width].astype(np.uint8)
+
+
+@pytest.mark.parametrize("x, y", [(0, 0), (123, 57), (211, 170), (37, 181)])
+def test_finds_template_where_it_was_cut(x, y):
+    image = screen()
+    matcher = TemplateMatcher(image[y:y + 48, x:x + 64])
+    found = matcher.match(image)
+    assert found is not None
+    assert found[:2] == (x, y)
+    assert found[2] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_matches_grayscale_and_rgba_alike():
+    image = screen(1)
+    template = image[100:140, 50:90]
+    rgba = np.dstack([image, np.full(image.shape[:2], 255, np.uint8)])
+    assert TemplateMatcher(to_grayscale(template)).match(to_grayscale(image))[:2] == (50, 100)
+    assert TemplateMatcher(template).match(rgba)[:2] == (50, 100)
+
+
+def test_returns_none_without_a_match():
+    matcher = TemplateMatcher(screen(2)[60:100, 60:100])
+    assert matcher.match(screen(3)) is None
+    assert matcher.last is None
+    # Smaller than the template
+    assert matcher.match(screen(2)[:20, :20]) is None
+
+
+def test_follows_a_moved_template():
+    image = screen(4)
+    template = image[30:70, 40:80].copy()
+    matcher = TemplateMatcher(template)
+    assert matcher.match(image)[:2] == (40, 30)
+    assert matcher.last == (40, 30)
+
+    moved = screen(5)
+    moved[150:190, 200:240] = template
+    assert matcher.match(moved)[:2] == (200, 150)
+    assert matcher.last == (200, 150)
+
+
+def test_trigger_clicks_the_center_of_a_match():
+    image = screen(6)
+    matcher = TemplateMatcher(image[80:120, 100:160])
+    backend = NullBackend(screen=image)
+    capture = NullBackend(screen=image)
+    closed = []
+    capture.close = lambda: closed.append(capture)
+    finished = []
+    plan = ClickPlan(interval=0.001, repeat=2)
+    trigger = TemplateTrigger(plan, matcher, (10, 20, 300, 200), backend,
+                              on_finished=lambda: finished.append(True), capture=capture)
+    trigger.start()
+    trigger.join(5)
+    assert not trigger.is_alive()
+    assert trigger.clicks == 2
+    # Region offset plus the template's top-left corner plus half its size
+    assert backend.events[:3] == [("move", 130, 100), ("down", "left"), ("up", "left")]
+    assert finished == [True]
+    assert closed == [capture]
+
+
+def test_trigger_stops_while_matching_falls_behind():
+    image = screen(7, 480, 640)
+    matcher = TemplateMatcher(screen(8)[:40, :40])
+    trigger = TemplateTrigger(ClickPlan(interval=1e-6), matcher, (0, 0, 640, 480), NullBackend(screen=image))
+    trigger.start()
+    time.sleep(0.05)
+    trigger.stop()
+    trigger.join(5)
+    assert not trigger.is_alive()
+    assert trigger.clicks == 0